@@ -1,26 +1,73 @@
 from __future__ import annotations
 
 import os
-from fastapi import FastAPI, Depends
+import json
+import time
+from datetime import datetime, timezone
+from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.db import get_session, engine, Base
+from app import metrics
+from app.db import get_session, engine, Base, add_missing_columns
 from app.embeddings import Embedder
-from app.faiss_index import FaissStore
+from app.faiss_index import FaissStore, exact_sidecar
 from app.retriever import Retriever
+from app.filters import SearchFilter, filter_key
+from app.batcher import QueryBatcher
+from app.chunk_store import ChunkStore
+from app.index_manager import IndexManager
+from app.response_cache import ResponseCache, build_response_cache
+from app.semantic_cache import SemanticCache, build_semantic_cache
+from app.singleflight import SingleFlight, question_key
+from app.memory import mapped_file_rss, process_memory
 from app.llm import build_llm
-from app.rag import RAG
+from app.rag import RAG, RAGResponse
 from functools import lru_cache
 
 
 app = FastAPI(title="FinRAG Banking Doc Assistant", version="1.0.0")
+# identical questions asked while one is being answered share that computation
+flights = SingleFlight()
+
+
+class FiltersIn(BaseModel):
+    """Search only chunks of documents matching every given field."""
+    document_ids: list[int] | None = None
+    source_prefix: str | None = None
+    title: str | None = None  # case-insensitive substring
+    ingested_after: datetime | None = None  # naive = UTC
+    ingested_before: datetime | None = None
+
+    def to_filter(self) -> SearchFilter | None:
+        f = SearchFilter(
+            document_ids=tuple(self.document_ids) if self.document_ids is not None else None,
+            source_prefix=self.source_prefix or None,
+            title=self.title or None,
+            ingested_after=_unix(self.ingested_after),
+            ingested_before=_unix(self.ingested_before),
+        )
+        return None if f.is_empty() else f
+
+
+def _unix(dt: datetime | None) -> float | None:
+    if dt is None:
+        return None
+    return (dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)).timestamp()
 
 
 class AskRequest(BaseModel):
     question: str
+    filters: FiltersIn | None = None
+
+
+class AskBatchRequest(BaseModel):
+    questions: list[str]
+    filters: FiltersIn | None = None  # applied to every question
 
 
 class CitationOut(BaseModel):
@@ -31,6 +78,7 @@ class CitationOut(BaseModel):
     page_end: int
     score: float
     snippet: str
+    chunk_ids: list[int] = []
 
 
 class AskResponse(BaseModel):
@@ -40,10 +88,15 @@ class AskResponse(BaseModel):
     citations: list[CitationOut]
 
 
+class AskBatchResponse(BaseModel):
+    results: list[AskResponse]
+
+
 @app.on_event("startup")
 def startup():
     os.makedirs(settings.data_dir, exist_ok=True)
     Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
 
 
 def build_rag(db: Session) -> RAG:
@@ -58,16 +111,107 @@ def build_rag(db: Session) -> RAG:
     return RAG(retriever=retriever, llm=llm)
 
 
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    if not metrics.enabled:
+        return await call_next(request)
+    timings = metrics.start_request()
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    # route template, not the raw path: keeps label cardinality bounded
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    metrics.HTTP_SECONDS.observe(time.perf_counter() - t0, request.method, path, str(response.status_code))
+    # streaming responses: only the stages before the first byte (retrieval, prompt)
+    if timings:
+        response.headers["Server-Timing"] = metrics.server_timing(timings)
+    return response
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=false).")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    if index_manager.cache_info().currsize:
+        index_manager().close()
+    if _cached_components.cache_info().currsize:
+        _, llm, batcher = _cached_components()
+        await llm.aclose()
+        if batcher is not None:
+            batcher.close()
+    if response_cache.cache_info().currsize and response_cache() is not None:
+        response_cache().close()
+
+
+@app.get("/stats")
+def stats():
+    if not _cached_components.cache_info().currsize or not index_manager.cache_info().currsize:
+        return {"loaded": False}
+    _, _, batcher = _cached_components()
+    manager = index_manager()
+    snap = manager.current()
+    return {
+        "loaded": True,
+        "index": {"type": snap.store.index_type, "ntotal": snap.store.ntotal, **manager.stats()},
+        "chunk_store": {"chunks": len(snap.chunks)} if snap.chunks is not None else None,
+        "query_batching": batcher.stats() if batcher is not None else None,
+        "llm_cache": response_cache().stats() if response_cache() is not None else None,
+        "semantic_cache": semantic_cache().stats() if semantic_cache() is not None else None,
+        "coalescing": flights.stats(),
+        "memory": {**process_memory(), "mapped_files_mb": mapped_file_rss(index_files())},
+    }
+
+
+def index_files() -> list[str]:
+    p = settings.faiss_index_path
+    text = os.path.join(ChunkStore.files_dir(settings.chunk_store_dir), "text.bin")
+    return [p, exact_sidecar(p, "ids"), exact_sidecar(p, "vectors"), text]
+
+
 @app.post("/ask", response_model=AskResponse)
-def ask(req: AskRequest, db: Session = Depends(get_session)):
-    rag = build_rag(db)
-    res = rag.answer(req.question)
+async def ask(req: AskRequest, db: Session = Depends(get_session)):
+    # first call loads the embedding model + index; never do that on the event loop
+    rag = await run_in_threadpool(build_rag, db)
+    filters = req.filters.to_filter() if req.filters is not None else None
+    if settings.coalesce_requests:
+        res = await flights.do(flight_key(rag, req.question, filters), lambda: rag.aanswer(req.question, filters))
+    else:
+        res = await rag.aanswer(req.question, filters)
+    return to_response(res)
+
+
+def flight_key(rag: RAG, question: str, filters: SearchFilter | None = None) -> str:
+    # requests pinned to different index snapshots (or with different filters) never share an answer
+    return f"{rag.index_version}:{filter_key(filters)}:{question_key(question)}"
 
+
+@app.post("/ask/batch", response_model=AskBatchResponse)
+async def ask_batch(req: AskBatchRequest, db: Session = Depends(get_session)):
+    """
+    Many questions in one call: one embedding call, one FAISS search and one
+    chunk query for the whole batch; LLM calls then run concurrently.
+    """
+    if len(req.questions) > settings.ask_batch_max_questions:
+        raise HTTPException(
+            status_code=413, detail=f"At most {settings.ask_batch_max_questions} questions per batch."
+        )
+    rag = await run_in_threadpool(build_rag, db)
+    filters = req.filters.to_filter() if req.filters is not None else None
+    results = await rag.aanswer_many(req.questions, filters)
+    return AskBatchResponse(results=[to_response(r) for r in results])
+
+
+def to_response(res: RAGResponse) -> AskResponse:
     return AskResponse(
         answer=res.answer,
         idk=res.idk,
@@ -81,23 +225,107 @@ def ask(req: AskRequest, db: Session = Depends(get_session)):
                 page_end=c.page_end,
                 score=c.score,
                 snippet=c.snippet,
+                chunk_ids=c.chunk_ids,
             )
             for c in res.citations
         ],
     )
 
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/ask/stream")
+async def ask_stream(req: AskRequest, db: Session = Depends(get_session)):
+    """
+    Server-Sent Events: `citations` (as soon as retrieval finishes), then
+    `token` events as the LLM produces them, then `done` with the full answer.
+    """
+    rag = await run_in_threadpool(build_rag, db)
+    filters = req.filters.to_filter() if req.filters is not None else None
+    if settings.coalesce_requests:
+        # every consumer gets the full event sequence, also when joining mid-stream
+        key = flight_key(rag, req.question, filters)
+        events = flights.stream(key, lambda: rag.astream(req.question, filters))
+    else:
+        events = rag.astream(req.question, filters)
+    # run retrieval while the request (and its DB session) is still in scope
+    first = await events.__anext__()
+
+    async def body():
+        yield _sse(*first)
+        try:
+            async for event, data in events:
+                yield _sse(event, data)
+        except Exception as e:  # headers are already sent; report in-band
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @lru_cache(maxsize=1)
 def _cached_components():
+    # process-lifetime parts; the index snapshot lives in index_manager()
+    embedder = Embedder()
+    llm = build_llm()
+    batcher = None
+    if settings.query_batching:
+        batcher = QueryBatcher(
+            embedder, max_wait_ms=settings.query_batch_max_wait_ms, max_batch=settings.query_batch_max_size
+        )
+    return embedder, llm, batcher
+
+
+def load_index_snapshot() -> tuple[FaissStore, ChunkStore | None]:
     if not os.path.exists(settings.faiss_index_path):
         raise RuntimeError(
             f"FAISS index not found at {settings.faiss_index_path}. Run: python scripts/ingest_cli.py"
         )
-    embedder = Embedder()
-    store = FaissStore.load(settings.faiss_index_path)
-    llm = build_llm()
-    return embedder, store, llm
+    store = FaissStore.load(settings.faiss_index_path, mmap=settings.faiss_mmap)
+    chunks = load_chunk_store() if settings.chunk_store_enabled else None
+    return store, chunks
+
+
+@lru_cache(maxsize=1)
+def response_cache() -> ResponseCache | None:
+    return build_response_cache()
+
+
+@lru_cache(maxsize=1)
+def semantic_cache() -> SemanticCache | None:
+    embedder, _, _ = _cached_components()
+    return build_semantic_cache(embedder.dim())
+
+
+@lru_cache(maxsize=1)
+def index_manager() -> IndexManager:
+    return IndexManager(
+        settings.faiss_index_path, load_index_snapshot, poll_interval_s=settings.index_reload_interval_s
+    )
+
+def load_chunk_store() -> ChunkStore:
+    if not ChunkStore.exists(settings.chunk_store_dir):
+        # built by ingest only: uvicorn workers building it at once would race on the files
+        raise RuntimeError(
+            f"Chunk store not found at {settings.chunk_store_dir}. Run: python scripts/ingest_cli.py "
+            "(or set CHUNK_STORE_ENABLED=false)"
+        )
+    return ChunkStore.load(settings.chunk_store_dir)
 
 def build_rag(db: Session) -> RAG:
-    embedder, store, llm = _cached_components()
-    retriever = Retriever(db=db, embedder=embedder, store=store)
-    return RAG(retriever=retriever, llm=llm)
+    embedder, llm, batcher = _cached_components()
+    # pinned for the whole request; a reload swaps in a new snapshot for later requests only
+    snap = index_manager().current()
+    retriever = Retriever(db=db, embedder=embedder, store=snap.store, batcher=batcher, chunks=snap.chunks)
+    # cached answers are only valid for the index version they were generated on
+    return RAG(
+        retriever=retriever,
+        llm=llm,
+        cache=response_cache(),
+        index_version=snap.version,
+        semantic=semantic_cache(),
+    )
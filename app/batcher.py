@@ -0,0 +1,142 @@
+from __future__ import annotations
+import time
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+import numpy as np
+
+from app.embeddings import Embedder
+from app.faiss_index import FaissStore
+from app import metrics
+
+
+@dataclass
+class _Pending:
+    query: str
+    store: FaissStore | None  # None: encode only, the result is the query vector
+    top_k: int
+    vector: np.ndarray | None = None  # already embedded by the caller
+    allowed: np.ndarray | None = None  # filtered search: sorted vector ids
+    future: Future = field(default_factory=Future)
+
+
+class QueryBatcher:
+    """
+    Dynamic micro-batching for query retrieval.
+
+    Concurrent callers of `search()` are collected for up to `max_wait_ms`
+    (or until `max_batch` queries are waiting), embedded with one
+    Embedder.encode call and searched with one FaissStore.search_many per
+    store; each caller gets back its own row. A single request waits at most
+    `max_wait_ms` longer than an unbatched one.
+    """
+
+    def __init__(self, embedder: Embedder, max_wait_ms: float = 2.0, max_batch: int = 32):
+        self.embedder = embedder
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.batch_sizes: Counter[int] = Counter()
+        self._q: queue.Queue[_Pending | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def search(
+        self,
+        query: str,
+        store: FaissStore,
+        top_k: int,
+        vector: np.ndarray | None = None,
+        allowed: np.ndarray | None = None,
+    ) -> tuple[list[float], list[int]]:
+        return self._submit(_Pending(query, store, top_k, vector, allowed))
+
+    def encode(self, query: str) -> np.ndarray:
+        """Query vector only, embedded together with concurrent searches."""
+        return self._submit(_Pending(query, None, 0))
+
+    def _submit(self, item: _Pending):
+        self._ensure_started()
+        self._q.put(item)
+        return item.future.result()
+
+    def close(self):
+        if self._thread is not None:
+            self._q.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:  # the batcher thread adds new sizes
+            sizes = dict(self.batch_sizes)
+        batches = sum(sizes.values())
+        queries = sum(size * n for size, n in sizes.items())
+        return {
+            "batches": batches,
+            "queries": queries,
+            "mean_batch_size": queries / batches if batches else 0.0,
+            "batch_size_histogram": dict(sorted(sizes.items())),
+        }
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            first = self._q.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._q.get(timeout=remaining) if remaining > 0 else self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch: list[_Pending]):
+        with self._lock:
+            self.batch_sizes[len(batch)] += 1
+        try:
+            todo = [i for i, it in enumerate(batch) if it.vector is None]
+            if todo:
+                # batch thread: histograms only, callers time the whole wait as "embed_search"
+                with metrics.timer("embed"):
+                    encoded = self.embedder.encode([batch[i].query for i in todo])
+                for row, i in enumerate(todo):
+                    batch[i].vector = encoded[row]
+            vecs = np.stack([it.vector for it in batch])
+            groups: dict[tuple[int, int], list[int]] = {}
+            for i, it in enumerate(batch):
+                if it.store is None:
+                    it.future.set_result(it.vector)
+                    continue
+                # requests pinned to different index snapshots (or filtered) are searched separately;
+                # encoding is still shared
+                groups.setdefault((id(it.store), id(it.allowed)), []).append(i)
+            for rows in groups.values():
+                store, allowed = batch[rows[0]].store, batch[rows[0]].allowed
+                k = max(batch[i].top_k for i in rows)
+                with metrics.timer("search"):
+                    scores, ids = store.search_many(vecs[rows], k, allowed=allowed)
+                for r, i in enumerate(rows):
+                    n = batch[i].top_k
+                    batch[i].future.set_result((scores[r][:n], ids[r][:n]))
+        except Exception as e:
+            for it in batch:
+                if not it.future.done():
+                    it.future.set_exception(e)
@@ -0,0 +1,184 @@
+from __future__ import annotations
+import os
+import json
+import shutil
+import tempfile
+from dataclasses import dataclass
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from app.models import Chunk, Document
+
+
+@dataclass
+class ChunkRecord:
+    chunk_id: int
+    document_id: int
+    chunk_index: int
+    page_start: int
+    page_end: int
+    text: str
+
+
+class ChunkStore:
+    """
+    Read-only, array-backed copy of the chunk rows, indexed by vector_id, so the
+    query path resolves FAISS hits without SQL or ORM objects. SQLite stays the
+    source of truth; ingest rebuilds this from it.
+
+    Each build writes a fresh version directory `path/v-*/`:
+      chunks.npz      per-vector_id arrays: chunk_id (-1 = no chunk), document_id,
+                      chunk_index, page_start, page_end, and text offsets (n + 1)
+      text.bin        utf-8 chunk texts back to back, memory-mapped on load
+      documents.json  {document_id: [source_path, title]}
+    and then names it in `path/CURRENT` (tmp file + rename, the one atomic
+    step), so a reader always opens three files of the same build. The
+    previous version is kept for readers that read CURRENT just before the
+    swap; older ones are removed.
+    """
+
+    FILES = ("chunks.npz", "text.bin", "documents.json")
+    CURRENT = "CURRENT"
+
+    def __init__(self, arrays: dict[str, np.ndarray], text: np.ndarray, documents: dict[int, tuple[str, str]]):
+        self.chunk_id = arrays["chunk_id"]
+        self.document_id = arrays["document_id"]
+        self.chunk_index = arrays["chunk_index"]
+        self.page_start = arrays["page_start"]
+        self.page_end = arrays["page_end"]
+        self.offsets = arrays["offsets"]
+        self.text = text
+        self.documents = documents
+        self._by_document: tuple[np.ndarray, np.ndarray] | None = None
+
+    def __len__(self) -> int:
+        return int((self.chunk_id >= 0).sum())
+
+    def get(self, vector_id: int) -> ChunkRecord | None:
+        if vector_id < 0 or vector_id >= len(self.chunk_id) or self.chunk_id[vector_id] < 0:
+            return None
+        a, b = self.offsets[vector_id], self.offsets[vector_id + 1]
+        return ChunkRecord(
+            chunk_id=int(self.chunk_id[vector_id]),
+            document_id=int(self.document_id[vector_id]),
+            chunk_index=int(self.chunk_index[vector_id]),
+            page_start=int(self.page_start[vector_id]),
+            page_end=int(self.page_end[vector_id]),
+            text=self.text[a:b].tobytes().decode("utf-8"),
+        )
+
+    def document(self, document_id: int) -> tuple[str, str]:
+        return self.documents.get(document_id, ("", ""))
+
+    def vector_ids_of(self, document_ids) -> np.ndarray:
+        """
+        Sorted vector ids of the documents' chunks (the allow-list of a filtered
+        search). Vector ids grouped by document are sorted once per store, so a
+        lookup costs O(documents * log n + result) instead of a scan.
+        """
+        if self._by_document is None:
+            order = np.argsort(self.document_id, kind="stable")
+            self._by_document = (order, self.document_id[order])
+        order, docs = self._by_document
+        wanted = np.unique(np.asarray(list(document_ids), dtype="int64"))
+        wanted = wanted[wanted >= 0]  # -1 marks vector ids without a chunk
+        lo = np.searchsorted(docs, wanted, side="left")
+        hi = np.searchsorted(docs, wanted, side="right")
+        parts = [order[a:b] for a, b in zip(lo, hi) if b > a]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype="int64")
+
+    @classmethod
+    def build(cls, db: Session, path: str, batch: int = 5000):
+        os.makedirs(path, exist_ok=True)
+        out = tempfile.mkdtemp(prefix="v-", dir=path)  # unique: concurrent builds never share files
+        max_vid = db.execute(select(func.max(Chunk.vector_id))).scalar()
+        n = (max_vid + 1) if max_vid is not None else 0
+
+        arrays = {
+            "chunk_id": np.full(n, -1, dtype="int64"),
+            "document_id": np.full(n, -1, dtype="int64"),
+            "chunk_index": np.zeros(n, dtype="int32"),
+            "page_start": np.zeros(n, dtype="int32"),
+            "page_end": np.zeros(n, dtype="int32"),
+            "offsets": np.zeros(n + 1, dtype="int64"),
+        }
+        offsets = arrays["offsets"]
+        rows = db.execute(
+            select(
+                Chunk.vector_id, Chunk.id, Chunk.document_id, Chunk.chunk_index,
+                Chunk.page_start, Chunk.page_end, Chunk.text,
+            ).order_by(Chunk.vector_id).execution_options(yield_per=batch)
+        )
+        pos = 0
+        last = -1
+        with open(os.path.join(out, "text.bin"), "wb") as f:
+            for vid, cid, did, cidx, ps, pe, text in rows:
+                offsets[last + 1:vid + 1] = pos  # holes (removed vectors) get empty spans
+                arrays["chunk_id"][vid] = cid
+                arrays["document_id"][vid] = did
+                arrays["chunk_index"][vid] = cidx
+                arrays["page_start"][vid] = ps
+                arrays["page_end"][vid] = pe
+                data = text.encode("utf-8")
+                f.write(data)
+                pos += len(data)
+                last = vid
+        offsets[last + 1:] = pos
+
+        docs = {
+            str(did): [sp, title or ""]
+            for did, sp, title in db.execute(select(Document.id, Document.source_path, Document.title))
+        }
+        with open(os.path.join(out, "documents.json"), "w", encoding="utf-8") as f:
+            json.dump(docs, f, ensure_ascii=False)
+        np.savez(os.path.join(out, "chunks.npz"), **arrays)
+        cls._publish(path, os.path.basename(out))
+
+    @classmethod
+    def _publish(cls, path: str, version: str):
+        previous = cls._current(path)
+        fd, tmp = tempfile.mkstemp(prefix=cls.CURRENT + ".", suffix=".tmp", dir=path)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(path, cls.CURRENT))
+        keep = {version, previous}
+        for name in os.listdir(path):
+            full = os.path.join(path, name)
+            if name.startswith("v-") and name not in keep:
+                shutil.rmtree(full, ignore_errors=True)
+            elif name in cls.FILES:  # flat layout of stores built before version directories
+                os.remove(full)
+
+    @classmethod
+    def _current(cls, path: str) -> str | None:
+        try:
+            with open(os.path.join(path, cls.CURRENT), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def files_dir(cls, path: str) -> str:
+        """Directory holding the live files (`path` itself for the pre-versioning flat layout)."""
+        version = cls._current(path)
+        return os.path.join(path, version) if version is not None else path
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        d = cls.files_dir(path)
+        return all(os.path.exists(os.path.join(d, f)) for f in cls.FILES)
+
+    @classmethod
+    def load(cls, path: str) -> "ChunkStore":
+        d = cls.files_dir(path)
+        with np.load(os.path.join(d, "chunks.npz")) as z:
+            arrays = {k: z[k] for k in z.files}
+        text_path = os.path.join(d, "text.bin")
+        if os.path.getsize(text_path):
+            text = np.memmap(text_path, dtype="uint8", mode="r")
+        else:
+            text = np.zeros(0, dtype="uint8")
+        with open(os.path.join(d, "documents.json"), encoding="utf-8") as f:
+            documents = {int(k): (v[0], v[1]) for k, v in json.load(f).items()}
+        return cls(arrays, text, documents)
@@ -1,6 +1,7 @@
 from __future__ import annotations
+from bisect import bisect_right
 from dataclasses import dataclass
-from typing import List
+from typing import Iterable, Iterator, List
 import re
 
 
@@ -19,7 +20,7 @@ def clean_text(s: str) -> str:
     return s.strip()
 
 
-def chunk_pages(pages: list[tuple[int, str]], chunk_size: int = 900, overlap: int = 150) -> List[ChunkOut]:
+def chunk_pages(pages: Iterable[tuple[int, str]], chunk_size: int = 900, overlap: int = 150) -> List[ChunkOut]:
     """
     pages: [(page_number, page_text), ...]
     Creates chunks by concatenating pages, splitting into approx. char-size windows with overlap.
@@ -29,49 +30,67 @@ def chunk_pages(pages: list[tuple[int, str]], chunk_size: int = 900, overlap: in
     - Char-based chunking is robust for PDFs with messy formatting.
     - If you want token-aware chunking later, you can swap this.
     """
-    full = []
-    page_map = []  # for each char segment, which page it belongs to
-    for pno, txt in pages:
-        txt = clean_text(txt)
-        if not txt:
-            continue
-        start_char = sum(len(t) for t, _ in full)
-        full.append((txt + "\n\n", pno))
-        # we store page per appended segment, and infer range later
-    merged = "".join(t for t, _ in full)
-
-    # build char -> page number approximation by segments
-    # for each segment, we know its char start/end, map range
-    ranges = []
-    cursor = 0
-    for t, pno in full:
-        ranges.append((cursor, cursor + len(t), pno))
-        cursor += len(t)
+    return list(iter_chunks(pages, chunk_size=chunk_size, overlap=overlap))
 
-    def page_for_char(idx: int) -> int:
-        # linear scan ok for typical doc sizes; can be optimized
-        for a, b, pno in ranges:
-            if a <= idx < b:
-                return pno
-        return ranges[-1][2] if ranges else 1
 
-    chunks: List[ChunkOut] = []
-    if not merged.strip():
-        return chunks
+def iter_chunks(pages: Iterable[tuple[int, str]], chunk_size: int = 900, overlap: int = 150) -> Iterator[ChunkOut]:
+    """
+    Streaming form of chunk_pages (same output, chunk for chunk).
+
+    Pages are pulled lazily and only the current window (the pages overlapping
+    [i, i + chunk_size]) is kept in memory. Char offsets map to pages with a
+    binary search over segment start offsets.
+    """
+    if overlap >= chunk_size:
+        raise ValueError(f"overlap ({overlap}) must be smaller than chunk_size ({chunk_size})")
+
+    page_iter = iter(pages)
+    buf = ""  # merged[base:]: cleaned page texts, each followed by "\n\n"
+    base = 0
+    total = 0  # len(merged) pulled so far
+    starts: list[int] = []  # merged offset where each page segment in the window starts
+    pnos: list[int] = []
+    exhausted = False
+
+    def pull() -> bool:
+        nonlocal buf, total
+        for pno, txt in page_iter:
+            txt = clean_text(txt)
+            if not txt:
+                continue
+            starts.append(total)
+            pnos.append(pno)
+            buf += txt + "\n\n"
+            total += len(txt) + 2
+            return True
+        return False
+
+    def page_for_char(idx: int) -> int:
+        return pnos[bisect_right(starts, idx) - 1]
 
     i = 0
     cidx = 0
-    n = len(merged)
-    while i < n:
-        j = min(i + chunk_size, n)
-        text = merged[i:j].strip()
+    while True:
+        # need one char past the window to know whether this is the last chunk
+        while not exhausted and total <= i + chunk_size:
+            exhausted = not pull()
+        if total == 0:
+            return
+
+        j = min(i + chunk_size, total)
+        text = buf[i - base:j - base].strip()
         if text:
-            ps = page_for_char(i)
-            pe = page_for_char(j - 1)
-            chunks.append(ChunkOut(chunk_index=cidx, page_start=ps, page_end=pe, text=text))
+            yield ChunkOut(chunk_index=cidx, page_start=page_for_char(i), page_end=page_for_char(j - 1), text=text)
             cidx += 1
-        if j == n:
-            break
+        if exhausted and j == total:
+            return
         i = max(0, j - overlap)
 
-    return chunks
+        # forget pages that end before the next window and the text before it
+        k = bisect_right(starts, i) - 1
+        if k > 0:
+            del starts[:k]
+            del pnos[:k]
+        if i - base > 4 * chunk_size:
+            buf = buf[i - base:]
+            base = i
@@ -7,16 +7,99 @@ class Settings(BaseSettings):
     data_dir: str = "./data"
     db_url: str = "sqlite:///./data/finrag.sqlite"
     faiss_index_path: str = "./data/faiss.index"
+    # SQLite connection pragmas (app/db.make_engine)
+    sqlite_wal: bool = True
+    sqlite_synchronous: str = "NORMAL"  # NORMAL is durable across app crashes in WAL mode
+    sqlite_cache_size_mb: int = 64
+    sqlite_mmap_size_mb: int = 256
+    sqlite_busy_timeout_ms: int = 5000
+    # array/mmap copy of chunk rows for the query path (app/chunk_store.py)
+    chunk_store_enabled: bool = True
+    chunk_store_dir: str = "./data/chunk_store"
+    # API polls the published index version and swaps in new snapshots (app/index_manager.py); 0 = off
+    index_reload_interval_s: float = 5.0
+
+    # FAISS index layout (see app/faiss_index.IndexConfig)
+    faiss_index_type: str = "flat"  # flat | ivf_flat | ivf_pq | hnsw | sq_fp16 | sq8
+    faiss_nlist: int = 1024
+    faiss_pq_m: int = 48  # must divide the embedding dim (384 for MiniLM)
+    faiss_pq_nbits: int = 8
+    faiss_hnsw_m: int = 32
+    faiss_ef_construction: int = 200
+    faiss_train_size: int = 0  # 0 => 39 * nlist
+    # query-time knobs
+    faiss_nprobe: int = 16
+    faiss_ef_search: int = 64
+    # lossy layouts (ivf_pq, sq_fp16, sq8): re-score this many candidates with float32 vectors; 0 = off
+    faiss_rerank_k: int = 0
+    # filtered search on ivf/hnsw: allowed sets up to this size are scored exactly instead of
+    # probing lists / walking the graph (which may reach no allowed vector under a selective filter)
+    faiss_filter_exact_max: int = 10_000
+    # API loads the index memory-mapped and read-only, shared across uvicorn workers
+    # through the page cache (flat: needs the sidecar ingest writes when this is on)
+    faiss_mmap: bool = False
+
+    # processes per PDF for page extraction in serial ingest (app/pdf_reader.py);
+    # with `ingest_cli.py --workers N` documents are already parsed in parallel
+    pdf_page_workers: int = 1
+    # extracted page texts keyed by PDF content hash (app/pdf_reader.PageTextCache)
+    page_cache_enabled: bool = True
+    page_cache_dir: str = "./data/page_cache"
+    # re-chunk without re-parsing: change these, then `ingest_cli.py --force`
+    chunk_size: int = 900
+    chunk_overlap: int = 150
 
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # length-bucketed batching (app/embeddings.plan_batches): short texts share bigger batches
+    embedding_batch_size: int = 32
+    embedding_max_batch_size: int = 256
+    embedding_max_batch_chars: int = 32_000  # texts x longest text per batch
+    # >1: spread batches over this many model processes (ingest); torch threads are split between them
+    embedding_processes: int = 1
+    # ingest-side embedding cache (app/embedding_cache.py)
+    embedding_cache_enabled: bool = True
+    embedding_cache_dir: str = "./data/embedding_cache"
+    embedding_cache_max_entries: int = 500_000
+    embedding_cache_dtype: str = "float32"  # float32 | float16 (half the disk/page cache, ~1e-3 abs error)
 
     top_k: int = 5
+    # micro-batch concurrent query embeddings + FAISS searches (app/batcher.py)
+    query_batching: bool = True
+    query_batch_max_wait_ms: float = 2.0
+    query_batch_max_size: int = 32
+    ask_batch_max_questions: int = 500  # /ask/batch request limit
+    # concurrent /ask (and /ask/stream) calls with the same normalized question share one computation
+    coalesce_requests: bool = True
     idk_threshold: float = 0.28
+    # prompt context packing (app/context_packing.py): merge neighbouring chunks, drop near-duplicates
+    # (word 3-gram Jaccard >= threshold; >1 disables), cap the context at ~N tokens (0 = no cap)
+    context_packing_enabled: bool = True
+    context_max_tokens: int = 3000
+    context_dedup_threshold: float = 0.9
+    # per-stage latency histograms + counters at /metrics and a Server-Timing header (app/metrics.py)
+    metrics_enabled: bool = True
 
     llm_provider: str = "ollama"  # ollama | openai | none
+    llm_timeout: float = 120.0
+    # max in-flight generations per provider; extra /ask requests wait instead of piling onto the LLM
+    ollama_max_concurrency: int = 4
+    openai_max_concurrency: int = 32
     ollama_base_url: str = "http://localhost:11434"
     ollama_model: str = "llama3.1:8b"
 
+    # exact-match answer cache keyed by (provider, model, temperature, prompt hash) (app/response_cache.py);
+    # entries expire after the TTL and whenever a new index version is published
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = "./data/llm_cache.sqlite"
+    llm_cache_ttl_s: float = 86_400.0
+    llm_cache_max_entries: int = 10_000
+
+    # answers of earlier questions whose query vector is within this cosine of a new one (app/semantic_cache.py);
+    # off by default: a too-low threshold returns the answer of a different question
+    semantic_cache_enabled: bool = False
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_max_entries: int = 5_000
+
     openai_api_key: str = ""
     openai_model: str = "gpt-4o-mini"
 
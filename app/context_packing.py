@@ -0,0 +1,127 @@
+from __future__ import annotations
+import re
+import zlib
+from dataclasses import replace
+import numpy as np
+
+from app.retriever import Retrieved
+
+CHARS_PER_TOKEN = 4  # rough estimate, same as the embedder's truncation guess
+BLOCK_OVERHEAD_TOKENS = 24  # "[KAYNAK i] file=... pages=... score=..." header per block
+SHINGLE_BUCKETS = 1 << 12
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def join_overlapping(a: str, b: str, max_overlap: int = 400) -> str:
+    """
+    a + b without the text they share: chunk i+1 starts with the last
+    `overlap` chars of chunk i (shifted a little by strip()).
+    """
+    probe = b[: min(40, len(b))]
+    if probe:
+        pos = a.find(probe, max(0, len(a) - max_overlap - len(probe)))
+        while pos >= 0:
+            if b.startswith(a[pos:]):
+                return a[:pos] + b
+            pos = a.find(probe, pos + 1)
+    return f"{a}\n{b}"
+
+
+def merge_adjacent(ctxs: list[Retrieved]) -> list[Retrieved]:
+    """
+    Chunks of one document with consecutive chunk_index become one block
+    (overlap removed, combined page range, best score, all chunk ids).
+    Blocks keep the order of their best-scoring chunk.
+    """
+    by_doc: dict[int, list[Retrieved]] = {}
+    for c in ctxs:
+        by_doc.setdefault(c.document_id, []).append(c)
+
+    blocks: list[Retrieved] = []
+    for doc_ctxs in by_doc.values():
+        run: list[Retrieved] = []
+        for c in sorted(doc_ctxs, key=lambda x: x.chunk_index):
+            if run and c.chunk_id == run[-1].chunk_id:  # same chunk twice: keep one
+                continue
+            if run and c.chunk_index != run[-1].chunk_index + 1:
+                blocks.append(_merge(run))
+                run = []
+            run.append(c)
+        if run:
+            blocks.append(_merge(run))
+    return sorted(blocks, key=lambda b: -b.score)
+
+
+def _merge(run: list[Retrieved]) -> Retrieved:
+    if len(run) == 1:
+        return run[0]
+    text = run[0].text
+    for c in run[1:]:
+        text = join_overlapping(text, c.text)
+    best = max(run, key=lambda c: c.score)
+    return replace(
+        best,
+        text=text,
+        page_start=min(c.page_start for c in run),
+        page_end=max(c.page_end for c in run),
+        chunk_index=run[0].chunk_index,
+        chunk_ids=tuple(cid for c in run for cid in (c.chunk_ids or (c.chunk_id,))),
+    )
+
+
+def shingle_matrix(texts: list[str], n: int = 3) -> np.ndarray:
+    """(len(texts), SHINGLE_BUCKETS) 0/1 matrix of hashed word n-grams."""
+    out = np.zeros((len(texts), SHINGLE_BUCKETS), dtype="float32")
+    for i, t in enumerate(texts):
+        words = _WORD.findall(t.casefold())
+        grams = [" ".join(words[j:j + n]) for j in range(max(1, len(words) - n + 1))]
+        out[i, [zlib.crc32(g.encode("utf-8")) % SHINGLE_BUCKETS for g in grams]] = 1.0
+    return out
+
+
+def drop_near_duplicates(blocks: list[Retrieved], threshold: float) -> list[Retrieved]:
+    """
+    Pairwise Jaccard similarity of word 3-gram sets in one matrix product;
+    a block is dropped if it is >= `threshold` similar to a better-scored one
+    (the same clause repeated in several documents or pages).
+    """
+    if len(blocks) < 2 or threshold > 1.0:
+        return blocks
+    m = shingle_matrix([b.text for b in blocks])
+    inter = m @ m.T
+    sizes = m.sum(axis=1)
+    union = sizes[:, None] + sizes[None, :] - inter
+    sim = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+    keep: list[int] = []
+    for i in range(len(blocks)):  # blocks are sorted by score
+        if not keep or sim[i, keep].max() < threshold:
+            keep.append(i)
+    return [blocks[i] for i in keep]
+
+
+def fit_budget(blocks: list[Retrieved], max_tokens: int) -> list[Retrieved]:
+    """
+    Greedy in score order: whole blocks that fit are kept, others skipped;
+    if not even the best block fits, it is cut to the budget.
+    """
+    if max_tokens <= 0:
+        return blocks
+    out, used = [], 0
+    for b in blocks:
+        cost = estimate_tokens(b.text) + BLOCK_OVERHEAD_TOKENS
+        if used + cost <= max_tokens:
+            out.append(b)
+            used += cost
+    if not out and blocks:
+        room = max(0, max_tokens - BLOCK_OVERHEAD_TOKENS) * CHARS_PER_TOKEN
+        out = [replace(blocks[0], text=blocks[0].text[:room].rstrip())]
+    return out
+
+
+def pack_contexts(ctxs: list[Retrieved], max_tokens: int, dedup_threshold: float) -> list[Retrieved]:
+    """Retrieved chunks -> prompt blocks: merge neighbours, drop near-duplicates, fit the token budget."""
+    return fit_budget(drop_near_duplicates(merge_adjacent(ctxs), dedup_threshold), max_tokens)
@@ -1,16 +1,58 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from app.config import settings
+from app.hashing import fold_case
 
 
 class Base(DeclarativeBase):
     pass
 
 
-engine = create_engine(settings.db_url, future=True)
+def _sqlite_pragmas(dbapi_conn, _record):
+    # per connection: WAL lets /ask keep reading while ingest writes
+    cur = dbapi_conn.cursor()
+    if settings.sqlite_wal:
+        cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cur.execute(f"PRAGMA cache_size=-{settings.sqlite_cache_size_mb * 1024}")  # negative = KiB
+    cur.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size_mb * 2**20}")
+    cur.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.close()
+    # SQLite's lower() / LIKE only fold ASCII; filters compare fold_case(title) instead (app/filters.py)
+    dbapi_conn.create_function("fold_case", 1, fold_case, deterministic=True)
+
+
+def make_engine(url: str = settings.db_url):
+    """create_engine + SQLite pragmas (WAL, synchronous, cache/mmap size) on every new connection."""
+    eng = create_engine(url, future=True)
+    if eng.dialect.name == "sqlite":
+        event.listen(eng, "connect", _sqlite_pragmas)
+    return eng
+
+
+engine = make_engine(settings.db_url)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
 
 
+def add_missing_columns(bind=engine):
+    """
+    create_all() never alters existing tables. Add columns introduced after a DB
+    was created (they all carry a server default, so ADD COLUMN is enough).
+    """
+    insp = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in have:
+                    ddl = CreateColumn(col).compile(dialect=bind.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+
 def get_session():
     db = SessionLocal()
     try:
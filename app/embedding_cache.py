@@ -0,0 +1,198 @@
+from __future__ import annotations
+import os
+import re
+import json
+import threading
+import numpy as np
+
+from app.config import settings
+from app.hashing import text_hash
+
+KEY_BYTES = 32  # sha256 digest of the normalized text
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (model name, normalized text hash).
+
+    One directory per model under `root`:
+      vectors.bin     memmap (capacity, dim) float32|float16
+      keys.bin        memmap (capacity, 32) uint8, sha256 digest per slot (zeros = free)
+      last_used.npy   LRU clock per slot (persisted on flush)
+      meta.json       dim / dtype / capacity
+
+    A slot's key is written after its vector, so lookups never return a vector
+    that belongs to a different text. When `max_entries` is reached the least
+    recently used ~5% of slots are recycled.
+    """
+
+    def __init__(self, root: str, model_name: str, dim: int, max_entries: int = 500_000, dtype: str = "float32"):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype!r}")
+        self.dir = os.path.join(root, re.sub(r"[^A-Za-z0-9._-]+", "_", model_name))
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+        self._open()
+
+    # ---- storage ----
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def _open(self):
+        meta = {}
+        if os.path.exists(self._path("meta.json")):
+            with open(self._path("meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        if meta.get("dim") != self.dim or meta.get("dtype") != self.dtype.name:
+            # different model geometry or storage dtype: start over
+            for name in ("vectors.bin", "keys.bin", "last_used.npy"):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+            meta = {"dim": self.dim, "dtype": self.dtype.name, "capacity": 0}
+        self.capacity = int(meta["capacity"])
+        self._map_files()
+
+        self._slots: dict[bytes, int] = {}
+        if self.capacity:
+            raw = self._keys.tobytes()
+            for slot in np.flatnonzero(self._keys.any(axis=1)):
+                self._slots[raw[slot * KEY_BYTES:(slot + 1) * KEY_BYTES]] = int(slot)
+        self._last_used = np.zeros(self.capacity, dtype="int64")
+        if os.path.exists(self._path("last_used.npy")):
+            lu = np.load(self._path("last_used.npy"))
+            self._last_used[: min(len(lu), self.capacity)] = lu[: self.capacity]
+        self._clock = int(self._last_used.max()) if self.capacity else 0
+        # popped from the end: lowest free slot first
+        self._free = np.flatnonzero(~self._keys.any(axis=1))[::-1].tolist() if self.capacity else []
+
+    def _map_files(self):
+        if not self.capacity:
+            self._vecs = np.zeros((0, self.dim), dtype=self.dtype)
+            self._keys = np.zeros((0, KEY_BYTES), dtype="uint8")
+            return
+        for name, row_bytes in (("vectors.bin", self.dim * self.dtype.itemsize), ("keys.bin", KEY_BYTES)):
+            path = self._path(name)
+            size = self.capacity * row_bytes
+            with open(path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+        self._vecs = np.memmap(self._path("vectors.bin"), dtype=self.dtype, mode="r+", shape=(self.capacity, self.dim))
+        self._keys = np.memmap(self._path("keys.bin"), dtype="uint8", mode="r+", shape=(self.capacity, KEY_BYTES))
+
+    def _grow(self, need: int):
+        new_cap = min(self.max_entries, max(1024, self.capacity * 2, self.capacity + need))
+        if new_cap <= self.capacity:
+            return
+        self._flush_maps()
+        old = self.capacity
+        self.capacity = new_cap
+        self._map_files()
+        self._last_used = np.concatenate([self._last_used, np.zeros(new_cap - old, dtype="int64")])
+        self._free.extend(range(new_cap - 1, old - 1, -1))
+        self._write_meta()
+
+    def _evict(self, need: int):
+        used = np.flatnonzero(self._keys.any(axis=1))
+        n = min(len(used), max(need, self.max_entries // 20))
+        victims = used[np.argpartition(self._last_used[used], n - 1)[:n]] if n else used[:0]
+        for slot in victims:
+            self._slots.pop(self._keys[slot].tobytes(), None)
+            self._keys[slot] = 0
+            self._free.append(int(slot))
+
+    def _alloc(self, n: int) -> list[int]:
+        if len(self._free) < n:
+            self._grow(n - len(self._free))
+        if len(self._free) < n:
+            self._evict(n - len(self._free))
+        return [self._free.pop() for _ in range(min(n, len(self._free)))]
+
+    # ---- API ----
+    @staticmethod
+    def key(text: str) -> bytes:
+        return bytes.fromhex(text_hash(text))
+
+    def lookup(self, texts: list[str]) -> tuple[np.ndarray, list[int]]:
+        """Returns (float32 vectors with cached rows filled in, indices of texts not in cache)."""
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        missing: list[int] = []
+        with self._lock:
+            self._clock += 1
+            for i, t in enumerate(texts):
+                slot = self._slots.get(self.key(t))
+                if slot is None:
+                    missing.append(i)
+                    continue
+                out[i] = self._vecs[slot]
+                self._last_used[slot] = self._clock
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return out, missing
+
+    def store(self, texts: list[str], vecs: np.ndarray):
+        with self._lock:
+            todo: dict[bytes, int] = {}
+            for i, t in enumerate(texts):
+                k = self.key(t)
+                if k not in self._slots:
+                    todo.setdefault(k, i)
+            slots = self._alloc(len(todo))
+            self._clock += 1
+            for (k, i), slot in zip(todo.items(), slots):
+                self._keys[slot] = 0
+                self._vecs[slot] = vecs[i]
+                self._keys[slot] = np.frombuffer(k, dtype="uint8")
+                self._slots[k] = slot
+                self._last_used[slot] = self._clock
+
+    def _flush_maps(self):
+        if isinstance(self._vecs, np.memmap):
+            self._vecs.flush()
+            self._keys.flush()
+
+    def _write_meta(self):
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype.name, "capacity": self.capacity}, f)
+        os.replace(tmp, self._path("meta.json"))
+
+    def flush(self):
+        with self._lock:
+            self._flush_maps()
+            tmp = self._path("last_used.tmp.npy")
+            np.save(tmp, self._last_used)
+            os.replace(tmp, self._path("last_used.npy"))
+            self._write_meta()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "capacity": self.capacity,
+            "max_entries": self.max_entries,
+            "dtype": self.dtype.name,
+            "bytes": self.capacity * (self.dim * self.dtype.itemsize + KEY_BYTES),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def build_embedding_cache(dim: int) -> EmbeddingCache | None:
+    if not settings.embedding_cache_enabled:
+        return None
+    return EmbeddingCache(
+        settings.embedding_cache_dir,
+        settings.embedding_model,
+        dim,
+        max_entries=settings.embedding_cache_max_entries,
+        dtype=settings.embedding_cache_dtype,
+    )
@@ -1,22 +1,139 @@
 from __future__ import annotations
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from sentence_transformers import SentenceTransformer
 import numpy as np
 from app.config import settings
+from app.embedding_cache import build_embedding_cache
+from app import metrics
+
+
+def plan_batches(lengths: list[int], max_batch_size: int, max_batch_chars: int) -> list[np.ndarray]:
+    """
+    Length-bucketed batches: texts sorted by length (longest first), each batch
+    closed once it has `max_batch_size` texts or its padded size (texts x
+    longest text) would exceed `max_batch_chars`. Short texts therefore share
+    large batches, long ones small batches. Returns index arrays into the input.
+    """
+    order = np.argsort(-np.asarray(lengths, dtype="int64"), kind="stable")
+    batches, start = [], 0
+    while start < len(order):
+        longest = max(1, lengths[order[start]])
+        n = max(1, min(max_batch_size, max_batch_chars // longest))
+        batches.append(order[start:start + n])
+        start += n
+    return batches
+
+
+# ---- pool workers (one model per process) ----
+_worker_model: SentenceTransformer | None = None
+
+
+def _init_worker(model_name: str, threads: int):
+    global _worker_model
+    import torch
+
+    torch.set_num_threads(threads)  # processes x threads = cores, no oversubscription
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_batch(texts: list[str]) -> np.ndarray:
+    return _worker_model.encode(
+        texts, batch_size=len(texts), show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True
+    ).astype("float32")
 
 
 class Embedder:
-    def __init__(self):
+    def __init__(self, use_cache: bool = False, processes: int | None = None, mp_context: str = "spawn"):
         self.model = SentenceTransformer(settings.embedding_model)
+        # on-disk cache keyed by (model, text hash); ingest turns it on, queries don't need it
+        self.cache = build_embedding_cache(self.dim()) if use_cache else None
+        self.batch_size = settings.embedding_batch_size
+        self.max_batch_size = max(self.batch_size, settings.embedding_max_batch_size)
+        self.max_batch_chars = settings.embedding_max_batch_chars
+        # beyond the model's window the text is truncated anyway (~4 chars per token)
+        self.max_chars = int(getattr(self.model, "max_seq_length", 0) or 0) * 4 or None
+        self.processes = settings.embedding_processes if processes is None else processes
+        self._mp_context = mp_context
+        self._pool: ProcessPoolExecutor | None = None
+        self.texts_encoded = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self._chars = 0
+        self._padded_chars = 0
 
     def encode(self, texts: list[str]) -> np.ndarray:
-        vecs = self.model.encode(
-            texts,
-            batch_size=32,
-            show_progress_bar=False,
-            convert_to_numpy=True,
-            normalize_embeddings=True,  # cosine similarity via dot product
-        )
-        return vecs.astype("float32")
+        if self.cache is None:
+            return self._encode(texts)
+        vecs, missing = self.cache.lookup(texts)
+        metrics.inc(metrics.CACHE, "embedding", "hit", amount=len(texts) - len(missing))
+        metrics.inc(metrics.CACHE, "embedding", "miss", amount=len(missing))
+        if missing:
+            # encode each distinct unseen text once
+            uniq = list(dict.fromkeys(texts[i] for i in missing))
+            fresh = self._encode(uniq)
+            self.cache.store(uniq, fresh)
+            row = {t: j for j, t in enumerate(uniq)}
+            for i in missing:
+                vecs[i] = fresh[row[texts[i]]]
+        return vecs
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dim()), dtype="float32")
+        t0 = time.perf_counter()
+        lengths = [min(len(t), self.max_chars) if self.max_chars else len(t) for t in texts]
+        batches = plan_batches(lengths, self.max_batch_size, self.max_batch_chars)
+        out = np.empty((len(texts), self.dim()), dtype="float32")
+        if self.processes > 1 and len(batches) > 1:
+            pool = self._ensure_pool()
+            futures = [pool.submit(_encode_batch, [texts[i] for i in idx]) for idx in batches]
+            for idx, fut in zip(batches, futures):
+                out[idx] = fut.result()  # scatter back to input order
+        else:
+            for idx in batches:
+                out[idx] = self.model.encode(
+                    [texts[i] for i in idx],
+                    batch_size=len(idx),
+                    show_progress_bar=False,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,  # cosine similarity via dot product
+                )
+        self.seconds += time.perf_counter() - t0
+        self.texts_encoded += len(texts)
+        self.batches += len(batches)
+        self._chars += sum(lengths)
+        self._padded_chars += sum(len(idx) * max(1, lengths[idx[0]]) for idx in batches)
+        return out
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.processes)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context(self._mp_context),
+                initializer=_init_worker,
+                initargs=(settings.embedding_model, threads),
+            )
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "texts": self.texts_encoded,
+            "batches": self.batches,
+            "seconds": self.seconds,
+            "texts_per_s": self.texts_encoded / self.seconds if self.seconds else 0.0,
+            "processes": self.processes,
+            # useful characters / characters incl. padding to the longest text in the batch
+            "padding_efficiency": self._chars / self._padded_chars if self._padded_chars else 1.0,
+        }
 
     def dim(self) -> int:
         # encode a dummy string once if needed
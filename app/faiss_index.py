@@ -1,51 +1,588 @@
 from __future__ import annotations
 import os
+import json
+from dataclasses import dataclass, replace
 import numpy as np
 import faiss
 
+from app.config import settings
+
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq_fp16", "sq8")
+# layouts whose scores are approximate; rerank_k > 0 re-scores their top hits with float32 vectors
+LOSSY_TYPES = ("ivf_pq", "sq_fp16", "sq8")
+# layouts that visit only part of the vectors per query
+APPROXIMATE_TYPES = ("ivf_flat", "ivf_pq", "hnsw")
+
+
+@dataclass
+class IndexConfig:
+    """
+    Index layout (build time) + search knobs (query time).
+
+    flat      exact IndexFlatIP, linear scan, 4*dim bytes/vector
+    ivf_flat  inverted lists over nlist centroids, probes `nprobe` lists per query
+    ivf_pq    ivf_flat with product-quantized codes (pq_m bytes/vector at 8 bits)
+    hnsw      graph index, `ef_search` candidates per query, no native delete
+    sq_fp16   exact scan over float16 scalar-quantized vectors, 2*dim bytes/vector
+    sq8       exact scan over 8-bit scalar-quantized vectors, dim bytes/vector
+
+    rerank_k > 0 (lossy layouts only): fetch max(top_k, rerank_k) candidates
+    and re-score them with the float32 vectors kept in an on-disk sidecar
+    (memory-mapped, so only the candidates' rows are read).
+    """
+    index_type: str = "flat"
+    nlist: int = 1024
+    pq_m: int = 48
+    pq_nbits: int = 8
+    hnsw_m: int = 32
+    ef_construction: int = 200
+    nprobe: int = 16
+    ef_search: int = 64
+    train_size: int = 0  # 0 => 39 * nlist, FAISS' own guidance for k-means
+    rerank_k: int = 0
+
+    @classmethod
+    def from_settings(cls, **overrides) -> "IndexConfig":
+        cfg = cls(
+            index_type=settings.faiss_index_type,
+            nlist=settings.faiss_nlist,
+            pq_m=settings.faiss_pq_m,
+            pq_nbits=settings.faiss_pq_nbits,
+            hnsw_m=settings.faiss_hnsw_m,
+            ef_construction=settings.faiss_ef_construction,
+            nprobe=settings.faiss_nprobe,
+            ef_search=settings.faiss_ef_search,
+            train_size=settings.faiss_train_size,
+            rerank_k=settings.faiss_rerank_k,
+        )
+        return replace(cfg, **overrides)
+
+    def factory_string(self) -> str:
+        t = self.index_type
+        if t == "flat":
+            return "IDMap2,Flat"
+        if t == "ivf_flat":
+            return f"IVF{self.nlist},Flat"
+        if t == "ivf_pq":
+            return f"IVF{self.nlist},PQ{self.pq_m}x{self.pq_nbits}"
+        if t == "hnsw":
+            return f"IDMap2,HNSW{self.hnsw_m},Flat"
+        if t == "sq_fp16":
+            return "IDMap2,SQfp16"
+        if t == "sq8":
+            return "IDMap2,SQ8"
+        raise ValueError(f"Unknown FAISS index type: {t!r} (expected one of {INDEX_TYPES})")
+
+    def min_train(self) -> int:
+        if self.index_type == "ivf_flat":
+            return self.nlist
+        if self.index_type == "ivf_pq":
+            return max(self.nlist, 2 ** self.pq_nbits)
+        if self.index_type == "sq8":
+            return 1  # per-dimension min/max
+        return 0
+
+
+def exact_sidecar(index_path: str, part: str) -> str:
+    """
+    Float32 vectors sorted by id next to the index: <index>.exact-ids.npy,
+    <index>.exact-vectors.npy and <index>.exact.json (layout it belongs to).
+    Flat indexes get one for mmap loading, lossy ones for reranking.
+    """
+    return f"{index_path}.exact-{part}.npy" if part != "meta" else f"{index_path}.exact.json"
+
+
+def read_sidecar_meta(index_path: str) -> dict | None:
+    try:
+        with open(exact_sidecar(index_path, "meta"), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def open_sidecar(index_path: str) -> tuple[np.ndarray, np.ndarray]:
+    ids = np.load(exact_sidecar(index_path, "ids"), mmap_mode="r")
+    vectors = np.load(exact_sidecar(index_path, "vectors"), mmap_mode="r")
+    if len(ids) != len(vectors):
+        raise ValueError(f"Exact-vector sidecar of {index_path} is inconsistent: {len(ids)} ids, {len(vectors)} vectors")
+    return ids, vectors
+
+
+class MmapFlatIndex:
+    """
+    Read-only exact inner-product search over the memory-mapped flat sidecar.
+
+    FAISS 1.8 can only mmap IVF inverted lists; IndexFlat is always copied
+    into the heap. Here the vectors stay in the OS page cache, so every
+    process mapping the same files shares one copy and loading is O(1).
+    Exposes the subset of the FAISS index API that FaissStore uses.
+    """
+    is_trained = True
+
+    def __init__(self, ids: np.ndarray, vectors: np.ndarray, block: int = 65536):
+        self.id_array = ids
+        self.vectors = vectors
+        self.ntotal = len(ids)
+        self.d = vectors.shape[1]
+        self.block = block
+
+    @classmethod
+    def open(cls, index_path: str) -> "MmapFlatIndex":
+        return cls(*open_sidecar(index_path))
+
+    def rows_of(self, ids: np.ndarray) -> np.ndarray:
+        """Positions of the given (sorted) vector ids; ids not in the index are skipped."""
+        id_array = np.asarray(self.id_array)
+        if not len(id_array):
+            return np.empty(0, dtype="int64")
+        pos = np.minimum(np.searchsorted(id_array, ids), len(id_array) - 1)
+        return pos[id_array[pos] == ids]
+
+    def search(self, q: np.ndarray, k: int, rows: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """`rows`: score only these positions (filtered search), gathered block by block."""
+        nq = len(q)
+        n = self.ntotal if rows is None else len(rows)
+        scores = np.full((nq, k), np.finfo("float32").min, dtype="float32")
+        pos = np.full((nq, k), -1, dtype="int64")
+        # block-wise so the (nq, n) score matrix is never materialized
+        for a in range(0, n, self.block):
+            block = self.vectors[a:a + self.block] if rows is None else self.vectors[rows[a:a + self.block]]
+            s = q @ block.T
+            kk = min(k, s.shape[1])
+            top = np.argpartition(-s, kk - 1, axis=1)[:, :kk]
+            cand_s = np.concatenate([scores, np.take_along_axis(s, top, axis=1)], axis=1)
+            cand_p = np.concatenate([pos, top + a], axis=1)
+            keep = np.argpartition(-cand_s, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(cand_s, keep, axis=1)
+            pos = np.take_along_axis(cand_p, keep, axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")
+        scores = np.take_along_axis(scores, order, axis=1)
+        pos = np.take_along_axis(pos, order, axis=1)
+        found = pos >= 0
+        if rows is not None:
+            pos = np.where(found, rows[np.maximum(pos, 0)] if len(rows) else 0, -1)
+        ids = np.where(found, np.asarray(self.id_array)[np.maximum(pos, 0)], -1)
+        return scores, ids
+
+
+def allow_bitmap(ids: np.ndarray) -> np.ndarray:
+    """Bit i set <=> vector id i allowed; the layout faiss.IDSelectorBitmap reads."""
+    mask = np.zeros(int(ids.max()) + 1 if len(ids) else 0, dtype=bool)
+    mask[ids] = True
+    return np.packbits(mask, bitorder="little")
+
+
+def build_index(dim: int, cfg: IndexConfig):
+    index = faiss.index_factory(dim, cfg.factory_string(), faiss.METRIC_INNER_PRODUCT)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        # IVF keeps our vector ids natively; the hashtable enables reconstruct() + remove_ids()
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+    if cfg.index_type == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efConstruction = cfg.ef_construction
+    return index
+
+
+def index_type_of(index) -> str:
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return "ivf_pq" if isinstance(faiss.downcast_index(ivf), faiss.IndexIVFPQ) else "ivf_flat"
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexScalarQuantizer):
+        return "sq_fp16" if inner.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    return "flat"
+
+
+def config_of(index, base: IndexConfig) -> IndexConfig:
+    """Build-time parameters are read back from the index; search knobs come from `base`."""
+    cfg = replace(base, index_type=index_type_of(index))
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        cfg.nlist = ivf.nlist
+        pq = faiss.downcast_index(ivf)
+        if isinstance(pq, faiss.IndexIVFPQ):
+            cfg.pq_m, cfg.pq_nbits = pq.pq.M, pq.pq.nbits
+    elif cfg.index_type == "hnsw":
+        hnsw = faiss.downcast_index(index.index).hnsw
+        cfg.ef_construction = hnsw.efConstruction
+    return cfg
+
 
 class FaissStore:
     """
     Maintains a FAISS index where vector_id corresponds to Chunk.vector_id in DB.
-    We use IndexFlatIP on normalized embeddings => cosine similarity.
+    Vectors are normalized embeddings, so inner product == cosine similarity.
+    The index layout is chosen by IndexConfig (FAISS_INDEX_TYPE); vector ids are
+    explicit so vectors of changed chunks can be removed by vector_id.
+
+    IVF indexes need training: vectors are buffered until `train_size` of them
+    arrived (or until the first save/search), then the index is trained on the
+    buffer and filled.
+
+    `load(..., mmap=True)` returns a read-only store whose vectors are shared
+    through the page cache (IVF lists via FAISS mmap, flat via the sidecar).
+
+    Lossy layouts with rerank_k > 0 also keep the float32 originals: new ones
+    in memory until save, saved ones in the memory-mapped exact sidecar.
     """
-    def __init__(self, dim: int):
+    def __init__(self, dim: int, config: IndexConfig | None = None):
         self.dim = dim
-        self.index = faiss.IndexFlatIP(dim)
+        self.config = config or IndexConfig.from_settings()
+        self.index = build_index(dim, self.config)
         self._next_id = 0
+        self._pending: list[tuple[np.ndarray, np.ndarray]] = []  # (ids, vectors) awaiting training
+        self._removed: set[int] = set()  # HNSW tombstones, compacted on flush
+        # float32 originals for reranking: sidecar (sorted ids, vectors) + not yet saved parts
+        self._exact: tuple[np.ndarray, np.ndarray] | None = None
+        self._exact_new: list[tuple[np.ndarray, np.ndarray]] = []
+        self._exact_dropped: set[int] = set()
+        self.read_only = False
+        self.set_search_params()
+
+    @property
+    def index_type(self) -> str:
+        return self.config.index_type
+
+    @property
+    def keeps_exact(self) -> bool:
+        return self.config.rerank_k > 0 and self.index_type in LOSSY_TYPES
 
     @property
     def ntotal(self) -> int:
-        return self.index.ntotal
+        return self.index.ntotal + sum(len(ids) for ids, _ in self._pending) - len(self._removed)
+
+    def set_search_params(self, nprobe: int | None = None, ef_search: int | None = None):
+        if nprobe is not None:
+            self.config.nprobe = nprobe
+        if ef_search is not None:
+            self.config.ef_search = ef_search
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            ivf = faiss.extract_index_ivf(self.index)
+            ivf.nprobe = min(self.config.nprobe, ivf.nlist)
+        if self.index_type == "hnsw":
+            faiss.downcast_index(self.index.index).hnsw.efSearch = self.config.ef_search
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("FAISS index was loaded memory-mapped (read-only); load it with mmap=False to modify.")
 
     def add(self, vectors: np.ndarray) -> list[int]:
+        self._check_writable()
         if vectors.dtype != np.float32:
             vectors = vectors.astype("float32")
         if vectors.ndim != 2 or vectors.shape[1] != self.dim:
             raise ValueError(f"Bad vectors shape: {vectors.shape}, expected (*, {self.dim})")
 
-        ids = list(range(self._next_id, self._next_id + vectors.shape[0]))
-        self.index.add(vectors)
+        ids = np.arange(self._next_id, self._next_id + vectors.shape[0], dtype="int64")
+        self._add_with_ids(vectors, ids)
         self._next_id += vectors.shape[0]
+        return ids.tolist()
+
+    def _add_with_ids(self, vectors: np.ndarray, ids: np.ndarray):
+        if self.keeps_exact:
+            order = np.argsort(ids, kind="stable")
+            self._exact_new.append((ids[order], np.array(vectors[order], dtype="float32")))
+        if self.index.is_trained and not self._pending:
+            self.index.add_with_ids(vectors, ids)
+            return
+        self._pending.append((ids, np.ascontiguousarray(vectors)))
+        train_size = self.config.train_size or 39 * self.config.nlist
+        if sum(len(i) for i, _ in self._pending) >= train_size:
+            self._flush()
+
+    def remove(self, vector_ids: list[int]) -> int:
+        if not len(vector_ids):
+            return 0
+        self._check_writable()
+        drop = np.asarray(vector_ids, dtype="int64")
+        removed = 0
+        if self.keeps_exact:
+            masks = [~np.isin(i, drop) for i, _ in self._exact_new]
+            self._exact_new = [(i[m], v[m]) for (i, v), m in zip(self._exact_new, masks)]
+            self._exact_dropped.update(drop.tolist())
+        if self._pending:
+            kept = []
+            for ids, vecs in self._pending:
+                mask = ~np.isin(ids, drop)
+                removed += int((~mask).sum())
+                if mask.any():
+                    kept.append((ids[mask], vecs[mask]))
+            self._pending = kept
+        if self.index_type == "hnsw":
+            live = np.isin(drop, self._index_ids()) & ~np.isin(drop, list(self._removed))
+            self._removed.update(drop[live].tolist())
+            return removed + int(live.sum())
+        return removed + int(self.index.remove_ids(drop))
+
+    def _index_ids(self) -> np.ndarray:
+        if isinstance(self.index, MmapFlatIndex):
+            return np.asarray(self.index.id_array, dtype="int64")
+        if isinstance(self.index, faiss.IndexIDMap2):
+            return faiss.vector_to_array(self.index.id_map).astype("int64")
+        invlists = faiss.extract_index_ivf(self.index).invlists
+        parts = [
+            faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+            for l in range(invlists.nlist)
+            if invlists.list_size(l)
+        ]
+        return np.concatenate(parts).astype("int64") if parts else np.empty(0, dtype="int64")
+
+    def ids(self) -> np.ndarray:
+        ids = np.concatenate([self._index_ids()] + [i for i, _ in self._pending])
+        if self._removed:
+            ids = ids[~np.isin(ids, list(self._removed))]
         return ids
 
-    def search(self, query_vec: np.ndarray, top_k: int):
-        if query_vec.ndim == 1:
-            query_vec = query_vec.reshape(1, -1)
-        if query_vec.dtype != np.float32:
-            query_vec = query_vec.astype("float32")
-        scores, idxs = self.index.search(query_vec, top_k)
-        return scores[0].tolist(), idxs[0].tolist()
+    def vectors(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (vector_ids, vectors). Exact for flat / ivf_flat / hnsw, PQ-decoded
+        approximations for ivf_pq.
+        """
+        ids = self._index_ids()
+        if not len(ids):
+            vecs = np.empty((0, self.dim), dtype="float32")
+        elif isinstance(self.index, MmapFlatIndex):
+            vecs = np.asarray(self.index.vectors, dtype="float32")
+        elif isinstance(self.index, faiss.IndexIDMap2):
+            vecs = self.index.index.reconstruct_n(0, self.index.ntotal)
+        else:
+            vecs = self.index.reconstruct_batch(ids)
+        ids = np.concatenate([ids] + [i for i, _ in self._pending])
+        vecs = np.concatenate([vecs] + [v for _, v in self._pending]) if self._pending else vecs
+        if self._removed:
+            mask = ~np.isin(ids, list(self._removed))
+            ids, vecs = ids[mask], vecs[mask]
+        return ids, vecs
+
+    def flush(self):
+        """Train on and add the buffered vectors now instead of on the next search / save."""
+        self._check_writable()
+        self._flush()
 
-    def save(self, path: str):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        faiss.write_index(self.index, path)
+    def _flush(self):
+        """Train on buffered vectors if needed, add them, and compact HNSW tombstones."""
+        if self._removed:
+            ids, vecs = self.vectors()
+            self._removed = set()
+            self._pending = []
+            self.index = build_index(self.dim, self.config)
+            self.set_search_params()
+            if len(ids):
+                self.index.add_with_ids(vecs, ids)
+        if not self._pending:
+            return
+        ids = np.concatenate([i for i, _ in self._pending])
+        vecs = np.concatenate([v for _, v in self._pending])
+        if not self.index.is_trained:
+            need = self.config.min_train()
+            if len(vecs) < need:
+                raise ValueError(
+                    f"{self.index_type} index with nlist={self.config.nlist} needs at least {need} "
+                    f"training vectors, got {len(vecs)}. Lower FAISS_NLIST or use FAISS_INDEX_TYPE=flat."
+                )
+            self.index.train(vecs)
+        self.index.add_with_ids(vecs, ids)
+        self._pending = []
+
+    def search(self, query_vec: np.ndarray, top_k: int, allowed: np.ndarray | None = None):
+        scores, idxs = self.search_many(query_vec, top_k, allowed=allowed)
+        return scores[0], idxs[0]
+
+    def search_many(
+        self, query_vecs: np.ndarray, top_k: int, allowed: np.ndarray | None = None
+    ) -> tuple[list[list[float]], list[list[int]]]:
+        """
+        One FAISS call for a (n, dim) query matrix; row i holds the hits of query i.
+        `allowed`: sorted vector ids; only these can be returned (filtered search).
+        """
+        if query_vecs.ndim == 1:
+            query_vecs = query_vecs.reshape(1, -1)
+        if query_vecs.dtype != np.float32:
+            query_vecs = query_vecs.astype("float32")
+        self._flush()
+        if allowed is not None:
+            scores, idxs = self._search_filtered(query_vecs, top_k, np.asarray(allowed, dtype="int64"))
+        elif self.keeps_exact and self.config.rerank_k > top_k:
+            scores, idxs = self.index.search(query_vecs, self.config.rerank_k)
+            scores, idxs = self._rerank(query_vecs, scores, idxs, top_k)
+        else:
+            scores, idxs = self.index.search(query_vecs, top_k)
+        return scores.tolist(), idxs.tolist()
+
+    def _search_filtered(self, q: np.ndarray, top_k: int, allowed: np.ndarray):
+        """
+        The filter is applied inside the search, so top_k allowed hits come back
+        without over-fetching. Exhaustive layouts skip the other ids via an
+        IDSelectorBitmap. IVF probes and the HNSW walk may reach few or no
+        allowed vectors under a selective filter, so up to FAISS_FILTER_EXACT_MAX
+        allowed ids are scored directly instead (fewer vectors than a probe).
+        """
+        if not len(allowed):
+            return (
+                np.full((len(q), top_k), np.finfo("float32").min, dtype="float32"),
+                np.full((len(q), top_k), -1, dtype="int64"),
+            )
+        if isinstance(self.index, MmapFlatIndex):
+            return self.index.search(q, top_k, rows=self.index.rows_of(allowed))
+        if self.index_type in APPROXIMATE_TYPES and len(allowed) <= settings.faiss_filter_exact_max:
+            try:
+                return self._search_subset(q, top_k, allowed)
+            except RuntimeError:
+                pass  # an allowed id is not in this index (DB ahead of the snapshot): use the selector
+        bits = allow_bitmap(allowed)  # must outlive the search: the selector only points at it
+        sel = faiss.IDSelectorBitmap(len(bits), faiss.swig_ptr(bits))
+        k = self.config.rerank_k if self.keeps_exact and self.config.rerank_k > top_k else top_k
+        scores, idxs = self.index.search(q, k, params=self._search_params(sel))
+        if k > top_k:
+            scores, idxs = self._rerank(q, scores, idxs, top_k)
+        return scores, idxs
+
+    def _search_params(self, sel):
+        # explicit search parameters replace the index's own nprobe / efSearch
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            return faiss.SearchParametersIVF(sel=sel, nprobe=self.config.nprobe)
+        if self.index_type == "hnsw":
+            return faiss.SearchParametersHNSW(sel=sel, efSearch=self.config.ef_search)
+        return faiss.SearchParameters(sel=sel)
+
+    def _search_subset(self, q: np.ndarray, top_k: int, ids: np.ndarray):
+        """Exact scores against the vectors of `ids` (float32 originals where kept, else reconstructed)."""
+        if self.keeps_exact:
+            vecs, found = self._lookup_exact(ids)
+            if not found.all():
+                vecs[~found] = self.index.reconstruct_batch(ids[~found])
+        else:
+            vecs = self.index.reconstruct_batch(ids)
+        s = q @ vecs.T
+        k = min(top_k, len(ids))
+        top = np.argpartition(-s, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(top, np.argsort(-np.take_along_axis(s, top, axis=1), axis=1, kind="stable"), axis=1)
+        scores = np.full((len(q), top_k), np.finfo("float32").min, dtype="float32")
+        idxs = np.full((len(q), top_k), -1, dtype="int64")
+        scores[:, :k] = np.take_along_axis(s, top, axis=1)
+        idxs[:, :k] = ids[top]
+        return scores, idxs
+
+    def _rerank(self, q: np.ndarray, scores: np.ndarray, idxs: np.ndarray, top_k: int):
+        """Exact float32 re-scoring of the candidates; ids without a stored original keep their approximate score."""
+        exact, found = self._lookup_exact(idxs.ravel())
+        s = np.einsum("qkd,qd->qk", exact.reshape(*idxs.shape, self.dim), q)
+        s = np.where(found.reshape(idxs.shape), s, scores)
+        s[idxs < 0] = np.finfo("float32").min
+        order = np.argsort(-s, axis=1, kind="stable")[:, :top_k]
+        return np.take_along_axis(s, order, axis=1), np.take_along_axis(idxs, order, axis=1)
+
+    def _lookup_exact(self, ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        out = np.zeros((len(ids), self.dim), dtype="float32")
+        found = np.zeros(len(ids), dtype=bool)
+        parts = ([self._exact] if self._exact is not None else []) + self._exact_new
+        for part_ids, part_vecs in parts:  # every part is sorted by id
+            if not len(part_ids):
+                continue
+            pos = np.minimum(np.searchsorted(part_ids, ids), len(part_ids) - 1)
+            hit = (part_ids[pos] == ids) & ~found
+            out[hit] = part_vecs[pos[hit]]  # fancy indexing reads only these rows of the mmap
+            found |= hit
+        return out, found
+
+    def _exact_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        """All float32 originals to persist, sorted by id (flat: the index itself)."""
+        if self.index_type not in LOSSY_TYPES:
+            ids, vecs = self.vectors()
+        else:
+            parts = ([self._exact] if self._exact is not None else []) + self._exact_new
+            ids = np.concatenate([np.asarray(i, dtype="int64") for i, _ in parts] or [np.empty(0, "int64")])
+            vecs = np.concatenate([np.asarray(v) for _, v in parts] or [np.empty((0, self.dim), "float32")])
+            if self._exact_dropped:
+                keep = ~np.isin(ids, list(self._exact_dropped))
+                ids, vecs = ids[keep], vecs[keep]
+        order = np.argsort(ids, kind="stable")
+        return ids[order], np.ascontiguousarray(vecs[order], dtype="float32")
+
+    def save(self, path: str, flat_sidecar_enabled: bool | None = None):
+        """
+        Writes to a temp file and renames it, so readers never see a partial
+        index. The exact-vector sidecar is written for flat indexes when
+        FAISS_MMAP is on and for lossy ones with rerank_k > 0; a sidecar that
+        would go stale is removed.
+        """
+        self._check_writable()
+        self._flush()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if flat_sidecar_enabled is None:
+            flat_sidecar_enabled = settings.faiss_mmap
+        if (flat_sidecar_enabled and self.index_type == "flat") or self.keeps_exact:
+            ids, vecs = self._exact_arrays()
+            for part, arr in (("ids", ids), ("vectors", vecs)):
+                tmp = exact_sidecar(path, part) + ".tmp.npy"
+                np.save(tmp, arr)
+                os.replace(tmp, exact_sidecar(path, part))
+            tmp = exact_sidecar(path, "meta") + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"index_type": self.index_type, "dim": self.dim, "count": len(ids)}, f)
+            os.replace(tmp, exact_sidecar(path, "meta"))
+            if self.keeps_exact:
+                self._exact = open_sidecar(path)
+                self._exact_new, self._exact_dropped = [], set()
+        else:
+            for part in ("ids", "vectors", "meta"):
+                if os.path.exists(exact_sidecar(path, part)):
+                    os.remove(exact_sidecar(path, part))
+        tmp = path + ".tmp"
+        faiss.write_index(self.index, tmp)
+        os.replace(tmp, path)
 
     @classmethod
-    def load(cls, path: str) -> "FaissStore":
+    def from_vectors(cls, ids: np.ndarray, vectors: np.ndarray, config: IndexConfig) -> "FaissStore":
+        """Build a fresh index of `config` layout from existing (ids, vectors)."""
+        obj = cls(vectors.shape[1], replace(config))
+        if len(ids):
+            obj._add_with_ids(np.ascontiguousarray(vectors, dtype="float32"), np.asarray(ids, dtype="int64"))
+            obj._flush()
+            obj._next_id = int(np.max(ids)) + 1
+        return obj
+
+    @classmethod
+    def load(cls, path: str, config: IndexConfig | None = None, mmap: bool = False) -> "FaissStore":
+        base = config or IndexConfig.from_settings()
+        if mmap:
+            return cls._load_mmap(path, base)
         index = faiss.read_index(path)
         dim = index.d
-        obj = cls(dim)
+        if index_type_of(index) == "flat" and not isinstance(index, faiss.IndexIDMap2):
+            # index written before vector ids were explicit: ids were positions
+            legacy = index
+            index = build_index(dim, replace(base, index_type="flat"))
+            index.add_with_ids(legacy.reconstruct_n(0, legacy.ntotal), np.arange(legacy.ntotal, dtype="int64"))
+        obj = cls(dim, config_of(index, base))
+        obj.index = index
+        obj.set_search_params()
+        obj._attach_exact(path)
+        ids = obj.ids()
+        obj._next_id = int(ids.max()) + 1 if len(ids) else 0
+        return obj
+
+    def _attach_exact(self, path: str):
+        meta = read_sidecar_meta(path)
+        if self.keeps_exact and meta is not None and meta.get("index_type") == self.index_type:
+            self._exact = open_sidecar(path)
+
+    @classmethod
+    def _load_mmap(cls, path: str, base: IndexConfig) -> "FaissStore":
+        meta = read_sidecar_meta(path)
+        if meta is not None and meta.get("index_type") == "flat":
+            index = MmapFlatIndex.open(path)
+            cfg = replace(base, index_type="flat")
+        else:
+            # IVF inverted lists are mmapped by FAISS; flat without sidecar and HNSW are read into memory
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            cfg = config_of(index, base)
+        obj = cls(index.d, cfg)
         obj.index = index
-        obj._next_id = index.ntotal
+        obj.read_only = True
+        obj.set_search_params()
+        obj._attach_exact(path)
         return obj
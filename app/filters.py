@@ -0,0 +1,58 @@
+from __future__ import annotations
+import json
+from dataclasses import dataclass, asdict
+from sqlalchemy import Select, select, func
+
+from app.hashing import fold_case
+from app.models import Document
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """
+    Restricts retrieval to chunks of matching documents; every field that is
+    set must match (None = no condition on that field).
+
+    document_ids     any of these Document ids
+    source_prefix    source path starts with this (case-sensitive)
+    title            substring of the title, case-insensitive (Unicode, app.hashing.fold_case)
+    ingested_after   Document.ingested_at >= this unix time
+    ingested_before  Document.ingested_at < this unix time
+    """
+    document_ids: tuple[int, ...] | None = None
+    source_prefix: str | None = None
+    title: str | None = None
+    ingested_after: float | None = None
+    ingested_before: float | None = None
+
+    def is_empty(self) -> bool:
+        return all(v is None for v in asdict(self).values())
+
+    def key(self) -> str:
+        """Canonical form for cache and coalescing keys ('' = unfiltered)."""
+        if self.is_empty():
+            return ""
+        d = asdict(self)
+        if d["document_ids"] is not None:
+            d["document_ids"] = sorted(set(d["document_ids"]))
+        return json.dumps(d, sort_keys=True, ensure_ascii=False)
+
+    def documents_query(self) -> Select:
+        q = select(Document.id)
+        if self.document_ids is not None:
+            q = q.where(Document.id.in_(self.document_ids))
+        if self.source_prefix is not None:
+            # substr instead of LIKE: SQLite's LIKE ignores ASCII case
+            q = q.where(func.substr(Document.source_path, 1, len(self.source_prefix)) == self.source_prefix)
+        if self.title is not None:
+            # fold_case is registered on every SQLite connection (app/db.py)
+            q = q.where(func.fold_case(Document.title).contains(fold_case(self.title), autoescape=True))
+        if self.ingested_after is not None:
+            q = q.where(Document.ingested_at >= self.ingested_after)
+        if self.ingested_before is not None:
+            q = q.where(Document.ingested_at < self.ingested_before)
+        return q
+
+
+def filter_key(filters: SearchFilter | None) -> str:
+    return filters.key() if filters is not None else ""
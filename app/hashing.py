@@ -0,0 +1,30 @@
+from __future__ import annotations
+import hashlib
+import re
+import unicodedata
+
+
+def sha256_file(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def normalize_text(s: str) -> str:
+    # NFC + collapsed whitespace: layout-only differences should not count as a change
+    s = unicodedata.normalize("NFC", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def fold_case(s: str | None) -> str | None:
+    # Unicode case-insensitive matching key; casefold turns "İ" into "i" + U+0307 (combining dot), dropped
+    # so that "İşlem" and "işlem" agree
+    if s is None:
+        return None
+    return unicodedata.normalize("NFC", s).casefold().replace("\u0307", "")
+
+
+def text_hash(s: str) -> str:
+    return hashlib.sha256(normalize_text(s).encode("utf-8")).hexdigest()
@@ -0,0 +1,147 @@
+from __future__ import annotations
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+from app.chunk_store import ChunkStore
+from app.faiss_index import FaissStore
+
+
+def version_path(index_path: str) -> str:
+    return index_path + ".version"
+
+
+def read_index_version(index_path: str) -> str | None:
+    """
+    Version of the published index. Indexes written before version files
+    existed are identified by mtime + size; None if there is no index at all.
+    """
+    try:
+        with open(version_path(index_path), encoding="utf-8") as f:
+            return str(json.load(f)["version"])
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        pass
+    try:
+        st = os.stat(index_path)
+    except FileNotFoundError:
+        return None
+    return f"mtime-{st.st_mtime_ns}-{st.st_size}"
+
+
+def publish_index_version(index_path: str, ntotal: int) -> str:
+    """
+    Called by ingest after the index and chunk store are written (both via
+    tmp file + rename); running APIs pick up the new version on their next poll.
+    """
+    prev = read_index_version(index_path)
+    version = str(int(prev) + 1) if prev is not None and prev.isdigit() else "1"
+    tmp = version_path(index_path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "ntotal": ntotal, "published_at": time.time()}, f)
+    os.replace(tmp, version_path(index_path))
+    return version
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    version: str | None
+    store: FaissStore
+    chunks: ChunkStore | None
+
+
+class IndexManager:
+    """
+    Owns the live index snapshot (FaissStore + ChunkStore, swapped together).
+
+    A background thread polls the index version file every `poll_interval_s`
+    seconds; on a new version it loads the snapshot off the request path and
+    replaces the reference in one assignment. Requests take `current()` once
+    and keep that snapshot until they finish, so an in-flight request never
+    mixes two versions and never sees a half-loaded index. A failed load keeps
+    serving the previous snapshot (see `last_error`).
+    """
+
+    def __init__(
+        self,
+        index_path: str,
+        load: Callable[[], tuple[FaissStore, ChunkStore | None]],
+        poll_interval_s: float = 5.0,
+    ):
+        self.index_path = index_path
+        self.poll_interval = poll_interval_s
+        self._load = load
+        self._snapshot: IndexSnapshot | None = None
+        self._lock = threading.Lock()  # one load at a time
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.reloads = 0
+        self.last_error: str | None = None
+
+    def current(self) -> IndexSnapshot:
+        snap = self._snapshot
+        if snap is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load_snapshot()
+                snap = self._snapshot
+            self._start()
+        return snap
+
+    def check(self) -> bool:
+        """Loads and swaps in a newer published version; True if swapped."""
+        with self._lock:
+            version = read_index_version(self.index_path)
+            if version is None or (self._snapshot is not None and version == self._snapshot.version):
+                return False
+            snap = self._load_snapshot()
+            self._snapshot = snap
+            self.reloads += 1
+            return True
+
+    def _load_snapshot(self, attempts: int = 3) -> IndexSnapshot:
+        # A publish that lands mid-load would pair files of two ingest runs;
+        # reload until the version is stable across the load. If it never is,
+        # fail: the caller keeps its current snapshot and the next poll retries.
+        for _ in range(attempts):
+            before = read_index_version(self.index_path)
+            store, chunks = self._load()
+            if read_index_version(self.index_path) == before:
+                return IndexSnapshot(before, store, chunks)
+        raise RuntimeError(
+            f"Index version changed during each of {attempts} loads of {self.index_path}; retrying on the next poll"
+        )
+
+    def _start(self):
+        if self.poll_interval <= 0 or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._poll, name="index-reload", daemon=True)
+                self._thread.start()
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = repr(e)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        snap = self._snapshot
+        return {
+            "version": snap.version if snap is not None else None,
+            "published_version": read_index_version(self.index_path),
+            "reloads": self.reloads,
+            "poll_interval_s": self.poll_interval,
+            "last_error": self.last_error,
+        }
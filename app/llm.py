@@ -1,46 +1,170 @@
 from __future__ import annotations
 import os
+import json
+import asyncio
+from typing import AsyncIterator, Iterator
+import httpx
 import requests
 from app.config import settings
+from app import metrics
+
+
+def record_usage(provider: str, prompt_tokens: int | None, completion_tokens: int | None):
+    # token counts as reported by the provider; absent fields are skipped
+    if prompt_tokens:
+        metrics.inc(metrics.LLM_TOKENS, provider, "prompt", amount=prompt_tokens)
+    if completion_tokens:
+        metrics.inc(metrics.LLM_TOKENS, provider, "completion", amount=completion_tokens)
 
 
 class LLM:
+    provider = "none"
+    model = ""
+    temperature: float | None = None  # None = provider / model default
+    max_concurrency = 0  # 0 = unlimited
+
     def generate(self, prompt: str) -> str:
         raise NotImplementedError
 
+    async def agenerate(self, prompt: str) -> str:
+        # Providers without a native async path run the blocking call off the event loop.
+        async with self._limit():
+            return await asyncio.to_thread(self.generate, prompt)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Yields answer text pieces as they are generated."""
+        yield self.generate(prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        yield await self.agenerate(prompt)
+
+    async def aclose(self):
+        client = getattr(self, "_client", None)
+        if client is not None:
+            await client.aclose()
+            self._client = None
+
+    def _limit(self):
+        """Per-provider cap on in-flight generations, shared by all requests of this LLM."""
+        sem = getattr(self, "_sem", None)
+        if sem is None:
+            sem = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency > 0 else _NoLimit()
+            self._sem = sem
+        return sem
+
+    def _aclient(self) -> httpx.AsyncClient:
+        # one keep-alive pool per LLM instance; connections are reused across requests
+        client = getattr(self, "_client", None)
+        if client is None:
+            n = self.max_concurrency or 100
+            client = httpx.AsyncClient(
+                timeout=settings.llm_timeout,
+                limits=httpx.Limits(max_connections=n, max_keepalive_connections=n),
+            )
+            self._client = client
+        return client
+
+
+class _NoLimit:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
 
 class NoneLLM(LLM):
     def generate(self, prompt: str) -> str:
         # Fallback: return prompt tail or a generic extractive note
         return "LLM kapalı. Yanıt üretilemedi. Lütfen LLM_PROVIDER=ollama veya openai olarak ayarlayın."
 
+    async def agenerate(self, prompt: str) -> str:
+        return self.generate(prompt)
+
 
 class OllamaLLM(LLM):
+    provider = "ollama"
+
     def __init__(self):
         self.base = settings.ollama_base_url.rstrip("/")
         self.model = settings.ollama_model
+        self.max_concurrency = settings.ollama_max_concurrency
+        self.session = requests.Session()
 
-    def generate(self, prompt: str) -> str:
+    def _request(self, prompt: str, stream: bool = False) -> tuple[str, dict]:
         url = f"{self.base}/api/generate"
-        payload = {"model": self.model, "prompt": prompt, "stream": False}
-        r = requests.post(url, json=payload, timeout=120)
+        payload = {"model": self.model, "prompt": prompt, "stream": stream}
+        return url, payload
+
+    @staticmethod
+    def _piece(line: str) -> str | None:
+        # NDJSON: {"response": "...", "done": false} per line
+        if not line.strip():
+            return ""
+        data = json.loads(line)
+        if data.get("done"):
+            record_usage("ollama", data.get("prompt_eval_count"), data.get("eval_count"))
+            return None
+        return data.get("response") or ""
+
+    def generate(self, prompt: str) -> str:
+        url, payload = self._request(prompt)
+        r = self.session.post(url, json=payload, timeout=settings.llm_timeout)
         r.raise_for_status()
         data = r.json()
+        record_usage(self.provider, data.get("prompt_eval_count"), data.get("eval_count"))
         return (data.get("response") or "").strip()
 
+    async def agenerate(self, prompt: str) -> str:
+        url, payload = self._request(prompt)
+        async with self._limit():
+            r = await self._aclient().post(url, json=payload)
+        r.raise_for_status()
+        data = r.json()
+        record_usage(self.provider, data.get("prompt_eval_count"), data.get("eval_count"))
+        return (data.get("response") or "").strip()
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        url, payload = self._request(prompt, stream=True)
+        with self.session.post(url, json=payload, timeout=settings.llm_timeout, stream=True) as r:
+            r.raise_for_status()
+            for line in r.iter_lines(decode_unicode=True):
+                piece = self._piece(line or "")
+                if piece is None:
+                    break
+                if piece:
+                    yield piece
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        url, payload = self._request(prompt, stream=True)
+        async with self._limit():
+            async with self._aclient().stream("POST", url, json=payload) as r:
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    piece = self._piece(line)
+                    if piece is None:
+                        break
+                    if piece:
+                        yield piece
+
 
 class OpenAILLM(LLM):
     """
     Lightweight call (no official SDK dependency).
     Requires OPENAI_API_KEY.
     """
+    provider = "openai"
+
     def __init__(self):
         if not settings.openai_api_key:
             raise ValueError("OPENAI_API_KEY is empty.")
         self.key = settings.openai_api_key
         self.model = settings.openai_model
+        self.temperature = 0.2
+        self.max_concurrency = settings.openai_max_concurrency
+        self.session = requests.Session()
 
-    def generate(self, prompt: str) -> str:
+    def _request(self, prompt: str, stream: bool = False) -> tuple[str, dict, dict]:
         url = "https://api.openai.com/v1/chat/completions"
         headers = {"Authorization": f"Bearer {self.key}", "Content-Type": "application/json"}
         payload = {
@@ -49,13 +173,69 @@ class OpenAILLM(LLM):
                 {"role": "system", "content": "You are a careful assistant that answers using provided context only."},
                 {"role": "user", "content": prompt},
             ],
-            "temperature": 0.2,
+            "temperature": self.temperature,
         }
-        r = requests.post(url, headers=headers, json=payload, timeout=120)
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}  # final chunk carries token usage
+        return url, headers, payload
+
+    @staticmethod
+    def _piece(line: str) -> str | None:
+        # SSE: "data: {chunk json}" lines, terminated by "data: [DONE]"
+        if not line.startswith("data:"):
+            return ""
+        body = line[len("data:"):].strip()
+        if body == "[DONE]":
+            return None
+        data = json.loads(body)
+        if data.get("usage"):
+            record_usage("openai", data["usage"].get("prompt_tokens"), data["usage"].get("completion_tokens"))
+        choices = data.get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content") or ""
+
+    def generate(self, prompt: str) -> str:
+        url, headers, payload = self._request(prompt)
+        r = self.session.post(url, headers=headers, json=payload, timeout=settings.llm_timeout)
+        r.raise_for_status()
+        data = r.json()
+        usage = data.get("usage") or {}
+        record_usage(self.provider, usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        return data["choices"][0]["message"]["content"].strip()
+
+    async def agenerate(self, prompt: str) -> str:
+        url, headers, payload = self._request(prompt)
+        async with self._limit():
+            r = await self._aclient().post(url, headers=headers, json=payload)
         r.raise_for_status()
         data = r.json()
+        usage = data.get("usage") or {}
+        record_usage(self.provider, usage.get("prompt_tokens"), usage.get("completion_tokens"))
         return data["choices"][0]["message"]["content"].strip()
 
+    def stream(self, prompt: str) -> Iterator[str]:
+        url, headers, payload = self._request(prompt, stream=True)
+        with self.session.post(url, headers=headers, json=payload, timeout=settings.llm_timeout, stream=True) as r:
+            r.raise_for_status()
+            for line in r.iter_lines(decode_unicode=True):
+                piece = self._piece(line or "")
+                if piece is None:
+                    break
+                if piece:
+                    yield piece
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        url, headers, payload = self._request(prompt, stream=True)
+        async with self._limit():
+            async with self._aclient().stream("POST", url, headers=headers, json=payload) as r:
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    piece = self._piece(line)
+                    if piece is None:
+                        break
+                    if piece:
+                        yield piece
+
 
 def build_llm() -> LLM:
     p = settings.llm_provider.lower().strip()
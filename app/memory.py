@@ -0,0 +1,46 @@
+from __future__ import annotations
+import os
+
+# /proc/<pid>/smaps_rollup fields, in kB
+_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Anonymous")
+
+
+def process_memory(pid: int | str = "self") -> dict:
+    """
+    Resident vs. shared memory of one process (Linux). `shared_mb` is memory
+    also mapped by other processes, e.g. an mmap'd index in every uvicorn
+    worker; `pss_mb` charges each shared page 1/N to each of its N users, so
+    summing PSS over workers gives their real combined footprint.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            raw = {k: int(v.split()[0]) for k, v in (line.split(":", 1) for line in f if ":" in line) if k in _FIELDS}
+    except (OSError, ValueError):
+        return {}
+    mb = lambda kb: round(kb / 1024, 1)  # noqa: E731
+    return {
+        "pid": os.getpid() if pid == "self" else int(pid),
+        "rss_mb": mb(raw.get("Rss", 0)),
+        "pss_mb": mb(raw.get("Pss", 0)),
+        "shared_mb": mb(raw.get("Shared_Clean", 0) + raw.get("Shared_Dirty", 0)),
+        "private_mb": mb(raw.get("Private_Clean", 0) + raw.get("Private_Dirty", 0)),
+        "anonymous_mb": mb(raw.get("Anonymous", 0)),
+    }
+
+
+def mapped_file_rss(paths: list[str], pid: int | str = "self") -> dict[str, float]:
+    """Resident MB per mapped file among `paths` (index files, chunk store text)."""
+    wanted = {os.path.realpath(p) for p in paths}
+    out: dict[str, float] = {}
+    current = None
+    try:
+        with open(f"/proc/{pid}/smaps", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                head = line.split(None, 5)
+                if len(head) >= 5 and "-" in head[0] and not head[0].endswith(":"):
+                    current = head[5].strip() if len(head) == 6 and head[5].strip() in wanted else None
+                elif current is not None and line.startswith("Rss:"):
+                    out[current] = out.get(current, 0.0) + int(line.split()[1]) / 1024
+    except OSError:
+        return {}
+    return {p: round(v, 1) for p, v in out.items()}
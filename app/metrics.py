@@ -0,0 +1,167 @@
+"""
+Minimal in-process metrics with Prometheus text exposition (no client
+dependency). Every function checks `enabled` first, so with METRICS_ENABLED=false
+a timer is one attribute lookup and a shared no-op context manager.
+
+Per-request stage timings are also collected in a context variable; the API
+turns them into a Server-Timing header. Metrics are per process (one set per
+uvicorn worker).
+"""
+from __future__ import annotations
+import time
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from app.config import settings
+
+enabled: bool = settings.metrics_enabled
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...], buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames, self.buckets = name, help, labelnames, buckets
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for labels, s in sorted(series.items()):
+            base = _labels(self.labelnames, labels)
+            cum = 0
+            for b, n in zip(self.buckets, s):
+                cum += n
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le=repr(b))} {cum}")
+            out.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le="+Inf")} {s[-1]}')
+            out.append(f"{self.name}_sum{base} {s[-2]}")
+            out.append(f"{self.name}_count{base} {s[-1]}")
+        return out
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...]):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for labels, v in sorted(values.items()):
+            out.append(f"{self.name}{_labels(self.labelnames, labels)} {v}")
+        return out
+
+
+def _labels(names: tuple[str, ...], values: tuple, **extra: str) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")  # noqa: E731
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+STAGE_SECONDS = Histogram(
+    "finrag_stage_seconds", "Latency of /ask pipeline stages (embed, search, fetch, prompt, llm, ...).", ("stage",)
+)
+HTTP_SECONDS = Histogram("finrag_http_request_seconds", "HTTP request latency by route.", ("method", "path", "status"))
+REQUESTS = Counter("finrag_rag_requests_total", "Questions answered, by mode.", ("mode",))
+IDK = Counter("finrag_idk_total", "IDK short-circuits before the LLM, by reason.", ("reason",))
+CACHE = Counter("finrag_cache_total", "Cache lookups by cache and result (hit / miss).", ("cache", "result"))
+LLM_TOKENS = Counter("finrag_llm_tokens_total", "LLM tokens reported by the provider.", ("provider", "kind"))
+COALESCED = Counter(
+    "finrag_coalesced_requests_total", "Requests served by an identical in-flight request, by mode.", ("mode",)
+)
+
+REGISTRY = [STAGE_SECONDS, HTTP_SECONDS, REQUESTS, IDK, CACHE, LLM_TOKENS, COALESCED]
+
+
+class _Timer:
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_stage(self.stage, time.perf_counter() - self.t0)
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+def timer(stage: str):
+    """`with metrics.timer("search"):` -> stage histogram + Server-Timing entry."""
+    return _Timer(stage) if enabled else _NOOP
+
+
+def record_stage(stage: str, seconds: float):
+    if not enabled:
+        return
+    STAGE_SECONDS.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def inc(counter: Counter, *labels: str, amount: float = 1):
+    if enabled:
+        counter.inc(amount, *labels)
+
+
+def start_request() -> dict[str, float] | None:
+    """Begins collecting stage timings for the current request context."""
+    if not enabled:
+        return None
+    timings: dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing(timings: dict[str, float]) -> str:
+    return ", ".join(f"{stage};dur={secs * 1000:.2f}" for stage, secs in timings.items())
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
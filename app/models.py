@@ -9,6 +9,10 @@ class Document(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     source_path: Mapped[str] = mapped_column(String(512), unique=True, index=True)
     title: Mapped[str] = mapped_column(String(256), default="")
+    # sha256 of the PDF bytes; unchanged files are skipped without parsing
+    content_hash: Mapped[str] = mapped_column(String(64), default="", server_default="")
+    # unix time of the last ingest that (re)wrote the chunks; NULL for rows from before the column existed
+    ingested_at: Mapped[float | None] = mapped_column(Float, nullable=True)
 
     chunks: Mapped[list["Chunk"]] = relationship("Chunk", back_populates="document", cascade="all, delete-orphan")
 
@@ -25,6 +29,8 @@ class Chunk(Base):
     page_end: Mapped[int] = mapped_column(Integer)
 
     text: Mapped[str] = mapped_column(Text)
+    # app.hashing.text_hash(text); lets re-ingest reuse vectors of unchanged chunks
+    text_hash: Mapped[str] = mapped_column(String(64), default="", server_default="")
 
     # FAISS stores vectors externally; we keep row alignment via "vector_id"
     vector_id: Mapped[int] = mapped_column(Integer, index=True)
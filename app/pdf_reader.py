@@ -1,34 +1,268 @@
 from __future__ import annotations
 
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import List
+from typing import Iterator, List
+import numpy as np
 import pdfplumber
+import pypdf
 from pypdf import PdfReader
 
+from app.config import settings
+
+# Bump when page extraction changes in a way that alters text; the cache key
+# also includes the library versions, so upgrades invalidate it as well.
+EXTRACTOR_VERSION = f"1-pdfplumber{pdfplumber.__version__}-pypdf{pypdf.__version__}"
+EXTRACTORS = ("pdfplumber", "pypdf", "none")
+
 
 @dataclass
 class PageText:
     page_number: int
     text: str
+    extractor: str = "pdfplumber"  # pdfplumber | pypdf | none (both failed)
+    seconds: float = 0.0
+
+
+def page_count(path: str) -> int:
+    # same reader order as _iter_range: pdfplumber, pypdf if it can't open the file
+    try:
+        with pdfplumber.open(path) as pdf:
+            return len(pdf.pages)
+    except Exception:
+        return len(PdfReader(path).pages)
 
 
-def read_pdf_pages(path: str) -> List[PageText]:
+def _pypdf_page(reader: PdfReader, page_number: int) -> PageText:
+    t0 = time.perf_counter()
+    try:
+        txt = reader.pages[page_number - 1].extract_text() or ""
+        extractor = "pypdf"
+    except Exception:
+        txt, extractor = "", "none"
+    return PageText(page_number, txt, extractor, time.perf_counter() - t0)
+
+
+def _iter_range(path: str, start: int, stop: int | None) -> Iterator[PageText]:
     """
-    Returns list of pages with extracted text.
-    Uses pdfplumber primarily; falls back to pypdf.
+    Pages [start, stop) (1-based; stop=None = to the end). pdfplumber per page;
+    only pages it fails on are re-extracted with pypdf.
     """
-    pages: List[PageText] = []
-
+    reader: PdfReader | None = None
     try:
-        with pdfplumber.open(path) as pdf:
-            for i, page in enumerate(pdf.pages, start=1):
-                txt = page.extract_text() or ""
-                pages.append(PageText(page_number=i, text=txt))
-        return pages
+        pdf = pdfplumber.open(path)
     except Exception:
-        # fallback
+        # not openable by pdfplumber at all: whole range through pypdf
         reader = PdfReader(path)
-        for i, page in enumerate(reader.pages, start=1):
-            txt = page.extract_text() or ""
-            pages.append(PageText(page_number=i, text=txt))
-        return pages
+        for pno in range(start, (stop or len(reader.pages) + 1)):
+            yield _pypdf_page(reader, pno)
+        return
+
+    with pdf:
+        pages = pdf.pages
+        for pno in range(start, min(stop or len(pages) + 1, len(pages) + 1)):
+            t0 = time.perf_counter()
+            page = pages[pno - 1]
+            try:
+                txt = page.extract_text() or ""
+            except Exception:
+                txt = None
+            finally:
+                page.close()  # drop the page's parsed layout objects
+            if txt is None:
+                reader = reader or PdfReader(path)
+                fb = _pypdf_page(reader, pno)
+                fb.seconds = time.perf_counter() - t0  # includes the failed pdfplumber attempt
+                yield fb
+            else:
+                yield PageText(pno, txt, "pdfplumber", time.perf_counter() - t0)
+
+
+def _extract_range(path: str, start: int, stop: int) -> list[PageText]:
+    # Runs inside a worker process; must stay a top-level function (picklable).
+    return list(_iter_range(path, start, stop))
+
+
+def iter_pdf_pages(path: str, workers: int = 1, pages_per_task: int = 0) -> Iterator[PageText]:
+    """
+    Yields pages in order as they are extracted.
+
+    workers > 1 splits the page range into tasks of `pages_per_task` pages
+    (0 = auto) across a process pool; at most 2 * workers tasks are in flight,
+    so memory stays bounded for very long documents.
+    """
+    if workers <= 1:
+        yield from _iter_range(path, 1, None)
+        return
+
+    try:
+        n = page_count(path)
+    except Exception:
+        # neither reader can count the pages up front: extract serially, which
+        # still yields whatever pages _iter_range can read
+        yield from _iter_range(path, 1, None)
+        return
+    step = pages_per_task or max(8, -(-n // (workers * 4)))
+    ranges = deque((a, min(a + step, n + 1)) for a in range(1, n + 1, step))
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges) or 1)) as pool:
+        inflight = deque()
+        while ranges or inflight:
+            while ranges and len(inflight) < 2 * workers:
+                inflight.append(pool.submit(_extract_range, path, *ranges.popleft()))
+            yield from inflight.popleft().result()
+
+
+def read_pdf_pages(path: str, workers: int = 1) -> List[PageText]:
+    """
+    Returns list of pages with extracted text.
+    Uses pdfplumber primarily; falls back to pypdf for the pages it fails on.
+    """
+    return list(iter_pdf_pages(path, workers=workers))
+
+
+class PageTextCache:
+    """
+    Extracted page texts keyed by (PDF content hash, EXTRACTOR_VERSION), so
+    re-chunking and full rebuilds skip PDF parsing.
+
+    One compressed .npz per document under `root/<extractor version>/`:
+      blob          utf-8 page texts back to back
+      offsets       (n + 1) int64 byte offsets into blob
+      page_numbers  int32
+      extractors    int8 index into EXTRACTORS
+      seconds       float32 original extraction time per page
+
+    A hit touches the file's mtime, which `prune` uses as LRU order.
+    """
+
+    def __init__(self, root: str, version: str = EXTRACTOR_VERSION):
+        self.root = root
+        self.version = version
+        self.dir = os.path.join(root, re.sub(r"[^A-Za-z0-9._-]+", "_", version))
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.dir, f"{content_hash}.npz")
+
+    def get(self, content_hash: str) -> list[PageText] | None:
+        path = self._path(content_hash)
+        try:
+            with np.load(path) as z:
+                blob, offsets = z["blob"].tobytes(), z["offsets"]
+                pnos, codes, secs = z["page_numbers"], z["extractors"], z["seconds"]
+        except (OSError, KeyError, ValueError):
+            return None  # missing or unreadable (e.g. interrupted copy): extract again
+        os.utime(path)
+        return [
+            PageText(int(pnos[i]), blob[offsets[i]:offsets[i + 1]].decode("utf-8"), EXTRACTORS[codes[i]], float(secs[i]))
+            for i in range(len(pnos))
+        ]
+
+    def put(self, content_hash: str, pages: list[PageText]):
+        os.makedirs(self.dir, exist_ok=True)
+        data = [p.text.encode("utf-8") for p in pages]
+        offsets = np.zeros(len(pages) + 1, dtype="int64")
+        np.cumsum([len(d) for d in data], out=offsets[1:])
+        tmp = self._path(content_hash) + ".tmp.npz"
+        np.savez_compressed(
+            tmp,
+            blob=np.frombuffer(b"".join(data), dtype="uint8"),
+            offsets=offsets,
+            page_numbers=np.array([p.page_number for p in pages], dtype="int32"),
+            extractors=np.array([EXTRACTORS.index(p.extractor) for p in pages], dtype="int8"),
+            seconds=np.array([p.seconds for p in pages], dtype="float32"),
+        )
+        os.replace(tmp, self._path(content_hash))
+
+    def _entries(self) -> list[tuple[str, str, int, float]]:
+        """(version dir, path, bytes, mtime) of every entry under root."""
+        out = []
+        if not os.path.isdir(self.root):
+            return out
+        for vdir in sorted(os.listdir(self.root)):
+            full = os.path.join(self.root, vdir)
+            if not os.path.isdir(full):
+                continue
+            for name in os.listdir(full):
+                if name.endswith(".npz"):
+                    path = os.path.join(full, name)
+                    st = os.stat(path)
+                    out.append((vdir, path, st.st_size, st.st_mtime))
+        return out
+
+    def info(self) -> dict:
+        current = os.path.basename(self.dir)
+        versions: dict[str, dict] = {}
+        for vdir, _, size, _ in self._entries():
+            v = versions.setdefault(vdir, {"entries": 0, "bytes": 0, "current": vdir == current})
+            v["entries"] += 1
+            v["bytes"] += size
+        return {
+            "root": self.root,
+            "version": self.version,
+            "entries": sum(v["entries"] for v in versions.values()),
+            "bytes": sum(v["bytes"] for v in versions.values()),
+            "versions": versions,
+        }
+
+    def prune(self, max_bytes: int | None = None, older_than_s: float | None = None, all_entries: bool = False) -> tuple[int, int]:
+        """
+        Deletes entries of other extractor versions, entries not used for
+        `older_than_s` seconds, then least recently used entries until the
+        cache fits in `max_bytes`. Returns (entries removed, bytes freed).
+        """
+        current = os.path.basename(self.dir)
+        now = time.time()
+        keep, drop = [], []
+        for e in self._entries():
+            vdir, _, _, mtime = e
+            stale = vdir != current or (older_than_s is not None and now - mtime > older_than_s)
+            (drop if all_entries or stale else keep).append(e)
+        if max_bytes is not None:
+            keep.sort(key=lambda e: e[3], reverse=True)  # most recently used first
+            total = 0
+            for i, e in enumerate(keep):
+                total += e[2]
+                if total > max_bytes:
+                    drop.extend(keep[i:])
+                    break
+        for _, path, _, _ in drop:
+            os.remove(path)
+        for vdir in os.listdir(self.root) if os.path.isdir(self.root) else []:
+            full = os.path.join(self.root, vdir)
+            if os.path.isdir(full) and not os.listdir(full):
+                os.rmdir(full)
+        return len(drop), sum(e[2] for e in drop)
+
+
+def build_page_cache() -> PageTextCache | None:
+    if not settings.page_cache_enabled:
+        return None
+    return PageTextCache(settings.page_cache_dir)
+
+
+def cached_pdf_pages(
+    path: str,
+    content_hash: str,
+    cache: PageTextCache | None,
+    workers: int = 1,
+) -> Iterator[PageText]:
+    """
+    iter_pdf_pages through the page text cache: a hit never opens the PDF; a
+    miss streams pages as usual and stores them once the document is complete.
+    """
+    if cache is None:
+        yield from iter_pdf_pages(path, workers=workers)
+        return
+    cached = cache.get(content_hash)
+    if cached is not None:
+        yield from cached
+        return
+    pages = []
+    for p in iter_pdf_pages(path, workers=workers):
+        pages.append(p)
+        yield p
+    cache.put(content_hash, pages)
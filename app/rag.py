@@ -1,8 +1,17 @@
 from __future__ import annotations
-from dataclasses import dataclass
+import time
+import asyncio
+from dataclasses import dataclass, asdict, field
+from typing import AsyncIterator
+import numpy as np
 from app.retriever import Retriever, Retrieved
 from app.llm import LLM
+from app.context_packing import pack_contexts
+from app.filters import SearchFilter, filter_key
+from app.response_cache import ResponseCache, response_key
+from app.semantic_cache import SemanticCache
 from app.config import settings
+from app import metrics
 
 
 @dataclass
@@ -14,6 +23,7 @@ class Citation:
     page_end: int
     score: float
     snippet: str
+    chunk_ids: list[int] = field(default_factory=list)  # all chunks of a merged context block
 
 
 @dataclass
@@ -63,46 +73,215 @@ def to_citations(ctxs: list[Retrieved], max_citations: int = 5) -> list[Citation
                 page_end=c.page_end,
                 score=c.score,
                 snippet=snippet,
+                chunk_ids=list(c.chunk_ids or (c.chunk_id,)),
             )
         )
     return out
 
 
 class RAG:
-    def __init__(self, retriever: Retriever, llm: LLM):
+    def __init__(
+        self,
+        retriever: Retriever,
+        llm: LLM,
+        cache: ResponseCache | None = None,
+        index_version: str | None = None,
+        semantic: SemanticCache | None = None,
+    ):
         self.retriever = retriever
         self.llm = llm
+        # no LLM configured: the fixed fallback text is not worth caching
+        self.cache = cache if llm.provider != "none" else None
+        self.index_version = index_version
+        self.semantic = semantic
+        # question -> (vector, filter key) of a semantic miss, until answered
+        self._qvecs: dict[str, tuple[np.ndarray, str]] = {}
 
-    def answer(self, question: str) -> RAGResponse:
-        ctxs = self.retriever.retrieve(question, top_k=settings.top_k)
+    def prepare(
+        self, question: str, filters: SearchFilter | None = None
+    ) -> tuple[RAGResponse | None, list[Retrieved], str]:
+        """
+        Retrieval + prompt building (everything before the LLM call).
+        Returns (final response if no generation is needed, contexts, prompt).
+        """
+        qv = None
+        if self.semantic is not None:
+            qv = self.retriever.embed(question)
+            hit = self._semantic_get(question, qv, filter_key(filters))
+            if hit is not None:
+                return hit, [], ""
+        ctxs = self.retriever.retrieve(question, top_k=settings.top_k, vector=qv, filters=filters)
+        return self._plan(question, ctxs)
+
+    def prepare_many(
+        self, questions: list[str], filters: SearchFilter | None = None
+    ) -> list[tuple[RAGResponse | None, list[Retrieved], str]]:
+        if self.semantic is None:
+            all_ctxs = self.retriever.retrieve_many(questions, top_k=settings.top_k, filters=filters)
+            return [self._plan(q, ctxs) for q, ctxs in zip(questions, all_ctxs)]
+
+        with metrics.timer("embed"):
+            qvs = self.retriever.embedder.encode(questions)
+        plans: list = [None] * len(questions)
+        misses = []
+        scope = filter_key(filters)
+        for i, (q, qv) in enumerate(zip(questions, qvs)):
+            hit = self._semantic_get(q, qv, scope)
+            if hit is not None:
+                plans[i] = (hit, [], "")
+            else:
+                misses.append(i)
+        if misses:
+            all_ctxs = self.retriever.retrieve_many(
+                [questions[i] for i in misses], top_k=settings.top_k, vectors=qvs[misses], filters=filters
+            )
+            for i, ctxs in zip(misses, all_ctxs):
+                plans[i] = self._plan(questions[i], ctxs)
+        return plans
+
+    def _semantic_get(self, question: str, qv: np.ndarray, scope: str) -> RAGResponse | None:
+        with metrics.timer("semantic_cache"):
+            hit = self.semantic.get(qv, self.index_version, scope)
+        metrics.inc(metrics.CACHE, "semantic", "miss" if hit is None else "hit")
+        if hit is None:
+            self._qvecs[question] = (qv, scope)
+        return hit
+
+    def _remember(self, question: str, res: RAGResponse) -> RAGResponse:
+        # generated answers only: IDK short-circuits are cheap to recompute
+        miss = self._qvecs.pop(question, None)
+        if self.semantic is not None and miss is not None and not res.idk:
+            self.semantic.put(miss[0], question, res, self.index_version, miss[1])
+        return res
+
+    def _plan(self, question: str, ctxs: list[Retrieved]) -> tuple[RAGResponse | None, list[Retrieved], str]:
         if not ctxs:
+            metrics.inc(metrics.IDK, "no_context")
             return RAGResponse(
                 answer="Bu dokümanlarda ilgili bilgi bulamadım.",
                 citations=[],
                 used_context=False,
                 idk=True,
                 top_score=None,
-            )
+            ), ctxs, ""
 
         top_score = ctxs[0].score
 
         # "Bilmiyorum eşiği"
         if top_score < settings.idk_threshold:
+            metrics.inc(metrics.IDK, "low_score")
             return RAGResponse(
                 answer="Bu dokümanlarda sorunu güvenle yanıtlayacak yeterli bilgi bulamadım.",
                 citations=to_citations(ctxs),
                 used_context=True,
                 idk=True,
                 top_score=top_score,
-            )
+            ), ctxs, ""
+
+        if settings.context_packing_enabled:
+            # neighbouring chunks merged, near-duplicates dropped, token budget applied;
+            # prompt and citations both use the packed blocks, so KAYNAK i == citation i
+            with metrics.timer("pack"):
+                ctxs = pack_contexts(ctxs, settings.context_max_tokens, settings.context_dedup_threshold)
+        with metrics.timer("prompt"):
+            prompt = build_prompt(question, ctxs)
+        if self.cache is not None:
+            with metrics.timer("cache"):
+                cached = self.cache.get(self._cache_key(prompt), self.index_version)
+            metrics.inc(metrics.CACHE, "llm", "miss" if cached is None else "hit")
+            if cached is not None:
+                return self._respond(cached, ctxs), ctxs, prompt
+        return None, ctxs, prompt
+
+    def _cache_key(self, prompt: str) -> str:
+        return response_key(self.llm.provider, self.llm.model, self.llm.temperature, prompt)
+
+    def _store(self, prompt: str, answer: str):
+        if self.cache is not None and answer:
+            self.cache.put(self._cache_key(prompt), answer, self.index_version)
+
+    def answer(self, question: str, filters: SearchFilter | None = None) -> RAGResponse:
+        metrics.inc(metrics.REQUESTS, "answer")
+        early, ctxs, prompt = self.prepare(question, filters)
+        if early is not None:
+            return early
+        with metrics.timer("llm"):
+            ans = self.llm.generate(prompt).strip()
+        self._store(prompt, ans)
+        return self._remember(question, self._respond(ans, ctxs))
+
+    async def aanswer(self, question: str, filters: SearchFilter | None = None) -> RAGResponse:
+        metrics.inc(metrics.REQUESTS, "answer")
+        # embedding / FAISS / SQL are blocking: keep them off the event loop
+        early, ctxs, prompt = await asyncio.to_thread(self.prepare, question, filters)
+        if early is not None:
+            return early
+        with metrics.timer("llm"):
+            ans = (await self.llm.agenerate(prompt)).strip()
+        await asyncio.to_thread(self._store, prompt, ans)
+        return self._remember(question, self._respond(ans, ctxs))
+
+    async def aanswer_many(self, questions: list[str], filters: SearchFilter | None = None) -> list[RAGResponse]:
+        """
+        Batched retrieval for all questions, then concurrent generations
+        (still bounded by the provider's concurrency limit).
+        """
+        metrics.inc(metrics.REQUESTS, "batch", amount=len(questions))
+        plans = await asyncio.to_thread(self.prepare_many, questions, filters)
+
+        async def finish(question: str, plan) -> RAGResponse:
+            early, ctxs, prompt = plan
+            if early is not None:
+                return early
+            with metrics.timer("llm"):  # summed over the batch's concurrent generations
+                ans = (await self.llm.agenerate(prompt)).strip()
+            await asyncio.to_thread(self._store, prompt, ans)
+            return self._remember(question, self._respond(ans, ctxs))
+
+        return list(await asyncio.gather(*(finish(q, p) for q, p in zip(questions, plans))))
+
+    async def astream(
+        self, question: str, filters: SearchFilter | None = None
+    ) -> AsyncIterator[tuple[str, dict | str]]:
+        """
+        Streaming variant of aanswer(). Yields (event, data):
+          ("citations", {"idk", "top_score", "citations"})  once retrieval is done
+          ("token", str)                                     answer pieces as generated
+          ("done", {"answer": full_answer})
+        """
+        metrics.inc(metrics.REQUESTS, "stream")
+        early, ctxs, prompt = await asyncio.to_thread(self.prepare, question, filters)
+        res = early or RAGResponse(
+            answer="", citations=to_citations(ctxs), used_context=True, idk=False, top_score=ctxs[0].score
+        )
+        yield "citations", {
+            "idk": res.idk,
+            "top_score": res.top_score,
+            "citations": [asdict(c) for c in res.citations],
+        }
+        if early is not None:
+            yield "token", early.answer
+            yield "done", {"answer": early.answer}
+            return
 
-        prompt = build_prompt(question, ctxs)
-        ans = self.llm.generate(prompt).strip()
+        parts = []
+        t0 = time.perf_counter()
+        async for piece in self.llm.astream(prompt):
+            if not parts:
+                metrics.record_stage("llm_first_token", time.perf_counter() - t0)
+            parts.append(piece)
+            yield "token", piece
+        metrics.record_stage("llm", time.perf_counter() - t0)
+        answer = "".join(parts).strip()
+        await asyncio.to_thread(self._store, prompt, answer)
+        self._remember(question, self._respond(answer, ctxs))
+        yield "done", {"answer": answer}
 
+    def _respond(self, ans: str, ctxs: list[Retrieved]) -> RAGResponse:
         return RAGResponse(
             answer=ans,
             citations=to_citations(ctxs),
             used_context=True,
             idk=False,
-            top_score=top_score,
+            top_score=ctxs[0].score,
         )
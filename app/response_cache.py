@@ -0,0 +1,127 @@
+from __future__ import annotations
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from app.config import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    answer TEXT NOT NULL,
+    index_version TEXT,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used);
+"""
+
+
+def response_key(provider: str, model: str, temperature: float | None, prompt: str) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return hashlib.sha256(json.dumps([provider, model, temperature, prompt_hash]).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent exact-match cache of LLM answers in its own SQLite file.
+
+    Keyed by (provider, model, temperature, prompt hash); build_prompt is
+    deterministic, so the same question over the same chunks hits. Rows are
+    stored per index version: during a reload, workers on the old and new
+    snapshot read and write side by side without touching each other's rows,
+    and an answer from another version is simply a miss. Entries older than
+    `ttl_s` are misses (and deleted). Above `max_entries` the least recently
+    used ~5% go, which is also how rows of past versions leave.
+    Shared by all uvicorn workers through WAL.
+    """
+
+    def __init__(self, path: str, ttl_s: float = 86_400.0, max_entries: int = 10_000):
+        self.path = path
+        self.ttl = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+        self._conn.executescript(SCHEMA)
+        self._count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def _row_key(key: str, index_version: str | None) -> str:
+        return f"{index_version}:{key}"
+
+    def get(self, key: str, index_version: str | None) -> str | None:
+        now = time.time()
+        key = self._row_key(key, index_version)
+        with self._lock:
+            row = self._conn.execute("SELECT answer, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] <= self.ttl:
+                self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return row[0]
+            if row is not None:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count -= 1
+            self.misses += 1
+            return None
+
+    def put(self, key: str, answer: str, index_version: str | None):
+        now = time.time()
+        key = self._row_key(key, index_version)
+        with self._lock:
+            existed = self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, answer, index_version, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, answer, index_version, now, now),
+            )
+            self._count += existed is None
+            # the count is per process (other workers write too); _evict recounts
+            if self._count > self.max_entries:
+                self._evict(self._count - self.max_entries + self.max_entries // 20)
+
+    def _evict(self, n: int):
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)", (n,)
+        )
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+        self._count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._count = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def build_response_cache() -> ResponseCache | None:
+    if not settings.llm_cache_enabled:
+        return None
+    return ResponseCache(
+        settings.llm_cache_path, ttl_s=settings.llm_cache_ttl_s, max_entries=settings.llm_cache_max_entries
+    )
@@ -1,10 +1,19 @@
 from __future__ import annotations
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
+import numpy as np
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.embeddings import Embedder
 from app.faiss_index import FaissStore
 from app.models import Chunk, Document
+from app.filters import SearchFilter
 from app.config import settings
+from app import metrics
+
+if TYPE_CHECKING:
+    from app.batcher import QueryBatcher
+    from app.chunk_store import ChunkStore
 
 
 @dataclass
@@ -16,51 +25,152 @@ class Retrieved:
     page_start: int
     page_end: int
     text: str
+    document_id: int = 0
+    chunk_index: int = 0
+    chunk_ids: tuple[int, ...] = ()  # packed block (app/context_packing.py): every chunk merged into it
 
 
 class Retriever:
-    def __init__(self, db: Session, embedder: Embedder, store: FaissStore):
+    def __init__(
+        self,
+        db: Session,
+        embedder: Embedder,
+        store: FaissStore,
+        batcher: QueryBatcher | None = None,
+        chunks: ChunkStore | None = None,
+    ):
         self.db = db
         self.embedder = embedder
         self.store = store
+        self.batcher = batcher
+        self.chunks = chunks
+
+    def embed(self, query: str) -> np.ndarray:
+        with metrics.timer("embed"):
+            if self.batcher is not None:
+                return self.batcher.encode(query)
+            return self.embedder.encode([query])[0]
+
+    def allowed_ids(self, filters: SearchFilter | None) -> np.ndarray | None:
+        """Sorted vector ids a filtered search may return; None = unfiltered."""
+        if filters is None or filters.is_empty():
+            return None
+        with metrics.timer("filter"):
+            documents = filters.documents_query()
+            if self.chunks is not None:
+                return self.chunks.vector_ids_of(self.db.execute(documents).scalars())
+            vids = self.db.execute(select(Chunk.vector_id).where(Chunk.document_id.in_(documents))).scalars()
+            return np.sort(np.fromiter(vids, dtype="int64"))
 
-    def retrieve(self, query: str, top_k: int | None = None) -> list[Retrieved]:
+    def retrieve(
+        self,
+        query: str,
+        top_k: int | None = None,
+        vector: np.ndarray | None = None,
+        filters: SearchFilter | None = None,
+    ) -> list[Retrieved]:
+        """
+        `vector`: the query's embedding if the caller already has it.
+        `filters`: only chunks of matching documents; applied inside the FAISS search.
+        """
         k = top_k or settings.top_k
-        qv = self.embedder.encode([query])[0]
-        scores, vector_ids = self.store.search(qv, k)
+        allowed = self.allowed_ids(filters)
+        if allowed is not None and not len(allowed):
+            return []
+        if self.batcher is not None:
+            # shares one encode + one FAISS search with concurrent requests
+            with metrics.timer("embed_search"):
+                scores, vector_ids = self.batcher.search(query, self.store, k, vector=vector, allowed=allowed)
+        else:
+            qv = vector
+            if qv is None:
+                with metrics.timer("embed"):
+                    qv = self.embedder.encode([query])[0]
+            with metrics.timer("search"):
+                scores, vector_ids = self.store.search(qv, k, allowed=allowed)
+        with metrics.timer("fetch"):
+            return self._resolve([(scores, vector_ids)])[0]
 
-        # Filter invalid ids (FAISS can return -1 if empty)
-        pairs = [(s, vid) for s, vid in zip(scores, vector_ids) if vid is not None and vid >= 0]
-        if not pairs:
+    def retrieve_many(
+        self,
+        queries: list[str],
+        top_k: int | None = None,
+        vectors: np.ndarray | None = None,
+        filters: SearchFilter | None = None,
+    ) -> list[list[Retrieved]]:
+        """One encode call, one FAISS search and one SQL query for all queries (same filters for all)."""
+        if not queries:
             return []
+        k = top_k or settings.top_k
+        allowed = self.allowed_ids(filters)
+        if allowed is not None and not len(allowed):
+            return [[] for _ in queries]
+        qvs = vectors
+        if qvs is None:
+            with metrics.timer("embed"):
+                qvs = self.embedder.encode(queries)
+        with metrics.timer("search"):
+            scores, vector_ids = self.store.search_many(qvs, k, allowed=allowed)
+        with metrics.timer("fetch"):
+            return self._resolve(list(zip(scores, vector_ids)))
 
-        # Fetch chunks by vector_id
-        vids = [vid for _, vid in pairs]
-        rows = (
-            self.db.query(Chunk, Document)
-            .join(Document, Document.id == Chunk.document_id)
-            .filter(Chunk.vector_id.in_(vids))
-            .all()
-        )
+    def _resolve(self, hits: list[tuple[list[float], list[int]]]) -> list[list[Retrieved]]:
+        # Filter invalid ids (FAISS can return -1 if empty)
+        per_query = [
+            [(s, vid) for s, vid in zip(scores, vector_ids) if vid is not None and vid >= 0]
+            for scores, vector_ids in hits
+        ]
+        vids = {vid for pairs in per_query for _, vid in pairs}
+        if not vids:
+            return [[] for _ in per_query]
 
-        by_vid = {}
-        for ch, doc in rows:
-            by_vid[ch.vector_id] = (ch, doc)
+        # vector_id -> (chunk_id, source_path, title, page_start, page_end, text, document_id, chunk_index)
+        by_vid: dict[int, tuple] = {}
+        if self.chunks is not None:
+            for vid in vids:
+                rec = self.chunks.get(vid)
+                if rec is not None:
+                    source_path, title = self.chunks.document(rec.document_id)
+                    by_vid[vid] = (
+                        rec.chunk_id, source_path, title, rec.page_start, rec.page_end, rec.text,
+                        rec.document_id, rec.chunk_index,
+                    )
 
-        out: list[Retrieved] = []
-        for score, vid in pairs:
-            if vid not in by_vid:
-                continue
-            ch, doc = by_vid[vid]
-            out.append(
-                Retrieved(
-                    score=float(score),
-                    chunk_id=ch.id,
-                    source_path=doc.source_path,
-                    title=doc.title or "",
-                    page_start=ch.page_start,
-                    page_end=ch.page_end,
-                    text=ch.text,
-                )
+        # Fetch chunks by vector_id (everything when there is no chunk store,
+        # otherwise only vectors added after it was built)
+        missing = vids - by_vid.keys()
+        if missing:
+            rows = (
+                self.db.query(Chunk, Document)
+                .join(Document, Document.id == Chunk.document_id)
+                .filter(Chunk.vector_id.in_(missing))
+                .all()
             )
-        return out
+            for ch, doc in rows:
+                by_vid[ch.vector_id] = (
+                    ch.id, doc.source_path, doc.title or "", ch.page_start, ch.page_end, ch.text,
+                    ch.document_id, ch.chunk_index,
+                )
+
+        results: list[list[Retrieved]] = []
+        for pairs in per_query:
+            out: list[Retrieved] = []
+            for score, vid in pairs:
+                if vid not in by_vid:
+                    continue
+                chunk_id, source_path, title, page_start, page_end, text, document_id, chunk_index = by_vid[vid]
+                out.append(
+                    Retrieved(
+                        score=float(score),
+                        chunk_id=chunk_id,
+                        source_path=source_path,
+                        title=title,
+                        page_start=page_start,
+                        page_end=page_end,
+                        text=text,
+                        document_id=document_id,
+                        chunk_index=chunk_index,
+                    )
+                )
+            results.append(out)
+        return results
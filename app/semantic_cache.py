@@ -0,0 +1,123 @@
+from __future__ import annotations
+import threading
+from typing import TYPE_CHECKING
+import numpy as np
+import faiss
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    from app.rag import RAGResponse
+
+
+class SemanticCache:
+    """
+    Answers of earlier questions, found by query-vector similarity.
+
+    A small exact inner-product index (IDMap2 over Flat) over the embeddings
+    of answered questions: a new question whose normalized vector has cosine
+    >= `threshold` with a cached one gets that RAGResponse back without
+    retrieval or generation. Everything is dropped when a `get` arrives with a
+    newer index version; during a reload, gets and puts from requests still
+    on the older snapshot are a miss / ignored instead of wiping the newer
+    entries. Above `max_entries` the least recently used ~5% are evicted.
+    Entries carry the `scope` of their request (the filter key): an answer
+    over one product's documents is never returned for another's.
+    In memory, per process.
+    """
+
+    PROBE = 8  # nearest neighbours checked for one in the request's scope
+
+    def __init__(self, dim: int, threshold: float = 0.95, max_entries: int = 5_000):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, version: str | None):
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+        self._entries: dict[int, tuple[str, str, RAGResponse]] = {}  # id -> (scope, question, response)
+        self._last_used: dict[int, int] = {}
+        self._next_id = 0
+        self._clock = 0
+        self.version = version
+
+    def _is_newer(self, index_version: str | None) -> bool:
+        if self.version is None:
+            return True
+        if index_version is None or index_version == self.version:
+            return False
+        if index_version.isdigit() and self.version.isdigit():  # published versions count up
+            return int(index_version) > int(self.version)
+        return True  # mtime-based version of an index without a version file: cannot be ordered
+
+    def get(self, qv: np.ndarray, index_version: str | None, scope: str = "") -> RAGResponse | None:
+        with self._lock:
+            if index_version != self.version:
+                if not self._is_newer(index_version):
+                    self.misses += 1  # request still on an older snapshot
+                    return None
+                self._reset(index_version)
+            if self.index.ntotal:
+                k = min(self.PROBE, self.index.ntotal)
+                scores, ids = self.index.search(np.asarray(qv, dtype="float32").reshape(1, -1), k)
+                for score, vid in zip(scores[0], ids[0]):
+                    if vid < 0 or score < self.threshold:
+                        break
+                    entry = self._entries[int(vid)]
+                    if entry[0] == scope:
+                        self._clock += 1
+                        self._last_used[int(vid)] = self._clock
+                        self.hits += 1
+                        return entry[2]
+            self.misses += 1
+            return None
+
+    def put(
+        self, qv: np.ndarray, question: str, response: RAGResponse, index_version: str | None, scope: str = ""
+    ):
+        with self._lock:
+            if index_version != self.version:
+                if self.version is not None:
+                    return  # answered on another snapshot; only get() moves the cache to a new version
+                self._reset(index_version)
+            if len(self._entries) >= self.max_entries:
+                self._evict(len(self._entries) - self.max_entries + 1 + self.max_entries // 20)
+            vid = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(np.asarray(qv, dtype="float32").reshape(1, -1), np.array([vid], dtype="int64"))
+            self._entries[vid] = (scope, question, response)
+            self._clock += 1
+            self._last_used[vid] = self._clock
+
+    def _evict(self, n: int):
+        victims = sorted(self._last_used, key=self._last_used.__getitem__)[:n]
+        self.index.remove_ids(np.asarray(victims, dtype="int64"))
+        for vid in victims:
+            del self._entries[vid], self._last_used[vid]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def build_semantic_cache(dim: int) -> SemanticCache | None:
+    if not settings.semantic_cache_enabled:
+        return None
+    return SemanticCache(
+        dim, threshold=settings.semantic_cache_threshold, max_entries=settings.semantic_cache_max_entries
+    )
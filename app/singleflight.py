@@ -0,0 +1,111 @@
+from __future__ import annotations
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from app.hashing import normalize_text
+from app import metrics
+
+T = TypeVar("T")
+
+
+def question_key(question: str) -> str:
+    # whitespace / Unicode form / case differences are the same question
+    return normalize_text(question).casefold()
+
+
+class _Broadcast:
+    """One producer, any number of consumers; late joiners replay the events so far."""
+
+    def __init__(self):
+        self.events: list = []
+        self.done = False
+        self.error: BaseException | None = None
+        self._cond = asyncio.Condition()
+
+    async def run(self, source: AsyncIterator):
+        try:
+            async for event in source:
+                async with self._cond:
+                    self.events.append(event)
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self._cond:
+                self.done = True
+                self._cond.notify_all()
+
+    async def subscribe(self) -> AsyncIterator:
+        i = 0
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(lambda: i < len(self.events) or self.done)
+                pending, done = self.events[i:], self.done
+            i += len(pending)
+            for event in pending:
+                yield event
+            if done and i == len(self.events):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight work: the first caller for a key starts the
+    computation as its own task, later callers with the same key await that
+    task (or subscribe to its event stream) instead of starting another one.
+    The task outlives a disconnecting caller, so the others still get the
+    result. Entries are removed when the work finishes; the next caller
+    starts fresh (and usually hits the answer caches).
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self._streams: dict[str, tuple[_Broadcast, asyncio.Task]] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish(self._calls, key, t))
+            self.started += 1
+        else:
+            self._joined("answer")
+        return await asyncio.shield(task)
+
+    async def stream(self, key: str, fn: Callable[[], AsyncIterator]) -> AsyncIterator:
+        entry = self._streams.get(key)
+        if entry is None:
+            bc = _Broadcast()
+            task = asyncio.ensure_future(bc.run(fn()))
+            self._streams[key] = (bc, task)
+            task.add_done_callback(lambda t: self._finish(self._streams, key, t))
+            self.started += 1
+        else:
+            bc = entry[0]
+            self._joined("stream")
+        async for event in bc.subscribe():
+            yield event
+
+    def _joined(self, mode: str):
+        self.coalesced += 1
+        metrics.inc(metrics.COALESCED, mode)
+
+    @staticmethod
+    def _finish(table: dict, key: str, task: asyncio.Task):
+        entry = table.get(key)
+        if entry is task or (isinstance(entry, tuple) and entry[1] is task):
+            del table[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so an error nobody awaited is not logged as lost
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import time
+import argparse
+import tracemalloc
+
+from app.chunking import ChunkOut, clean_text, iter_chunks
+
+PARAGRAPH = (
+    "Müşteri, EFT ve havale işlemlerinde tarifede belirtilen ücret ve komisyonları öder. "
+    "Kredi kartı yıllık aidatı, gecikme faizi ve nakit avans faizi aylık olarak uygulanır. "
+)
+
+
+def synthetic_pages(n_pages: int, chars_per_page: int = 2000):
+    """Generator: the streaming chunker never needs the whole document at once."""
+    body = (PARAGRAPH * (chars_per_page // len(PARAGRAPH) + 1))[:chars_per_page]
+    for pno in range(1, n_pages + 1):
+        yield pno, f"Sayfa {pno}\n{body}"
+
+
+def legacy_chunk_pages(pages, chunk_size=900, overlap=150) -> list[ChunkOut]:
+    """Pre-streaming implementation: one merged string + linear page scan per offset."""
+    full = []
+    for pno, txt in pages:
+        txt = clean_text(txt)
+        if not txt:
+            continue
+        start_char = sum(len(t) for t, _ in full)  # noqa: F841  (dead, but part of the old cost)
+        full.append((txt + "\n\n", pno))
+    merged = "".join(t for t, _ in full)
+    ranges, cursor = [], 0
+    for t, pno in full:
+        ranges.append((cursor, cursor + len(t), pno))
+        cursor += len(t)
+
+    def page_for_char(idx):
+        for a, b, pno in ranges:
+            if a <= idx < b:
+                return pno
+        return ranges[-1][2] if ranges else 1
+
+    chunks, i, cidx, n = [], 0, 0, len(merged)
+    if not merged.strip():
+        return chunks
+    while i < n:
+        j = min(i + chunk_size, n)
+        text = merged[i:j].strip()
+        if text:
+            chunks.append(ChunkOut(cidx, page_for_char(i), page_for_char(j - 1), text))
+            cidx += 1
+        if j == n:
+            break
+        i = max(0, j - overlap)
+    return chunks
+
+
+def measure(fn) -> tuple[float, float, int]:
+    """(seconds, peak MiB, chunks)"""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    n = fn()
+    secs = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return secs, peak / 2**20, n
+
+
+def run(sizes: list[int], legacy_max: int = 3000) -> list[dict]:
+    rows = []
+    for n_pages in sizes:
+        # streaming: consume chunk by chunk, as ingest of a huge prospectus would
+        s_secs, s_mem, s_n = measure(lambda: sum(1 for _ in iter_chunks(synthetic_pages(n_pages))))
+        row = {"pages": n_pages, "chunks": s_n, "stream_s": s_secs, "stream_peak_mib": s_mem}
+        if n_pages <= legacy_max:
+            l_secs, l_mem, l_n = measure(lambda: len(legacy_chunk_pages(list(synthetic_pages(n_pages)))))
+            assert l_n == s_n
+            row.update(legacy_s=l_secs, legacy_peak_mib=l_mem)
+        rows.append(row)
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="chunk_pages scaling: legacy vs streaming chunker")
+    ap.add_argument("--pages", default="100,500,1000,2000,5000,20000")
+    ap.add_argument("--legacy-max", type=int, default=2000, help="skip the quadratic legacy run above this size")
+    args = ap.parse_args()
+
+    sizes = [int(x) for x in args.pages.split(",")]
+    print(f"{'pages':>7} {'chunks':>8} {'legacy s':>9} {'stream s':>9} {'legacy MiB':>11} {'stream MiB':>11}")
+    for r in run(sizes, args.legacy_max):
+        legacy_s = f"{r['legacy_s']:.3f}" if "legacy_s" in r else "-"
+        legacy_m = f"{r['legacy_peak_mib']:.1f}" if "legacy_peak_mib" in r else "-"
+        print(
+            f"{r['pages']:>7} {r['chunks']:>8} {legacy_s:>9} {r['stream_s']:>9.3f} "
+            f"{legacy_m:>11} {r['stream_peak_mib']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import os
+import time
+import argparse
+import numpy as np
+
+from app.config import settings
+from app.embeddings import Embedder
+
+WORDS = "müşteri kredi kartı yıllık aidat faiz oranı havale eft ücret komisyon tarife hesap işletim".split()
+
+
+def synthetic_texts(n: int, seed: int = 0) -> list[str]:
+    """Chunker-like length mix: mostly full 900-char chunks, some document tails and short texts."""
+    rng = np.random.default_rng(seed)
+    lengths = np.where(rng.random(n) < 0.7, 900, rng.integers(20, 900, n))
+    out = []
+    for n_chars in lengths:
+        words = rng.choice(WORDS, size=n_chars // 6 + 1)
+        out.append(" ".join(words)[:n_chars])
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Embedding throughput (texts/s): fixed batches vs length buckets vs process pool.")
+    ap.add_argument("--n", type=int, default=2000)
+    ap.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--model", default=settings.embedding_model, help="model name or local path")
+    args = ap.parse_args()
+    settings.embedding_model = args.model
+
+    texts = synthetic_texts(args.n)
+    emb = Embedder(processes=1)
+    emb.encode(texts[:64])  # warm-up
+
+    print(f"{args.n} texts, model={args.model}, cpus={os.cpu_count()}")
+    t0 = time.perf_counter()
+    emb.model.encode(texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True)
+    secs = time.perf_counter() - t0
+    print(f"  fixed batch_size=32      {args.n / secs:9.1f} texts/s")
+
+    before = emb.stats()["seconds"]
+    emb.encode(texts)
+    s = emb.stats()
+    print(f"  length-bucketed          {args.n / (s['seconds'] - before):9.1f} texts/s "
+          f"| padding efficiency {s['padding_efficiency']:.0%}")
+
+    if args.processes > 1:
+        pooled = Embedder(processes=args.processes)
+        try:
+            pooled.encode(texts[:256])  # start workers + load models
+            t0 = time.perf_counter()
+            pooled.encode(texts)
+            secs = time.perf_counter() - t0
+            print(f"  pool x{args.processes:<3}                {args.n / secs:9.1f} texts/s")
+        finally:
+            pooled.close()
+
+
+if __name__ == "__main__":
+    main()
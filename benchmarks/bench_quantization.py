@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import time
+import argparse
+import numpy as np
+import faiss
+
+from app.faiss_index import FaissStore, IndexConfig
+from evaluation.index_recall import exact_topk, recall_at_k, sample_queries
+
+LAYOUTS = [
+    ("flat", 0),
+    ("sq_fp16", 0),
+    ("sq8", 0),
+    ("sq8", 20),
+    ("sq8", 50),
+]
+
+
+def synthetic_embeddings(n: int, dim: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Unit vectors around random topic centroids, roughly like sentence embeddings of a document corpus."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    x = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Memory / latency / recall@k of float16 and int8 vector storage vs. IndexFlatIP.")
+    ap.add_argument("--n", type=int, default=100_000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=300)
+    args = ap.parse_args()
+
+    vecs = synthetic_embeddings(args.n, args.dim)
+    ids = np.arange(args.n, dtype="int64")
+    queries = sample_queries(vecs, args.queries, noise=0.5)
+    truth = exact_topk(ids, vecs, queries, args.k)
+
+    print(f"Vectors: {args.n} dim={args.dim} | queries: {len(queries)} | k={args.k}")
+    print(f"{'layout':<10} {'rerank_k':>8} {'RAM MB':>8} {'B/vec':>6} {'ms/query':>9} {'recall@k':>9} {'max |Δscore|':>13}")
+    for index_type, rerank_k in LAYOUTS:
+        store = FaissStore.from_vectors(ids, vecs, IndexConfig(index_type=index_type, rerank_k=rerank_k, train_size=args.n))
+        # float32 originals for reranking live in the mmap'd sidecar once saved, not in RAM
+        ram = faiss.serialize_index(store.index).nbytes
+        scores, found = (np.array(a) for a in store.search_many(queries, args.k))
+        t0 = time.perf_counter()
+        for q in queries:
+            store.search(q, args.k)
+        ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        exact = np.einsum("qkd,qd->qk", vecs[np.maximum(found, 0)], queries)
+        print(
+            f"{index_type:<10} {rerank_k:>8} {ram / 1e6:>8.1f} {ram / args.n:>6.0f} {ms:>9.3f} "
+            f"{recall_at_k(found, truth, args.k):>9.4f} {np.abs(exact - scores).max():>13.5f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""
+Reproducible offline performance suite.
+
+Generates a seeded synthetic corpus, swaps in a hash-based embedding model and
+a fixed-latency LLM, and measures chunking, embedding, FAISS add/search,
+retrieval, end-to-end ingest and concurrent /ask through the FastAPI app.
+Results go to JSON; `--baseline old.json` reports metrics that got worse by
+more than `--tolerance` and exits non-zero.
+
+    PYTHONPATH=. python benchmarks/suite.py --scale small --out new.json --baseline old.json
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from contextlib import contextmanager
+import numpy as np
+import faiss
+import httpx
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.db import Base, make_engine, get_session
+from app.chunking import chunk_pages
+from app.chunk_store import ChunkStore
+from app.faiss_index import FaissStore, IndexConfig
+from app.index_manager import publish_index_version
+from app.retriever import Retriever
+import app.embeddings as embeddings
+import app.models  # noqa: F401  (register tables on Base.metadata)
+from benchmarks.synthetic import StubLLM, StubModel, banking_pages, questions, write_pdf
+
+SCALES = {
+    # docs x pages per doc, FAISS vectors, retrieval queries, /ask requests at `concurrency`
+    "tiny": dict(docs=2, pages=4, vectors=2_000, queries=20, asks=20, concurrency=4),
+    "small": dict(docs=10, pages=20, vectors=50_000, queries=200, asks=300, concurrency=16),
+    "medium": dict(docs=40, pages=50, vectors=200_000, queries=500, asks=1_000, concurrency=32),
+    "large": dict(docs=100, pages=100, vectors=1_000_000, queries=1_000, asks=3_000, concurrency=64),
+}
+DIM = 384
+
+
+def latency_summary(samples_s: list[float]) -> dict:
+    ms = np.asarray(samples_s, dtype="float64") * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+    }
+
+
+@contextmanager
+def patched(obj, **attrs):
+    old = {k: getattr(obj, k) for k in attrs}
+    for k, v in attrs.items():
+        setattr(obj, k, v)
+    try:
+        yield
+    finally:
+        for k, v in old.items():
+            setattr(obj, k, v)
+
+
+def bench_chunking(pages: list[str]) -> dict:
+    numbered = list(enumerate(pages, start=1))
+    t0 = time.perf_counter()
+    chunks = chunk_pages(numbered, settings.chunk_size, settings.chunk_overlap)
+    secs = time.perf_counter() - t0
+    return {"pages": len(pages), "chunks": len(chunks), "seconds_s": secs, "pages_per_s": len(pages) / secs}
+
+
+def bench_embedding(embedder: embeddings.Embedder, texts: list[str]) -> dict:
+    t0 = time.perf_counter()
+    embedder.encode(texts)
+    secs = time.perf_counter() - t0
+    return {"texts": len(texts), "seconds_s": secs, "texts_per_s": len(texts) / secs}
+
+
+def bench_faiss(n: int, n_queries: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, DIM), dtype=np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    queries = vecs[rng.choice(n, size=n_queries, replace=False)]
+    store = FaissStore(DIM, IndexConfig.from_settings())
+    t0 = time.perf_counter()
+    store.add(vecs)
+    store.flush()  # IVF / PQ training is build time, not part of the first search
+    add_s = time.perf_counter() - t0
+
+    store.search(queries[0], settings.top_k)  # warm-up, untimed
+    lat = []
+    for q in queries:
+        t0 = time.perf_counter()
+        store.search(q, settings.top_k)
+        lat.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    store.search_many(queries, settings.top_k)
+    batch_s = time.perf_counter() - t0
+    return {
+        "index_type": store.index_type,
+        "vectors": n,
+        "add_s": add_s,
+        "add_vectors_per_s": n / add_s,
+        "search": latency_summary(lat),
+        "search_many_queries_per_s": n_queries / batch_s,
+    }
+
+
+def bench_ingest(workdir: str, corpus: list[list[str]], embedder: embeddings.Embedder, session_factory) -> dict:
+    from scripts.ingest_cli import ingest_pdf, new_stats
+
+    pdf_dir = os.path.join(workdir, "pdfs")
+    os.makedirs(pdf_dir, exist_ok=True)
+    pdfs = [write_pdf(os.path.join(pdf_dir, f"tarife_{i:04d}.pdf"), pages) for i, pages in enumerate(corpus)]
+
+    store = FaissStore(DIM)
+    stats = new_stats()
+    db = session_factory()
+    t0 = time.perf_counter()
+    try:
+        for p in pdfs:
+            ingest_pdf(db, store, embedder, p, stats=stats)
+        store.save(settings.faiss_index_path)
+        ChunkStore.build(db, settings.chunk_store_dir)
+    finally:
+        db.close()
+    publish_index_version(settings.faiss_index_path, store.ntotal)
+    secs = time.perf_counter() - t0
+    pages = sum(len(c) for c in corpus)
+    out = {
+        "docs": len(pdfs),
+        "pages": pages,
+        "chunks": store.ntotal,
+        "seconds_s": secs,
+        "pages_per_s": pages / secs,
+    }
+    for name, st in stats.items():
+        out[f"{name}_s"] = st.seconds
+    return out
+
+
+def bench_retrieve(session_factory, embedder: embeddings.Embedder, qs: list[str]) -> dict:
+    store = FaissStore.load(settings.faiss_index_path)
+    chunks = ChunkStore.load(settings.chunk_store_dir)
+    db = session_factory()
+    try:
+        retriever = Retriever(db=db, embedder=embedder, store=store, chunks=chunks)
+        retriever.retrieve(qs[0])  # warm-up
+        lat = []
+        for q in qs:
+            t0 = time.perf_counter()
+            retriever.retrieve(q)
+            lat.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        retriever.retrieve_many(qs)
+        many_s = time.perf_counter() - t0
+    finally:
+        db.close()
+    return {"queries": len(qs), **latency_summary(lat), "retrieve_many_queries_per_s": len(qs) / many_s}
+
+
+async def _drive(client: httpx.AsyncClient, qs: list[str], concurrency: int) -> tuple[list[float], int, float]:
+    sem = asyncio.Semaphore(concurrency)
+    lat: list[float] = []
+    errors = 0
+
+    async def one(q: str):
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            r = await client.post("/ask", json={"question": q})
+            lat.append(time.perf_counter() - t0)
+            errors += r.status_code != 200
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in qs))
+    return lat, errors, time.perf_counter() - t0
+
+
+def bench_ask(session_factory, qs: list[str], concurrency: int, llm_latency_ms: float) -> dict:
+    import api.main as api
+
+    def session():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    api._cached_components.cache_clear()
+    api.index_manager.cache_clear()
+    api.response_cache.cache_clear()
+    api.semantic_cache.cache_clear()
+    api.app.dependency_overrides[get_session] = session
+    try:
+        with patched(api, build_llm=lambda: StubLLM(llm_latency_ms)):
+
+            async def run():
+                transport = httpx.ASGITransport(app=api.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                    await _drive(client, qs[:concurrency], concurrency)  # warm-up: model, index, pools
+                    return await _drive(client, qs, concurrency)
+
+            lat, errors, wall = asyncio.run(run())
+            _, llm, batcher = api._cached_components()
+            batching = batcher.stats() if batcher is not None else None
+            asyncio.run(llm.aclose())
+            if batcher is not None:
+                batcher.close()
+            api.index_manager().close()
+            if api.response_cache() is not None:
+                api.response_cache().close()
+    finally:
+        api.app.dependency_overrides.pop(get_session, None)
+        api._cached_components.cache_clear()
+        api.index_manager.cache_clear()
+        api.response_cache.cache_clear()
+        api.semantic_cache.cache_clear()
+    return {
+        "requests": len(qs),
+        "concurrency": concurrency,
+        "llm_latency_ms": llm_latency_ms,
+        "errors": errors,
+        "requests_per_s": len(qs) / wall,
+        **latency_summary(lat),
+        "mean_batch_size": batching["mean_batch_size"] if batching else None,
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(
+    scale: str, seed: int = 0, llm_latency_ms: float = 50.0, workdir: str | None = None, llm_cache: bool = False
+) -> dict:
+    params = SCALES[scale]
+    tmp = None
+    if workdir is None:
+        tmp = tempfile.TemporaryDirectory(prefix="finrag-bench-")
+        workdir = tmp.name
+    os.makedirs(workdir, exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    corpus = [
+        banking_pages(params["pages"], seed=int(s)) for s in rng.integers(0, 2**31, params["docs"])
+    ]
+    qs = questions(max(params["queries"], params["asks"]), seed=seed + 1)
+    results: dict = {}
+    try:
+        with (
+            patched(embeddings, SentenceTransformer=lambda *_a, **_k: StubModel(DIM)),
+            patched(
+                settings,
+                faiss_index_path=os.path.join(workdir, "faiss.index"),
+                chunk_store_dir=os.path.join(workdir, "chunk_store"),
+                page_cache_enabled=False,  # measure real extraction
+                index_reload_interval_s=0.0,
+                idk_threshold=-1.0,  # stub vectors score ~0: always go through prompt + LLM
+                # synthetic questions repeat; off by default so /ask measures generation, not cache hits
+                llm_cache_enabled=llm_cache,
+                llm_cache_path=os.path.join(workdir, "llm_cache.sqlite"),
+                semantic_cache_enabled=llm_cache,
+            ),
+        ):
+            engine = make_engine(f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}")
+            Base.metadata.create_all(bind=engine)
+            session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
+            embedder = embeddings.Embedder()
+
+            all_pages = [p for doc in corpus for p in doc]
+            results["chunking"] = bench_chunking(all_pages)
+            texts = [c.text for c in chunk_pages(enumerate(all_pages, start=1), settings.chunk_size, settings.chunk_overlap)]
+            results["embedding"] = bench_embedding(embedder, texts)
+            results["faiss"] = bench_faiss(params["vectors"], params["queries"], seed)
+            results["ingest"] = bench_ingest(workdir, corpus, embedder, session_factory)
+            results["retrieve"] = bench_retrieve(session_factory, embedder, qs[: params["queries"]])
+            results["ask"] = bench_ask(session_factory, qs[: params["asks"]], params["concurrency"], llm_latency_ms)
+            engine.dispose()
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    return {
+        "meta": {
+            "scale": scale,
+            "params": params,
+            "seed": seed,
+            "git": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": np.__version__,
+            "faiss": faiss.__version__,
+            "faiss_index_type": settings.faiss_index_type,
+            "query_batching": settings.query_batching,
+            "llm_cache": llm_cache,
+        },
+        "results": results,
+    }
+
+
+def _flatten(d: dict, prefix: str = "") -> dict[str, float]:
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = float(v)
+    return out
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.10) -> list[tuple[str, float, float, float]]:
+    """
+    Metrics worse than the baseline by more than `tolerance` (relative):
+    `*_per_s` must not drop, `*_ms` / `*_s` must not grow. Returns
+    (metric, baseline, current, relative change) rows.
+    """
+    cur, base = _flatten(current["results"]), _flatten(baseline["results"])
+    worse = []
+    for key in sorted(cur.keys() & base.keys()):
+        b, c = base[key], cur[key]
+        if b <= 0:
+            continue
+        change = (c - b) / b
+        if key.endswith("_per_s") and change < -tolerance:
+            worse.append((key, b, c, change))
+        elif (key.endswith("_ms") or key.endswith("_s")) and not key.endswith("_per_s") and change > tolerance:
+            worse.append((key, b, c, change))
+    return worse
+
+
+def main(argv: list[str] | None = None):
+    ap = argparse.ArgumentParser(description="Offline benchmark suite (synthetic corpus, stub embedder and LLM).")
+    ap.add_argument("--scale", choices=list(SCALES), default="small")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--llm-latency-ms", type=float, default=50.0, help="stub LLM time per answer")
+    ap.add_argument("--out", default=None, help="result JSON (default: DATA_DIR/bench/<scale>-<time>.json)")
+    ap.add_argument("--baseline", default=None, help="earlier result JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown per metric")
+    ap.add_argument("--llm-cache", action="store_true", help="serve /ask with the exact and semantic answer caches on")
+    ap.add_argument("--workdir", default=None, help="keep corpus, DB and index here instead of a temp dir")
+    args = ap.parse_args(argv)
+
+    report = run(
+        args.scale, seed=args.seed, llm_latency_ms=args.llm_latency_ms, workdir=args.workdir, llm_cache=args.llm_cache
+    )
+    out = args.out or os.path.join(settings.data_dir, "bench", f"{args.scale}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    r = report["results"]
+    print(f"scale={args.scale} git={report['meta']['git']} cpus={report['meta']['cpus']}")
+    print(f"  chunking   {r['chunking']['pages_per_s']:>10.1f} pages/s")
+    print(f"  embedding  {r['embedding']['texts_per_s']:>10.1f} texts/s (stub model)")
+    print(f"  faiss      {r['faiss']['add_vectors_per_s']:>10.0f} vectors/s add | "
+          f"search p50 {r['faiss']['search']['p50_ms']:.3f} ms p99 {r['faiss']['search']['p99_ms']:.3f} ms")
+    print(f"  ingest     {r['ingest']['pages_per_s']:>10.1f} pages/s ({r['ingest']['chunks']} chunks)")
+    print(f"  retrieve   p50 {r['retrieve']['p50_ms']:.2f} ms p95 {r['retrieve']['p95_ms']:.2f} ms "
+          f"p99 {r['retrieve']['p99_ms']:.2f} ms")
+    print(f"  /ask       {r['ask']['requests_per_s']:>10.1f} req/s at concurrency {r['ask']['concurrency']} | "
+          f"p50 {r['ask']['p50_ms']:.1f} ms p95 {r['ask']['p95_ms']:.1f} ms p99 {r['ask']['p99_ms']:.1f} ms "
+          f"| errors {r['ask']['errors']}")
+    print(f"Results: {out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        worse = compare(report, baseline, args.tolerance)
+        if baseline["meta"].get("params") != report["meta"]["params"]:
+            print("Warning: baseline was run with different scale parameters.")
+        if not worse:
+            print(f"No regressions beyond {args.tolerance:.0%} vs {args.baseline}")
+            return
+        print(f"Regressions beyond {args.tolerance:.0%} vs {args.baseline}:")
+        for key, b, c, change in worse:
+            print(f"  {key:<40} {b:>12.3f} -> {c:>12.3f} ({change:+.0%})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
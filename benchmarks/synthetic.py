@@ -0,0 +1,124 @@
+"""
+Offline building blocks for the benchmark suite: seeded banking-like pages,
+a minimal PDF writer, a hash-based embedding model and a fixed-latency LLM.
+Same seed and scale -> byte-identical corpus, so runs are comparable.
+"""
+from __future__ import annotations
+
+import time
+import asyncio
+import hashlib
+import numpy as np
+
+from app.llm import LLM
+
+PRODUCTS = ["kredi kartı", "ihtiyaç kredisi", "konut kredisi", "vadesiz hesap", "vadeli mevduat", "EFT", "havale", "FAST"]
+FEES = ["yıllık aidat", "işlem ücreti", "hesap işletim ücreti", "gecikme faizi", "nakit avans faizi", "erken kapama komisyonu"]
+CLAUSES = [
+    "Müşteri, {p} için tarifede belirtilen {f} tutarını öder.",
+    "{p} kapsamında {f} oranı aylık %{r} olarak uygulanır.",
+    "Banka, {p} işlemlerinde {f} bilgisini işlem öncesinde müşteriye bildirir.",
+    "{f}, {p} sözleşmesinin {n}. maddesi uyarınca yıllık olarak güncellenir.",
+    "{p} için {f} {a} TL'dir; dijital kanallarda bu tutar uygulanmaz.",
+]
+
+
+def banking_pages(n_pages: int, chars_per_page: int = 2000, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    pages = []
+    for pno in range(1, n_pages + 1):
+        lines, size = [f"Sayfa {pno} - Ücret ve Komisyon Tarifesi"], 0
+        while size < chars_per_page:
+            line = CLAUSES[rng.integers(len(CLAUSES))].format(
+                p=PRODUCTS[rng.integers(len(PRODUCTS))],
+                f=FEES[rng.integers(len(FEES))],
+                r=f"{rng.uniform(1, 5):.2f}",
+                n=int(rng.integers(1, 40)),
+                a=int(rng.integers(5, 500)),
+            )
+            lines.append(line)
+            size += len(line) + 1
+        pages.append("\n".join(lines))
+    return pages
+
+
+def questions(n: int, seed: int = 1) -> list[str]:
+    rng = np.random.default_rng(seed)
+    return [
+        f"{PRODUCTS[rng.integers(len(PRODUCTS))]} için {FEES[rng.integers(len(FEES))]} nedir?" for _ in range(n)
+    ]
+
+
+def _pdf_escape(s: str) -> str:
+    # Helvetica / WinAnsi: Turkish letters outside latin-1 are transliterated
+    s = s.translate(str.maketrans("ğĞşŞıİ", "gGsSiI"))
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1", "replace").decode("latin-1")
+
+
+def write_pdf(path: str, pages: list[str]) -> str:
+    """Text-only PDF (one Helvetica line per input line) that pdfplumber / pypdf read back."""
+    objs: list[bytes] = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    for pid, text in zip(page_ids, pages):
+        ops = ["BT", "/F1 9 Tf", "11 TL", "30 810 Td"]
+        ops += [f"({_pdf_escape(ln)}) Tj T*" for ln in text.split("\n")]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {pid + 1} 0 R >>".encode()
+        )
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for num, body in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(bytes(out))
+    return path
+
+
+class StubModel:
+    """SentenceTransformer stand-in: deterministic unit vector per text, no model download."""
+
+    max_seq_length = 256
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, **kwargs):
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha256(t.encode("utf-8")).digest()[:8], "little")
+            out[i] = np.random.default_rng(seed).standard_normal(self.dim, dtype=np.float32)
+        out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out
+
+
+class StubLLM(LLM):
+    """Fixed-latency generation, so /ask numbers measure our code plus a known LLM cost."""
+
+    provider = "stub"
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+
+    def generate(self, prompt: str) -> str:
+        time.sleep(self.latency)
+        return "Tarifeye göre ücret 5 TL'dir. Kaynaklar: KAYNAK 1"
+
+    async def agenerate(self, prompt: str) -> str:
+        await asyncio.sleep(self.latency)
+        return "Tarifeye göre ücret 5 TL'dir. Kaynaklar: KAYNAK 1"
@@ -1,14 +1,22 @@
 from __future__ import annotations
 
 import os
+import copy
+import json
+import time
+import argparse
+from dataclasses import fields, replace
+import numpy as np
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.config import settings
 from app.db import SessionLocal
 from app.embeddings import Embedder
-from app.faiss_index import FaissStore
-from app.retriever import Retriever
-from app.models import RetrievalGold
+from app.faiss_index import FaissStore, IndexConfig, LOSSY_TYPES
+from app.models import Chunk, RetrievalGold
+
+CONFIG_KEYS = {f.name for f in fields(IndexConfig)} - {"index_type"}
 
 
 def parse_ids(csv: str) -> set[int]:
@@ -25,7 +33,123 @@ def precision_recall_at_k(retrieved_ids: list[int], relevant_ids: set[int], k: i
     return precision, recall
 
 
+def relevance_matrix(retrieved: np.ndarray, relevant: list[set[int]]) -> np.ndarray:
+    """
+    hits[i, r] = retrieved[i, r] is relevant for query i. One np.isin over
+    (query, chunk id) pairs packed into int64 keys instead of a Python loop.
+    """
+    n, width = retrieved.shape
+    rows = np.repeat(np.arange(n, dtype="int64"), [len(r) for r in relevant])
+    cols = np.fromiter((c for r in relevant for c in r), dtype="int64", count=len(rows))
+    stride = int(max(retrieved.max(initial=0), cols.max(initial=0))) + 2
+    gold_keys = rows * stride + cols
+    keys = np.arange(n, dtype="int64")[:, None] * stride + retrieved
+    return np.isin(keys, gold_keys) & (retrieved >= 0)
+
+
+def ranking_metrics(hits: np.ndarray, valid: np.ndarray, n_relevant: np.ndarray, ks: list[int]) -> dict[int, dict]:
+    """
+    Mean precision / recall / MRR / nDCG at each k over all queries.
+    `valid[i, r]`: a result exists at rank r (precision divides by the
+    results actually returned, as the per-row version did).
+    """
+    discounts = 1.0 / np.log2(np.arange(hits.shape[1]) + 2)
+    first_hit = np.where(hits.any(axis=1), hits.argmax(axis=1), hits.shape[1])
+    n_rel = np.maximum(n_relevant, 1)
+    out = {}
+    for k in ks:
+        h = hits[:, :k]
+        n_hits = h.sum(axis=1)
+        n_ret = valid[:, :k].sum(axis=1)
+        dcg = (h * discounts[:k]).sum(axis=1)
+        ideal = np.cumsum(discounts[:k])[np.minimum(n_rel, k) - 1]
+        out[k] = {
+            "precision": float(np.mean(np.divide(n_hits, n_ret, out=np.zeros(len(h)), where=n_ret > 0))),
+            "recall": float(np.mean(n_hits / n_rel)),
+            "mrr": float(np.mean(np.where(first_hit < k, 1.0 / (first_hit + 1), 0.0))),
+            "ndcg": float(np.mean(dcg / ideal)),
+        }
+    return out
+
+
+def parse_config(spec: str) -> tuple[str, dict]:
+    """'sq8:rerank_k=50' -> ('sq8', {'rerank_k': 50}); 'current' = the index on disk."""
+    name, *opts = spec.split(":")
+    overrides = {}
+    for opt in opts:
+        key, _, val = opt.partition("=")
+        if key not in CONFIG_KEYS:
+            raise ValueError(f"Unknown option {key!r} in {spec!r} (expected one of {sorted(CONFIG_KEYS)})")
+        overrides[key] = int(val)
+    return name.strip(), overrides
+
+
+def build_variant(source: FaissStore, ids: np.ndarray, vecs: np.ndarray, spec: str) -> FaissStore:
+    name, overrides = parse_config(spec)
+    if name == "current":
+        # shallow copy with its own config: `source` (and so later specs) keep the on-disk settings.
+        # The FAISS index object is shared; set_search_params re-applies this variant's knobs to it,
+        # which is enough as variants are built and evaluated one at a time.
+        variant = copy.copy(source)
+        variant.config = replace(source.config, rerank_k=overrides.pop("rerank_k", source.config.rerank_k))
+        variant.set_search_params(**{k: v for k, v in overrides.items() if k in ("nprobe", "ef_search")})
+        return variant
+    cfg = IndexConfig.from_settings(index_type=name, **overrides)
+    if cfg.min_train() > len(vecs):
+        raise ValueError(f"needs >= {cfg.min_train()} vectors to train (have {len(vecs)}); try :nlist=")
+    return FaissStore.from_vectors(ids, vecs, cfg)
+
+
+def chunk_ids_of(db: Session, vector_ids: np.ndarray, cache: dict[int, int]) -> np.ndarray:
+    """vector id matrix -> chunk id matrix (-1 = no result), one SQL query for unseen ids."""
+    missing = [int(v) for v in np.unique(vector_ids) if v >= 0 and int(v) not in cache]
+    for start in range(0, len(missing), 5000):
+        batch = missing[start:start + 5000]
+        cache.update(db.execute(select(Chunk.vector_id, Chunk.id).where(Chunk.vector_id.in_(batch))).tuples().all())
+    lookup = np.vectorize(lambda v: cache.get(int(v), -1), otypes=["int64"])
+    return lookup(vector_ids) if vector_ids.size else vector_ids.astype("int64")
+
+
+def evaluate(
+    db: Session, store: FaissStore, qvs: np.ndarray, relevant: list[set[int]], ks: list[int], cache: dict[int, int]
+) -> dict:
+    k_max = max(ks)
+    t0 = time.perf_counter()
+    _, vids = store.search_many(qvs, k_max)  # one matrix search for the whole gold set
+    batch_s = time.perf_counter() - t0
+
+    # per-query latency as the API sees it (one search per request)
+    lat = np.empty(len(qvs))
+    for i, q in enumerate(qvs):
+        t0 = time.perf_counter()
+        store.search(q, k_max)
+        lat[i] = time.perf_counter() - t0
+
+    retrieved = chunk_ids_of(db, np.asarray(vids, dtype="int64").reshape(len(qvs), k_max), cache)
+    hits = relevance_matrix(retrieved, relevant)
+    n_relevant = np.array([len(r) for r in relevant])
+    return {
+        "metrics": ranking_metrics(hits, retrieved >= 0, n_relevant, ks),
+        "search_batch_s": batch_s,
+        "search_ms": {f"p{p}": float(np.percentile(lat, p) * 1000) for p in (50, 95, 99)},
+    }
+
+
 def main():
+    ap = argparse.ArgumentParser(
+        description="Batched retrieval evaluation (P/R/MRR/nDCG@k + latency) for one or more index configurations."
+    )
+    ap.add_argument(
+        "--configs",
+        default="current",
+        help="comma list of index configs: 'current' (index on disk) or type[:key=val...], "
+        "e.g. current,flat,ivf_flat:nprobe=32,sq8:rerank_k=50,hnsw:ef_search=128",
+    )
+    ap.add_argument("--k", default="1,3,5,10", help="cutoffs")
+    ap.add_argument("--json", default=None, help="also write the report to this file")
+    args = ap.parse_args()
+    ks = sorted({int(x) for x in args.k.split(",") if x.strip()})
+
     if not os.path.exists(settings.faiss_index_path):
         raise RuntimeError("FAISS index not found. Run ingest first.")
 
@@ -36,29 +160,45 @@ def main():
             print("No evaluation data found in retrieval_gold table.")
             print("Insert rows: query + relevant_chunk_ids_csv (e.g., '12,15,88')")
             return
+        relevant = [parse_ids(row.relevant_chunk_ids_csv) for row in gold]
 
         embedder = Embedder()
-        store = FaissStore.load(settings.faiss_index_path)
-        retriever = Retriever(db=db, embedder=embedder, store=store)
-
-        ks = [1, 3, 5, 10]
-        totals = {k: {"p": 0.0, "r": 0.0} for k in ks}
-
-        for row in gold:
-            rel = parse_ids(row.relevant_chunk_ids_csv)
-            ctxs = retriever.retrieve(row.query, top_k=max(ks))
-            retrieved_chunk_ids = [c.chunk_id for c in ctxs]
-
-            for k in ks:
-                p, r = precision_recall_at_k(retrieved_chunk_ids, rel, k)
-                totals[k]["p"] += p
-                totals[k]["r"] += r
+        t0 = time.perf_counter()
+        qvs = embedder.encode([row.query for row in gold])  # all gold queries in one call
+        embed_s = time.perf_counter() - t0
+
+        source = FaissStore.load(settings.faiss_index_path)
+        specs = [s.strip() for s in args.configs.split(",") if s.strip()]
+        ids, vecs = (None, None)
+        if any(parse_config(s)[0] != "current" for s in specs):
+            if source.index_type in LOSSY_TYPES:
+                print(f"Warning: source index is {source.index_type}; variants are built from decoded vectors.")
+            ids, vecs = source.vectors()
 
         n = len(gold)
-        print(f"Eval samples: {n}")
-        for k in ks:
-            print(f"precision@{k}: {totals[k]['p']/n:.4f} | recall@{k}: {totals[k]['r']/n:.4f}")
+        print(f"Eval samples: {n} | embedding {embed_s * 1000 / n:.2f} ms/query (batched)")
+        report, cache = {}, {}
+        for spec in specs:
+            try:
+                store = build_variant(source, ids, vecs, spec)
+            except ValueError as e:
+                print(f"{spec}: skipped: {e}")
+                continue
+            report[spec] = evaluate(db, store, qvs, relevant, ks, cache)
+
+        width = max([len(s) for s in report] + [6])
+        print(f"{'config':<{width}} {'k':>3} {'P@k':>7} {'R@k':>7} {'MRR@k':>7} {'nDCG@k':>7} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for spec, res in report.items():
+            lat = res["search_ms"]
+            for k in ks:
+                m = res["metrics"][k]
+                print(f"{spec:<{width}} {k:>3} {m['precision']:>7.4f} {m['recall']:>7.4f} {m['mrr']:>7.4f} "
+                      f"{m['ndcg']:>7.4f} {lat['p50']:>8.3f} {lat['p95']:>8.3f} {lat['p99']:>8.3f}")
 
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"samples": n, "embed_s": embed_s, "configs": report}, f, indent=2)
     finally:
         db.close()
 
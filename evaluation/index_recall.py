@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import os
+import time
+import argparse
+import numpy as np
+import faiss
+
+from app.config import settings
+from app.faiss_index import FaissStore, IndexConfig, INDEX_TYPES, LOSSY_TYPES
+
+
+def parse_list(csv: str) -> list[int]:
+    return [int(x) for x in csv.split(",") if x.strip()]
+
+
+def sample_queries(vecs: np.ndarray, n: int, noise: float, seed: int = 0) -> np.ndarray:
+    """
+    Query proxies: stored vectors perturbed by gaussian noise and re-normalized,
+    so the nearest neighbour is not trivially the vector itself.
+    """
+    rng = np.random.default_rng(seed)
+    pick = rng.choice(len(vecs), size=min(n, len(vecs)), replace=False)
+    q = vecs[pick] + noise * rng.standard_normal((len(pick), vecs.shape[1])).astype("float32") / np.sqrt(vecs.shape[1])
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return q.astype("float32")
+
+
+def exact_topk(ids: np.ndarray, vecs: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    flat = faiss.IndexFlatIP(vecs.shape[1])
+    flat.add(vecs)
+    _, pos = flat.search(queries, k)
+    return np.where(pos >= 0, ids[np.clip(pos, 0, None)], -1)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray, k: int) -> float:
+    hits = [len(np.intersect1d(f[:k][f[:k] >= 0], t[:k])) for f, t in zip(found, truth)]
+    return float(np.mean(hits)) / k
+
+
+def knob_values(
+    cfg: IndexConfig, nprobes: list[int], efs: list[int], reranks: list[int]
+) -> list[tuple[str, int | None]]:
+    if cfg.index_type.startswith("ivf"):
+        return [("nprobe", v) for v in nprobes]
+    if cfg.index_type == "hnsw":
+        return [("efSearch", v) for v in efs]
+    if cfg.index_type in LOSSY_TYPES:
+        return [("rerank_k", v) for v in reranks]
+    return [("-", None)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="recall@k and latency of approximate FAISS layouts vs. the exact flat index.")
+    ap.add_argument("--types", default=",".join(INDEX_TYPES), help=f"comma list of {INDEX_TYPES}")
+    ap.add_argument("--k", type=int, default=settings.top_k * 2)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--noise", type=float, default=0.5, help="query perturbation (0 = query with stored vectors)")
+    ap.add_argument("--nprobe", default="1,4,16,64")
+    ap.add_argument("--ef-search", default="16,64,256")
+    ap.add_argument("--rerank-k", default="0,50", help="float32 re-scoring depth for sq_fp16 / sq8 (ivf_pq: FAISS_RERANK_K)")
+    ap.add_argument("--nlist", type=int, default=None)
+    ap.add_argument("--pq-m", type=int, default=None)
+    ap.add_argument("--hnsw-m", type=int, default=None)
+    args = ap.parse_args()
+
+    if not os.path.exists(settings.faiss_index_path):
+        raise RuntimeError("FAISS index not found. Run ingest first.")
+
+    source = FaissStore.load(settings.faiss_index_path)
+    if source.index_type == "ivf_pq":
+        print("Warning: source index is ivf_pq; ground truth uses PQ-decoded vectors.")
+    ids, vecs = source.vectors()
+    if not len(ids):
+        print("Index is empty.")
+        return
+
+    queries = sample_queries(vecs, args.queries, args.noise)
+    truth = exact_topk(ids, vecs, queries, args.k)
+    overrides = {
+        name: val
+        for name, val in (("nlist", args.nlist), ("pq_m", args.pq_m), ("hnsw_m", args.hnsw_m))
+        if val is not None
+    }
+
+    print(f"Vectors: {len(ids)} dim={vecs.shape[1]} | queries: {len(queries)} | k={args.k}")
+    print(f"{'type':<9} {'knob':<14} {'recall@k':>9} {'ms/query':>9} {'build s':>8} {'index MB':>9}")
+    for t in [x.strip() for x in args.types.split(",") if x.strip()]:
+        cfg = IndexConfig.from_settings(index_type=t, **overrides)
+        # keep float32 originals so every rerank_k value can be tried on one build
+        if t in LOSSY_TYPES and t != "ivf_pq":
+            cfg.rerank_k = max(parse_list(args.rerank_k))
+        if cfg.min_train() > len(vecs):
+            print(f"{t:<9} skipped: needs >= {cfg.min_train()} vectors to train (have {len(vecs)}); try --nlist")
+            continue
+
+        t0 = time.perf_counter()
+        store = FaissStore.from_vectors(ids, vecs, cfg)
+        build_s = time.perf_counter() - t0
+        size_mb = faiss.serialize_index(store.index).nbytes / 1e6
+
+        for knob, val in knob_values(cfg, parse_list(args.nprobe), parse_list(args.ef_search), parse_list(args.rerank_k)):
+            if knob == "nprobe":
+                store.set_search_params(nprobe=val)
+            elif knob == "efSearch":
+                store.set_search_params(ef_search=val)
+            elif knob == "rerank_k":
+                store.config.rerank_k = val
+
+            found = np.array(store.search_many(queries, args.k)[1])
+            # latency as the API sees it: one query at a time
+            t0 = time.perf_counter()
+            for q in queries:
+                store.search(q, args.k)
+            ms = (time.perf_counter() - t0) * 1000 / len(queries)
+
+            label = f"{knob}={val}" if val is not None else "exact"
+            print(
+                f"{t:<9} {label:<14} {recall_at_k(found, truth, args.k):>9.4f} {ms:>9.3f} "
+                f"{build_s:>8.2f} {size_mb:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import os
+import time
+import argparse
+
+from app.config import settings
+from app.hashing import sha256_file
+from app.pdf_reader import PageTextCache, cached_pdf_pages, iter_pdf_pages
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="PDF page extraction: per-page timing and the page text cache.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    pages = sub.add_parser("pages", help="Extract one PDF and report per-page timing.")
+    pages.add_argument("pdf", help="PDF file")
+    pages.add_argument("--workers", type=int, default=settings.pdf_page_workers, help="Page extraction processes.")
+    pages.add_argument("--pages-per-task", type=int, default=0, help="Pages per worker task (0 = auto).")
+    pages.add_argument("--slowest", type=int, default=10, help="How many of the slowest pages to list.")
+    pages.add_argument("--out", default="", help="Optionally write the extracted text here (pages separated by form feeds).")
+    pages.add_argument("--no-cache", action="store_true", help="Always parse the PDF; do not read or fill the page cache.")
+
+    sub.add_parser("cache-info", help="Show page cache size per extractor version.")
+
+    prune = sub.add_parser("cache-prune", help="Delete page cache entries.")
+    prune.add_argument("--max-mb", type=float, default=None, help="Then evict least recently used entries down to this size.")
+    prune.add_argument("--older-than-days", type=float, default=None, help="Delete entries unused for this long.")
+    prune.add_argument("--all", action="store_true", help="Empty the cache.")
+    return ap.parse_args(argv)
+
+
+def cmd_pages(args: argparse.Namespace):
+    t0 = time.perf_counter()
+    if args.no_cache:
+        it = iter_pdf_pages(args.pdf, workers=args.workers, pages_per_task=args.pages_per_task)
+    else:
+        cache = PageTextCache(settings.page_cache_dir)
+        content_hash = sha256_file(args.pdf)
+        if cache.get(content_hash) is not None:
+            print("page cache hit (timings below are from the original extraction)")
+        it = cached_pdf_pages(args.pdf, content_hash, cache, workers=args.workers)
+
+    pages = []
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    try:
+        for p in it:
+            if out is not None:
+                out.write(p.text + "\f")
+            pages.append((p.page_number, p.seconds, p.extractor))  # timings only, not the text
+    finally:
+        if out is not None:
+            out.close()
+    wall = time.perf_counter() - t0
+
+    busy = sum(secs for _, secs, _ in pages)
+    fallback = [pno for pno, _, ex in pages if ex != "pdfplumber"]
+    print(f"{os.path.basename(args.pdf)}: {len(pages)} pages, wall {wall:.2f}s, extract busy {busy:.2f}s")
+    if pages:
+        print(f"  {len(pages) / max(wall, 1e-9):.1f} pages/s | mean {busy / len(pages) * 1000:.1f} ms/page")
+    if fallback:
+        print(f"  pypdf fallback on {len(fallback)} pages: {fallback[:50]}")
+    print("  slowest pages:")
+    for pno, secs, ex in sorted(pages, key=lambda p: p[1], reverse=True)[: args.slowest]:
+        print(f"    page {pno:>5}  {secs * 1000:8.1f} ms  ({ex})")
+
+
+def cmd_cache_info(args: argparse.Namespace):
+    info = PageTextCache(settings.page_cache_dir).info()
+    print(f"{info['root']}: {info['entries']} documents, {info['bytes'] / 2**20:.1f} MiB")
+    print(f"  current extractor version: {info['version']}")
+    for name, v in info["versions"].items():
+        tag = "current" if v["current"] else "stale"
+        print(f"  {name:<48} {v['entries']:>6} docs {v['bytes'] / 2**20:9.1f} MiB  ({tag})")
+
+
+def cmd_cache_prune(args: argparse.Namespace):
+    cache = PageTextCache(settings.page_cache_dir)
+    removed, freed = cache.prune(
+        max_bytes=int(args.max_mb * 2**20) if args.max_mb is not None else None,
+        older_than_s=args.older_than_days * 86400 if args.older_than_days is not None else None,
+        all_entries=args.all,
+    )
+    print(f"Removed {removed} entries, freed {freed / 2**20:.1f} MiB")
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    {"pages": cmd_pages, "cache-info": cmd_cache_info, "cache-prune": cmd_cache_prune}[args.cmd](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,71 +2,416 @@ from __future__ import annotations
 
 import os
 import glob
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from tqdm import tqdm
 
-from sqlalchemy.orm import Session
+import numpy as np
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.config import settings
-from app.db import engine, SessionLocal, Base
+from app.db import engine, SessionLocal, Base, add_missing_columns
+from app.hashing import sha256_file, text_hash
 from app.models import Document, Chunk
-from app.pdf_reader import read_pdf_pages
-from app.chunking import chunk_pages
+from app.pdf_reader import build_page_cache, cached_pdf_pages
+from app.chunking import chunk_pages, ChunkOut
+from app.chunk_store import ChunkStore
 from app.embeddings import Embedder
-from app.faiss_index import FaissStore
+from app.faiss_index import FaissStore, IndexConfig
+from app.index_manager import publish_index_version
+
+
+WRITE_BATCH = 5000  # rows per executemany in write_document
+
+
+@dataclass
+class StageStats:
+    name: str
+    docs: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    def line(self) -> str:
+        secs = max(self.seconds, 1e-9)
+        return (
+            f"{self.name:<6} docs={self.docs:<6} chunks={self.chunks:<8} busy={self.seconds:8.2f}s "
+            f"| {self.docs / secs:8.2f} docs/s | {self.chunks / secs:9.2f} chunks/s"
+        )
+
+
+def new_stats() -> dict[str, StageStats]:
+    return {name: StageStats(name) for name in ("parse", "embed", "write")}
 
 
 def ensure_db():
     os.makedirs(settings.data_dir, exist_ok=True)
     Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+
+
+def load_or_create_store(embedder: Embedder, rebuild: bool = False) -> FaissStore:
+    cfg = IndexConfig.from_settings()
+    if not os.path.exists(settings.faiss_index_path):
+        return FaissStore(embedder.dim(), cfg)
+    store = FaissStore.load(settings.faiss_index_path)
+    if store.index_type == cfg.index_type:
+        return store
+    if not rebuild:
+        print(
+            f"Existing index is {store.index_type!r} but FAISS_INDEX_TYPE={cfg.index_type!r}; "
+            "keeping the existing layout (pass --rebuild-index to convert)."
+        )
+        return store
+    if store.index_type == "ivf_pq":
+        print("Warning: rebuilding from an ivf_pq index uses PQ-decoded (approximate) vectors.")
+    print(f"Rebuilding index: {store.index_type} -> {cfg.index_type} ({store.ntotal} vectors)")
+    return FaissStore.from_vectors(*store.vectors(), cfg)
+
+
+def parse_pdf(pdf_path: str, content_hash: str | None = None, page_workers: int | None = None) -> list[ChunkOut]:
+    workers = settings.pdf_page_workers if page_workers is None else page_workers
+    content_hash = content_hash or sha256_file(pdf_path)
+    pages = cached_pdf_pages(pdf_path, content_hash, build_page_cache(), workers=workers)
+    return chunk_pages(
+        ((p.page_number, p.text) for p in pages),
+        chunk_size=settings.chunk_size,
+        overlap=settings.chunk_overlap,
+    )
+
+
+def existing_text_hashes(db: Session, pdf_path: str) -> set[str]:
+    rows = (
+        db.query(Chunk.text_hash, Chunk.text)
+        .join(Document, Document.id == Chunk.document_id)
+        .filter(Document.source_path == pdf_path)
+    )
+    # rows ingested before text_hash existed get hashed on the fly
+    return {h or text_hash(t) for h, t in rows}
+
+
+def embed_new_texts(embedder: Embedder, chunks: list[ChunkOut], known: set[str]) -> dict[str, np.ndarray]:
+    """
+    Embeds each distinct chunk text whose hash is not in `known` exactly once.
+    Returns {text_hash: vector}.
+    """
+    todo: dict[str, str] = {}
+    for c in chunks:
+        h = text_hash(c.text)
+        if h not in known and h not in todo:
+            todo[h] = c.text
+    if not todo:
+        return {}
+    vecs = embedder.encode(list(todo.values()))
+    return dict(zip(todo.keys(), vecs))
+
+
+def write_document(
+    db: Session,
+    store: FaissStore,
+    embedder: Embedder,
+    pdf_path: str,
+    content_hash: str,
+    chunks: list[ChunkOut],
+    new_vecs: dict[str, np.ndarray],
+    title: str = "",
+) -> int:
+    """
+    Inserts or updates a document from its parsed chunks.
+
+    Existing chunks whose text hash still occurs keep their row and vector_id
+    (only chunk_index / page range are refreshed); vectors of chunks that no
+    longer occur are removed from FAISS. Chunks without a reusable vector take
+    theirs from `new_vecs`. Callers must invoke this in document order so
+    vector ids stay deterministic. Returns the number of vectors added.
+    """
+    doc = db.query(Document).filter(Document.source_path == pdf_path).first()
+
+    if not chunks:
+        if doc is not None:
+            store.remove([c.vector_id for c in doc.chunks])
+            db.delete(doc)
+            db.commit()
+        return 0
+
+    if doc is None:
+        doc = Document(source_path=pdf_path, title=title or os.path.basename(pdf_path))
+        db.add(doc)
+        db.flush()  # get doc.id
+    doc.content_hash = content_hash
+    doc.ingested_at = time.time()
+
+    pool: dict[str, list[Chunk]] = {}
+    for row in sorted(doc.chunks, key=lambda r: r.chunk_index):
+        pool.setdefault(row.text_hash or text_hash(row.text), []).append(row)
+
+    hashes = [text_hash(c.text) for c in chunks]
+    reused: list[Chunk | None] = []
+    for h in hashes:
+        rows = pool.get(h)
+        reused.append(rows.pop(0) if rows else None)
+
+    # Rows are written with bulk Core/ORM-bulk statements (executemany), not
+    # per-object unit of work; the loaded Chunk objects are only read above and
+    # are expired by the commit below.
+    stale = [row for rows in pool.values() for row in rows]
+    store.remove([row.vector_id for row in stale])
+    for batch in _batches([row.id for row in stale]):
+        db.execute(delete(Chunk).where(Chunk.id.in_(batch)))
+    # move kept rows out of the way of uq_doc_chunkindex before renumbering
+    kept = [row for row in reused if row is not None]
+    for batch in _batches([{"id": row.id, "chunk_index": -(i + 1)} for i, row in enumerate(kept)]):
+        db.execute(update(Chunk), batch)
+
+    fresh = [i for i, row in enumerate(reused) if row is None]
+    # duplicate texts beyond the reusable rows: re-embed (rare, usually boilerplate)
+    missing = {hashes[i]: chunks[i].text for i in fresh if hashes[i] not in new_vecs}
+    if missing:
+        new_vecs = {**new_vecs, **dict(zip(missing.keys(), embedder.encode(list(missing.values()))))}
+    vector_ids = store.add(np.stack([new_vecs[hashes[i]] for i in fresh])) if fresh else []
+    vid_for = dict(zip(fresh, vector_ids))
+
+    updates, inserts = [], []
+    for i, (c, row) in enumerate(zip(chunks, reused)):
+        values = {
+            "chunk_index": c.chunk_index,
+            "page_start": c.page_start,
+            "page_end": c.page_end,
+            "text": c.text,
+            "text_hash": hashes[i],
+        }
+        if row is None:
+            inserts.append({"document_id": doc.id, "vector_id": vid_for[i], **values})
+        else:
+            updates.append({"id": row.id, **values})
+    for batch in _batches(updates):
+        db.execute(update(Chunk), batch)
+    for batch in _batches(inserts):
+        db.execute(insert(Chunk), batch)
+
+    db.commit()
+    return len(vector_ids)
 
 
-def load_or_create_store(embedder: Embedder) -> FaissStore:
-    if os.path.exists(settings.faiss_index_path):
-        return FaissStore.load(settings.faiss_index_path)
-    return FaissStore(embedder.dim())
+def _batches(items: list, size: int = WRITE_BATCH):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
 
 
-def ingest_pdf(db: Session, store: FaissStore, embedder: Embedder, pdf_path: str, title: str = ""):
+def ingest_pdf(
+    db: Session,
+    store: FaissStore,
+    embedder: Embedder,
+    pdf_path: str,
+    title: str = "",
+    stats: dict[str, StageStats] | None = None,
+    force: bool = False,
+):
     pdf_path = os.path.abspath(pdf_path)
+    stats = stats if stats is not None else new_stats()
 
+    t0 = time.perf_counter()
+    content_hash = sha256_file(pdf_path)
     existing = db.query(Document).filter(Document.source_path == pdf_path).first()
-    if existing:
-        # Simple strategy: skip if already ingested
+    if existing and existing.content_hash == content_hash and not force:
+        # unchanged file: hash check only, no parsing
         return
 
-    pages = read_pdf_pages(pdf_path)
-    tuples = [(p.page_number, p.text) for p in pages]
-    chunks = chunk_pages(tuples, chunk_size=900, overlap=150)
+    chunks = parse_pdf(pdf_path, content_hash)
+    _count(stats["parse"], chunks, time.perf_counter() - t0)
 
-    if not chunks:
-        return
+    t0 = time.perf_counter()
+    known = existing_text_hashes(db, pdf_path) if existing else set()
+    new_vecs = embed_new_texts(embedder, chunks, known)
+    _count(stats["embed"], chunks, time.perf_counter() - t0)
 
-    doc = Document(source_path=pdf_path, title=title or os.path.basename(pdf_path))
-    db.add(doc)
-    db.flush()  # get doc.id
-
-    texts = [c.text for c in chunks]
-    vecs = embedder.encode(texts)
-    vector_ids = store.add(vecs)
-
-    for c, vid in zip(chunks, vector_ids):
-        row = Chunk(
-            document_id=doc.id,
-            chunk_index=c.chunk_index,
-            page_start=c.page_start,
-            page_end=c.page_end,
-            text=c.text,
-            vector_id=vid,
-        )
-        db.add(row)
+    t0 = time.perf_counter()
+    write_document(db, store, embedder, pdf_path, content_hash, chunks, new_vecs, title=title)
+    _count(stats["write"], chunks, time.perf_counter() - t0)
+
+
+def _count(st: StageStats, chunks: list[ChunkOut], seconds: float):
+    st.docs += 1
+    st.chunks += len(chunks)
+    st.seconds += seconds
+
+
+def _parse_job(pdf_path: str, known_hash: str | None) -> tuple[str, str, list[ChunkOut] | None, float]:
+    # Runs inside a worker process; must stay a top-level function (picklable).
+    # chunks=None means the file is unchanged since its last ingest.
+    t0 = time.perf_counter()
+    content_hash = sha256_file(pdf_path)
+    if content_hash == known_hash:
+        return pdf_path, content_hash, None, time.perf_counter() - t0
+    # already one document per worker process: no nested page pool
+    chunks = parse_pdf(pdf_path, content_hash, page_workers=1)
+    return pdf_path, content_hash, chunks, time.perf_counter() - t0
+
+
+class _Failed:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+_DONE = object()
 
-    db.commit()
 
+def _put(q: queue.Queue, item, stop: threading.Event):
+    # Bounded put that gives up once the pipeline is aborting.
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
 
-def main():
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def ingest_pipelined(
+    db: Session,
+    store: FaissStore,
+    embedder: Embedder,
+    pdf_paths: list[str],
+    workers: int,
+    queue_size: int = 8,
+    stats: dict[str, StageStats] | None = None,
+    progress=None,
+    force: bool = False,
+):
+    """
+    Streaming ingest: parse+chunk runs in a process pool, embedding runs in a
+    thread, FAISS/DB writes run in the calling thread. Stages are connected by
+    bounded queues so a slow stage applies back-pressure instead of buffering
+    the whole corpus. Documents are written in input order, so vector ids and
+    DB rows are identical to a serial run.
+    """
+    stats = stats if stats is not None else new_stats()
+    pdf_paths = [os.path.abspath(p) for p in pdf_paths]
+    known = dict(
+        db.query(Document.source_path, Document.content_hash).filter(Document.source_path.in_(pdf_paths))
+    )
+    # the embed thread looks up hashes of changed documents through its own session
+    reader = sessionmaker(bind=db.get_bind(), future=True)()
+
+    parsed_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    embedded_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def produce(pool: ProcessPoolExecutor):
+        try:
+            inflight = deque()
+            for p in pdf_paths:
+                if stop.is_set():
+                    return
+                inflight.append(pool.submit(_parse_job, p, None if force else known.get(p)))
+                # keep every worker busy plus a small lookahead, never the whole corpus
+                if len(inflight) > workers + queue_size:
+                    _put(parsed_q, inflight.popleft().result(), stop)
+            while inflight and not stop.is_set():
+                _put(parsed_q, inflight.popleft().result(), stop)
+            _put(parsed_q, _DONE, stop)
+        except BaseException as e:  # surfaced in the writer thread
+            _put(parsed_q, _Failed(e), stop)
+
+    def embed():
+        try:
+            while True:
+                item = _get(parsed_q, stop)
+                if item is _DONE or isinstance(item, _Failed):
+                    _put(embedded_q, item, stop)
+                    return
+                path, content_hash, chunks, parse_secs = item
+                vecs = None
+                if chunks is not None:
+                    _count(stats["parse"], chunks, parse_secs)
+                    t0 = time.perf_counter()
+                    hashes = existing_text_hashes(reader, path) if path in known else set()
+                    vecs = embed_new_texts(embedder, chunks, hashes)
+                    _count(stats["embed"], chunks, time.perf_counter() - t0)
+                _put(embedded_q, (path, content_hash, chunks, vecs), stop)
+        except BaseException as e:
+            _put(embedded_q, _Failed(e), stop)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        threads = [
+            threading.Thread(target=produce, args=(pool,), daemon=True),
+            threading.Thread(target=embed, daemon=True),
+        ]
+        for t in threads:
+            t.start()
+        try:
+            while True:
+                item = embedded_q.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failed):
+                    raise item.exc
+                path, content_hash, chunks, vecs = item
+                if chunks is not None:
+                    t0 = time.perf_counter()
+                    write_document(db, store, embedder, path, content_hash, chunks, vecs)
+                    _count(stats["write"], chunks, time.perf_counter() - t0)
+                if progress is not None:
+                    progress.update(1)
+        finally:
+            stop.set()
+            for t in threads:
+                t.join()
+            reader.close()
+            pool.shutdown(wait=True, cancel_futures=True)
+    return stats
+
+
+def print_stats(stats: dict[str, StageStats], wall: float):
+    print("Stage throughput:")
+    for st in stats.values():
+        print(f"  {st.line()}")
+    docs = stats["write"].docs
+    chunks = stats["write"].chunks
+    wall = max(wall, 1e-9)
+    print(f"  wall   {wall:.2f}s | {docs / wall:.2f} docs/s | {chunks / wall:.2f} chunks/s")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Ingest PDFs from DATA_DIR/pdfs into SQLite + FAISS.")
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="PDF parse/chunk processes. 1 = serial ingest; >1 = pipelined streaming ingest.",
+    )
+    ap.add_argument("--queue-size", type=int, default=8, help="Bounded queue depth between pipeline stages.")
+    ap.add_argument(
+        "--rebuild-index",
+        action="store_true",
+        help="Convert an existing index to FAISS_INDEX_TYPE (trains IVF/PQ on the stored vectors).",
+    )
+    ap.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-chunk unchanged files too (e.g. after changing CHUNK_SIZE); page texts come from the page cache.",
+    )
+    return ap.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
     ensure_db()
-    embedder = Embedder()
-    store = load_or_create_store(embedder)
+    embedder = Embedder(use_cache=True)
+    store = load_or_create_store(embedder, rebuild=args.rebuild_index)
 
     # Ingest PDFs from DATA_DIR/pdfs by default
     pdf_dir = os.path.join(settings.data_dir, "pdfs")
@@ -76,17 +421,52 @@ def main():
     if not pdfs:
         print(f"No PDFs found in: {pdf_dir}")
         print("Put your banking documents as PDF files into that folder and re-run.")
+        if args.rebuild_index and store.ntotal:
+            store.save(settings.faiss_index_path)
+            publish_index_version(settings.faiss_index_path, store.ntotal)
+            print(f"Rebuilt FAISS index saved to: {settings.faiss_index_path}")
         return
 
+    stats = new_stats()
+    t0 = time.perf_counter()
     db = SessionLocal()
     try:
-        for p in tqdm(pdfs, desc="Ingesting PDFs"):
-            ingest_pdf(db, store, embedder, p)
+        if args.workers > 1:
+            with tqdm(total=len(pdfs), desc="Ingesting PDFs") as bar:
+                ingest_pipelined(
+                    db, store, embedder, pdfs, workers=args.workers, queue_size=args.queue_size,
+                    stats=stats, progress=bar, force=args.force,
+                )
+        else:
+            for p in tqdm(pdfs, desc="Ingesting PDFs"):
+                ingest_pdf(db, store, embedder, p, stats=stats, force=args.force)
     finally:
         db.close()
 
     store.save(settings.faiss_index_path)
-    print(f"Done. FAISS index saved to: {settings.faiss_index_path}")
+    if settings.chunk_store_enabled:
+        db = SessionLocal()
+        try:
+            ChunkStore.build(db, settings.chunk_store_dir)
+        finally:
+            db.close()
+    # last: running APIs reload once both files are in place
+    version = publish_index_version(settings.faiss_index_path, store.ntotal)
+    print_stats(stats, time.perf_counter() - t0)
+    es = embedder.stats()
+    embedder.close()
+    print(
+        f"Embedder: {es['texts']} texts in {es['seconds']:.2f}s | {es['texts_per_s']:.1f} texts/s "
+        f"| {es['batches']} batches | processes={es['processes']} | padding efficiency {es['padding_efficiency']:.0%}"
+    )
+    if embedder.cache is not None:
+        embedder.cache.flush()
+        cs = embedder.cache.stats()
+        print(
+            f"Embedding cache: hits={cs['hits']} misses={cs['misses']} hit_rate={cs['hit_rate']:.1%} "
+            f"entries={cs['entries']}/{cs['max_entries']}"
+        )
+    print(f"Done. FAISS index saved to: {settings.faiss_index_path} (version {version})")
 
 
 if __name__ == "__main__":
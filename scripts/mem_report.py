@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import os
+import argparse
+
+from app.config import settings
+from app.chunk_store import ChunkStore
+from app.faiss_index import exact_sidecar
+from app.memory import mapped_file_rss, process_memory
+
+
+def find_pids(match: str) -> list[int]:
+    pids = []
+    for name in os.listdir("/proc"):
+        if not name.isdigit() or int(name) == os.getpid():
+            continue
+        try:
+            with open(f"/proc/{name}/cmdline", "rb") as f:
+                cmd = f.read().replace(b"\0", b" ").decode("utf-8", "replace")
+        except OSError:
+            continue
+        if match in cmd:
+            pids.append(int(name))
+    return sorted(pids)
+
+
+def main(argv: list[str] | None = None):
+    ap = argparse.ArgumentParser(description="Resident vs. shared memory of API worker processes (Linux).")
+    ap.add_argument("--match", default="uvicorn", help="Substring of the worker command line.")
+    args = ap.parse_args(argv)
+
+    p = settings.faiss_index_path
+    text = os.path.join(ChunkStore.files_dir(settings.chunk_store_dir), "text.bin")
+    files = [p, exact_sidecar(p, "ids"), exact_sidecar(p, "vectors"), text]
+    pids = find_pids(args.match)
+    if not pids:
+        print(f"No processes matching {args.match!r}")
+        return
+
+    print(f"{'pid':>8} {'RSS MiB':>9} {'PSS MiB':>9} {'shared':>9} {'private':>9} {'index files':>12}")
+    total_rss = total_pss = 0.0
+    for pid in pids:
+        m = process_memory(pid)
+        if not m:
+            continue
+        idx = sum(mapped_file_rss(files, pid).values())
+        total_rss += m["rss_mb"]
+        total_pss += m["pss_mb"]
+        print(
+            f"{pid:>8} {m['rss_mb']:>9.1f} {m['pss_mb']:>9.1f} {m['shared_mb']:>9.1f} "
+            f"{m['private_mb']:>9.1f} {idx:>12.1f}"
+        )
+    # RSS counts shared pages once per process; PSS sums to the real footprint
+    print(f"{'total':>8} {total_rss:>9.1f} {total_pss:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
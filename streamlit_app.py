@@ -1,4 +1,5 @@
 import os
+import json
 import requests
 import streamlit as st
 
@@ -9,26 +10,58 @@ st.title("FinRAG – Bankacılık Dokümanları için RAG Asistanı")
 q = st.text_area("Soru", height=120, placeholder="Örn: Ücret ve komisyon iade şartları nelerdir?")
 ask = st.button("Sor")
 
+
+def sse_events(resp):
+    """Parses a text/event-stream response into (event, data) pairs."""
+    event, data = "message", []
+    for line in resp.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+
+def render_citations(meta):
+    st.caption(f"idk={meta['idk']} | top_score={meta.get('top_score')}")
+    st.subheader("Kaynaklar (Citations)")
+    for i, c in enumerate(meta["citations"], start=1):
+        st.markdown(
+            f"""
+**{i}. {os.path.basename(c['source_path'])}** (s. {c['page_start']}-{c['page_end']})  
+Skor: {c['score']:.3f} | chunk_id: {c['chunk_id']}  
+> {c['snippet']}
+"""
+        )
+
+
 if ask:
     if not q.strip():
         st.warning("Lütfen bir soru girin.")
     else:
+        st.subheader("Yanıt")
+        answer_box = st.empty()
+        sources_box = st.container()
         with st.spinner("Yanıt aranıyor..."):
-            r = requests.post(f"{API_URL}/ask", json={"question": q}, timeout=120)
-            if r.status_code != 200:
-                st.error(f"API error: {r.status_code}\n{r.text}")
-            else:
-                data = r.json()
-                st.subheader("Yanıt")
-                st.write(data["answer"])
-
-                st.caption(f"idk={data['idk']} | top_score={data.get('top_score')}")
-                st.subheader("Kaynaklar (Citations)")
-                for i, c in enumerate(data["citations"], start=1):
-                    st.markdown(
-                        f"""
-**{i}. {os.path.basename(c['source_path'])}** (s. {c['page_start']}-{c['page_end']})  
-Skor: {c['score']:.3f} | chunk_id: {c['chunk_id']}  
-> {c['snippet']}
-"""
-                    )
+            r = requests.post(f"{API_URL}/ask/stream", json={"question": q}, timeout=120, stream=True)
+        if r.status_code != 200:
+            st.error(f"API error: {r.status_code}\n{r.text}")
+        else:
+            answer = ""
+            for event, data in sse_events(r):
+                if event == "citations":
+                    # sources are known before the first token; show them right away
+                    with sources_box:
+                        render_citations(data)
+                elif event == "token":
+                    answer += data
+                    answer_box.markdown(answer + "▌")
+                elif event == "done":
+                    answer_box.markdown(data["answer"])
+                elif event == "error":
+                    st.error(f"API error: {data.get('detail')}")
@@ -0,0 +1,106 @@
+import hashlib
+
+import numpy as np
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.db import Base, make_engine
+import app.models  # noqa: F401  (register tables on Base.metadata)
+
+
+def _pdf_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages: list[str]):
+    """
+    Minimal text-only PDF writer (Helvetica, one text line per input line),
+    enough for pdfplumber / pypdf to extract the text back.
+    """
+    objs: list[bytes] = []
+    n_pages = len(pages)
+    # 1: catalog, 2: pages, 3: font, then (page, content) pairs
+    page_ids = [4 + 2 * i for i in range(n_pages)]
+    objs.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objs.append(f"<< /Type /Pages /Kids [{kids}] /Count {n_pages} >>".encode())
+    objs.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, text in enumerate(pages):
+        lines = text.split("\n")
+        ops = ["BT", "/F1 10 Tf", "14 TL", "40 800 Td"]
+        for ln in lines:
+            ops.append(f"({_pdf_escape(ln)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_ids[i] + 1} 0 R >>".encode()
+        )
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(bytes(out))
+    return str(path)
+
+
+class HashModel:
+    """Deterministic SentenceTransformer stand-in: same text -> same unit vector."""
+
+    def __init__(self, dim: int = 16):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, **kwargs):
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha256(t.encode("utf-8")).digest()[:8], "little")
+            v = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            out[i] = v / np.linalg.norm(v)
+        return out
+
+
+@pytest.fixture(autouse=True)
+def _page_cache_dir(tmp_path):
+    # keep the ingest-side page text cache out of ./data (own patcher: survives monkeypatch.undo())
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "page_cache_dir", str(tmp_path / "page_cache"))
+        yield
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    import app.embeddings as emb
+
+    monkeypatch.setattr(emb, "SentenceTransformer", lambda *_args, **_kwargs: HashModel())
+    return emb.Embedder()
+
+
+@pytest.fixture
+def db_factory(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
+    engine.dispose()
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    def _make(name: str, pages: list[str]):
+        d = tmp_path / "pdfs"
+        d.mkdir(exist_ok=True)
+        return write_pdf(d / name, pages)
+
+    return _make
@@ -0,0 +1,113 @@
+import json
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as api
+from app.config import settings
+from app.db import get_session
+from app.faiss_index import FaissStore
+from app.llm import LLM
+from app.rag import RAG
+from app.retriever import Retriever
+from scripts.ingest_cli import ingest_pdf
+
+
+class EchoLLM(LLM):
+    def generate(self, prompt: str) -> str:
+        return "EFT ucreti 5 TL."
+
+    async def astream(self, prompt: str):
+        for piece in ["EFT ", "ucreti ", "5 TL."]:
+            yield piece
+
+
+@pytest.fixture
+def client(make_pdf, embedder, db_factory, monkeypatch):
+    db = db_factory()
+    store = FaissStore(embedder.dim())
+    for i in range(3):
+        ingest_pdf(db, store, embedder, make_pdf(f"d{i}.pdf", [f"Belge {i}: EFT ucreti 5 TL.\n" * 30]))
+    monkeypatch.setattr(settings, "idk_threshold", -1.0)
+    monkeypatch.setattr(api, "build_rag", lambda s: RAG(Retriever(db=s, embedder=embedder, store=store), EchoLLM()))
+    api.app.dependency_overrides[get_session] = lambda: db
+    yield TestClient(api.app)
+    api.app.dependency_overrides.clear()
+    db.close()
+
+
+def _events(text: str):
+    out = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+
+def test_ask(client):
+    r = client.post("/ask", json={"question": "EFT ucreti nedir?"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["answer"] == "EFT ucreti 5 TL." and not body["idk"]
+    assert len(body["citations"]) == 3
+    assert all(c["chunk_ids"] == [c["chunk_id"]] for c in body["citations"])
+
+
+def test_ask_stream_sends_citations_then_tokens(client):
+    r = client.post("/ask/stream", json={"question": "EFT ucreti nedir?"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _events(r.text)
+    assert [e for e, _ in events] == ["citations", "token", "token", "token", "done"]
+    assert len(events[0][1]["citations"]) == 3
+    assert events[-1][1]["answer"] == "EFT ucreti 5 TL."
+
+
+def test_ask_batch_matches_single_asks(client, monkeypatch):
+    questions = ["EFT ucreti nedir?", "Belge 2 ne diyor?", "EFT ucreti nedir?"]
+    single = [client.post("/ask", json={"question": q}).json() for q in questions]
+
+    r = client.post("/ask/batch", json={"questions": questions})
+    assert r.status_code == 200
+    assert r.json()["results"] == single
+
+    monkeypatch.setattr(settings, "ask_batch_max_questions", 2)
+    assert client.post("/ask/batch", json={"questions": questions}).status_code == 413
+
+
+def test_server_timing_header_and_metrics(client):
+    r = client.post("/ask", json={"question": "EFT ucreti nedir?"})
+    stages = {part.split(";")[0].strip() for part in r.headers["server-timing"].split(",")}
+    assert {"embed", "search", "fetch", "prompt", "llm"} <= stages
+
+    text = client.get("/metrics").text
+    assert 'finrag_stage_seconds_count{stage="llm"}' in text
+    assert 'finrag_rag_requests_total{mode="answer"}' in text
+    assert 'finrag_http_request_seconds_count{method="POST",path="/ask",status="200"}' in text
+
+
+def test_identical_concurrent_asks_are_coalesced(client, monkeypatch):
+    class SlowLLM(EchoLLM):
+        calls = 0
+
+        async def agenerate(self, prompt: str) -> str:
+            SlowLLM.calls += 1
+            await asyncio.sleep(0.2)
+            return "EFT ucreti 5 TL."
+
+    build = api.build_rag
+    monkeypatch.setattr(api, "build_rag", lambda s: RAG(build(s).retriever, SlowLLM()))
+
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            questions = ["EFT ucreti nedir?", "eft  ucreti NEDIR?", "EFT ucreti nedir?", "Belge 2 ne diyor?"]
+            return await asyncio.gather(*(c.post("/ask", json={"question": q}) for q in questions))
+
+    before = api.flights.coalesced
+    responses = asyncio.run(run())
+    assert all(r.status_code == 200 for r in responses)
+    assert SlowLLM.calls == 2 and api.flights.coalesced - before == 2
+    assert responses[0].json() == responses[1].json() == responses[2].json()
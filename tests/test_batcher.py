@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.batcher import QueryBatcher
+from app.faiss_index import FaissStore
+
+
+def test_concurrent_queries_share_batches_and_get_their_own_rows(embedder):
+    store = FaissStore(embedder.dim())
+    texts = [f"metin {i}" for i in range(50)]
+    store.add(embedder.encode(texts))
+
+    calls = []
+    real = embedder.encode
+    embedder.encode = lambda t: calls.append(len(t)) or real(t)
+    batcher = QueryBatcher(embedder, max_wait_ms=50, max_batch=8)
+    try:
+        with ThreadPoolExecutor(16) as pool:
+            results = list(pool.map(lambda i: batcher.search(texts[i], store, 3), range(16)))
+    finally:
+        batcher.close()
+
+    for i, (scores, ids) in enumerate(results):
+        assert ids[0] == i and len(ids) == 3
+        assert np.isclose(scores[0], 1.0, atol=1e-5)
+    st = batcher.stats()
+    assert st["queries"] == 16 and sum(calls) == 16
+    assert st["batches"] < 16 and max(st["batch_size_histogram"]) <= 8
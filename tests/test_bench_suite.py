@@ -0,0 +1,21 @@
+from benchmarks import suite
+from benchmarks.synthetic import banking_pages
+
+
+def test_synthetic_corpus_is_deterministic():
+    assert banking_pages(3, seed=7) == banking_pages(3, seed=7)
+    assert banking_pages(3, seed=7) != banking_pages(3, seed=8)
+
+
+def test_suite_runs_offline_and_flags_regressions(tmp_path, monkeypatch):
+    monkeypatch.setitem(
+        suite.SCALES, "tiny", dict(docs=1, pages=2, vectors=500, queries=5, asks=6, concurrency=3)
+    )
+    report = suite.run("tiny", llm_latency_ms=0, workdir=str(tmp_path / "bench"))
+    r = report["results"]
+    assert r["ingest"]["chunks"] > 0 and r["ask"]["errors"] == 0
+    assert r["ask"]["requests"] == 6 and r["ask"]["p99_ms"] >= r["ask"]["p50_ms"]
+    assert suite.compare(report, report) == []
+
+    slower = {"results": {**r, "ask": {**r["ask"], "p95_ms": r["ask"]["p95_ms"] * 2}}}
+    assert [row[0] for row in suite.compare(slower, report)] == ["ask.p95_ms"]
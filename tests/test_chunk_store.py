@@ -0,0 +1,57 @@
+import os
+
+from app.chunk_store import ChunkStore
+from app.faiss_index import FaissStore
+from app.retriever import Retriever
+from scripts.ingest_cli import ingest_pdf
+
+
+def test_chunk_store_resolves_like_sql(make_pdf, embedder, db_factory, tmp_path):
+    db = db_factory()
+    store = FaissStore(embedder.dim())
+    a = make_pdf("a.pdf", ["Kredi karti aidati yillik 500 TL.\n" * 40, "Gecikme faizi aylik yuzde 4.\n" * 40])
+    ingest_pdf(db, store, embedder, a)
+    ingest_pdf(db, store, embedder, make_pdf("b.pdf", ["Havale ucreti sube kanalinda 10 TL.\n" * 40]))
+    # change a.pdf so some vector ids disappear (holes in the arrays)
+    make_pdf("a.pdf", ["Kredi karti aidati yillik 500 TL.\n" * 40, "Gecikme faizi aylik yuzde 5.\n" * 40])
+    ingest_pdf(db, store, embedder, a)
+
+    path = str(tmp_path / "chunk_store")
+    ChunkStore.build(db, path)
+    chunks = ChunkStore.load(path)
+
+    queries = ["aidat", "gecikme faizi", "havale ucreti"]
+    via_sql = Retriever(db, embedder, store).retrieve_many(queries, top_k=10)
+    via_arrays = Retriever(db, embedder, store, chunks=chunks).retrieve_many(queries, top_k=10)
+    assert via_sql == via_arrays
+    assert len(chunks) == store.ntotal
+
+    # vectors added after the store was built fall back to SQL
+    ingest_pdf(db, store, embedder, make_pdf("c.pdf", ["Yeni tarife: EFT 3 TL.\n" * 40]))
+    res = Retriever(db, embedder, store, chunks=chunks).retrieve("Yeni tarife: EFT 3 TL.\n" * 20, top_k=50)
+    assert any(r.source_path.endswith("c.pdf") for r in res)
+
+
+def test_rebuild_swaps_version_directory(make_pdf, embedder, db_factory, tmp_path):
+    db = db_factory()
+    store = FaissStore(embedder.dim())
+    ingest_pdf(db, store, embedder, make_pdf("a.pdf", ["Kredi karti aidati yillik 500 TL.\n" * 40]))
+    path = tmp_path / "chunk_store"
+    path.mkdir()
+    (path / "text.bin").write_bytes(b"old flat layout")  # store from before version directories
+
+    ChunkStore.build(db, str(path))
+    first = ChunkStore.files_dir(str(path))
+    old = ChunkStore.load(str(path))
+    ingest_pdf(db, store, embedder, make_pdf("b.pdf", ["Havale ucreti sube kanalinda 10 TL.\n" * 40]))
+    ChunkStore.build(db, str(path))
+    ChunkStore.build(db, str(path))
+
+    # the version before the current one is kept for readers mid-swap; older ones and tmp files go
+    names = sorted(p.name for p in path.iterdir())
+    assert len(names) == 3 and names[0] == "CURRENT" and all(n.startswith("v-") for n in names[1:])
+    assert os.path.basename(ChunkStore.files_dir(str(path))) in names
+    assert not os.path.exists(first)
+    assert not (path / "text.bin").exists()
+    assert len(ChunkStore.load(str(path))) == store.ntotal > len(old)
+    assert old.get(0).text.startswith("Kredi")  # the old mapping stays readable
@@ -12,3 +12,57 @@ def test_chunk_pages_basic():
     assert chunks[0].page_start == 1
     assert chunks[0].page_end == 1
     assert chunks[0].text.strip() != ""
+
+
+def _legacy_chunk_pages(pages, chunk_size=900, overlap=150):
+    # the pre-streaming implementation, kept as the reference for output equality
+    from app.chunking import ChunkOut, clean_text
+
+    full = []
+    for pno, txt in pages:
+        txt = clean_text(txt)
+        if txt:
+            full.append((txt + "\n\n", pno))
+    merged = "".join(t for t, _ in full)
+    ranges, cursor = [], 0
+    for t, pno in full:
+        ranges.append((cursor, cursor + len(t), pno))
+        cursor += len(t)
+
+    def page_for_char(idx):
+        for a, b, pno in ranges:
+            if a <= idx < b:
+                return pno
+        return ranges[-1][2] if ranges else 1
+
+    chunks = []
+    if not merged.strip():
+        return chunks
+    i, cidx, n = 0, 0, len(merged)
+    while i < n:
+        j = min(i + chunk_size, n)
+        text = merged[i:j].strip()
+        if text:
+            chunks.append(ChunkOut(cidx, page_for_char(i), page_for_char(j - 1), text))
+            cidx += 1
+        if j == n:
+            break
+        i = max(0, j - overlap)
+    return chunks
+
+
+def test_streaming_chunker_matches_legacy_output():
+    import random
+
+    from app.chunking import iter_chunks
+
+    rng = random.Random(7)
+    words = ["EFT", "havale", "ücret", "komisyon", "faiz", "\n", "\n\n\n", "  ", "\t"]
+    for trial in range(60):
+        pages = []
+        for pno in range(1, rng.randint(0, 25) + 1):
+            n = rng.choice([0, 0, 3, 40, 300, 2000])
+            pages.append((pno, " ".join(rng.choice(words) for _ in range(n))))
+        size = rng.choice([50, 200, 900])
+        overlap = rng.choice([0, 10, size // 3, size - 7])
+        assert list(iter_chunks(iter(pages), size, overlap)) == _legacy_chunk_pages(pages, size, overlap)
@@ -0,0 +1,47 @@
+from app.chunking import chunk_pages
+from app.context_packing import estimate_tokens, join_overlapping, pack_contexts
+from app.retriever import Retrieved
+
+PAGE = " ".join(f"Madde {i}: EFT islem ucreti tarifede {i} TL olarak belirtilir." for i in range(60))
+
+
+def _ctx(chunk, score, doc=1, chunk_id=None):
+    return Retrieved(
+        score=score,
+        chunk_id=chunk_id if chunk_id is not None else doc * 1000 + chunk.chunk_index,
+        source_path=f"/pdfs/d{doc}.pdf",
+        title="",
+        page_start=chunk.page_start,
+        page_end=chunk.page_end,
+        text=chunk.text,
+        document_id=doc,
+        chunk_index=chunk.chunk_index,
+    )
+
+
+def test_neighbouring_chunks_merge_without_repeating_the_overlap():
+    chunks = chunk_pages([(1, PAGE), (2, PAGE)], chunk_size=900, overlap=150)
+    a, b = chunks[2], chunks[3]
+    merged = join_overlapping(a.text, b.text)
+    assert merged.startswith(a.text) and merged.endswith(b.text)
+    assert len(merged) <= len(a.text) + len(b.text) - 140  # ~150 overlap chars sent once
+
+    packed = pack_contexts([_ctx(b, 0.9), _ctx(chunks[6], 0.7), _ctx(a, 0.8)], max_tokens=0, dedup_threshold=2)
+    assert [p.chunk_ids or (p.chunk_id,) for p in packed] == [(1002, 1003), (1006,)]
+    top = packed[0]
+    assert top.score == 0.9 and top.chunk_id == 1003 and top.text == merged
+    assert (top.page_start, top.page_end) == (min(a.page_start, b.page_start), max(a.page_end, b.page_end))
+
+
+def test_near_duplicates_dropped_and_budget_enforced():
+    chunks = chunk_pages([(1, PAGE)], chunk_size=900, overlap=150)
+    same_clause_other_doc = _ctx(chunks[0], 0.6, doc=2)
+    ctxs = [_ctx(chunks[0], 0.9), _ctx(chunks[3], 0.8), same_clause_other_doc]
+    assert len(pack_contexts(ctxs, max_tokens=0, dedup_threshold=0.9)) == 2
+    assert len(pack_contexts(ctxs, max_tokens=0, dedup_threshold=2)) == 3
+
+    budget = estimate_tokens(chunks[0].text) + 24 + 10  # room for one block only
+    packed = pack_contexts(ctxs, max_tokens=budget, dedup_threshold=2)
+    assert [p.chunk_id for p in packed] == [1000]
+    tiny = pack_contexts(ctxs, max_tokens=50, dedup_threshold=2)
+    assert len(tiny) == 1 and estimate_tokens(tiny[0].text) <= 26
@@ -0,0 +1,37 @@
+import sqlite3
+
+from sqlalchemy import insert, text
+
+from app.db import make_engine
+from app.models import Chunk, Document
+
+
+def test_sqlite_pragmas_applied_on_connect(db_factory):
+    db = db_factory()
+    assert db.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    assert db.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    assert db.execute(text("PRAGMA cache_size")).scalar() < 0
+    assert db.execute(text("PRAGMA busy_timeout")).scalar() > 0
+
+
+def test_reader_not_blocked_by_open_write_transaction(tmp_path):
+    path = tmp_path / "wal.sqlite"
+    engine = make_engine(f"sqlite:///{path}")
+    Document.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Document), [{"source_path": "a.pdf", "title": "a"}])
+
+    with engine.connect() as writer:
+        tx = writer.begin()
+        writer.execute(
+            insert(Chunk),
+            [{"document_id": 1, "chunk_index": i, "page_start": 1, "page_end": 1, "text": "t", "vector_id": i} for i in range(100)],
+        )
+        # a plain sqlite3 reader with no busy timeout sees the last committed snapshot without waiting
+        reader = sqlite3.connect(path, timeout=0)
+        assert reader.execute("SELECT count(*) FROM documents").fetchone() == (1,)
+        assert reader.execute("SELECT count(*) FROM chunks").fetchone() == (0,)
+        tx.commit()
+        assert reader.execute("SELECT count(*) FROM chunks").fetchone() == (100,)
+        reader.close()
+    engine.dispose()
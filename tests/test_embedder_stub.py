@@ -15,3 +15,35 @@ def test_embedder_encode_monkeypatch(monkeypatch):
     vecs = e.encode(["a", "b"])
     assert vecs.shape == (2, 3)
     assert vecs.dtype == np.float32
+
+
+def test_length_bucketed_batches_restore_input_order(embedder, monkeypatch):
+    from app.embeddings import plan_batches
+
+    texts = [("x" * n) + str(i) for i, n in enumerate([5, 400, 20, 900, 3, 60, 850, 7])]
+    batches = plan_batches([len(t) for t in texts], max_batch_size=4, max_batch_chars=1000)
+    assert sorted(np.concatenate(batches).tolist()) == list(range(len(texts)))
+    assert all(len(b) * max(len(texts[i]) for i in b) <= 1000 or len(b) == 1 for b in batches)
+    assert [len(b) for b in batches] == [1, 1, 2, 4]  # long texts alone, short ones together
+
+    expected = embedder.model.encode(texts)
+    seen = []
+    real = embedder.model.encode
+    monkeypatch.setattr(embedder.model, "encode", lambda batch, **kw: seen.append(len(batch)) or real(batch))
+    embedder.max_batch_size, embedder.max_batch_chars = 4, 1000
+    out = embedder.encode(texts)
+    assert np.allclose(out, expected)
+    assert seen == [1, 1, 2, 4]
+    assert embedder.stats()["texts"] == len(texts)
+
+
+def test_process_pool_matches_in_process(embedder):
+    import app.embeddings as emb
+
+    texts = [f"Belge {i}: " + "ucret " * (i % 50) for i in range(200)]
+    pooled = emb.Embedder(processes=2, mp_context="fork")  # fork: workers inherit the stub model
+    pooled.max_batch_size = 16
+    try:
+        assert np.allclose(pooled.encode(texts), embedder.encode(texts))
+    finally:
+        pooled.close()
@@ -0,0 +1,49 @@
+import numpy as np
+
+from app.embedding_cache import EmbeddingCache
+
+
+def _vecs(n, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype("float32")
+
+
+def test_cache_roundtrip_and_persistence(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model/a", 8)
+    texts = ["EFT ucreti", "havale  masrafi", "EFT ucreti"]
+    vecs, missing = cache.lookup(texts)
+    assert missing == [0, 1, 2]
+    cache.store(texts, _vecs(3))
+    cache.flush()
+
+    reopened = EmbeddingCache(str(tmp_path), "model/a", 8)
+    # whitespace-only differences hit the same key
+    vecs, missing = reopened.lookup(["havale masrafi", "EFT ucreti", "yeni metin"])
+    assert missing == [2]
+    assert np.allclose(vecs[0], _vecs(3)[1]) and np.allclose(vecs[1], _vecs(3)[0])
+    assert reopened.stats()["hits"] == 2
+
+    # keyed by model name too
+    assert EmbeddingCache(str(tmp_path), "model/b", 8).lookup(["EFT ucreti"])[1] == [0]
+
+
+def test_cache_is_size_bounded_with_lru_eviction(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "m", 8, max_entries=40, dtype="float16")
+    cache.store([f"t{i}" for i in range(40)], _vecs(40))
+    cache.lookup(["t0"])  # keep t0 hot
+    cache.store([f"u{i}" for i in range(5)], _vecs(5, seed=1))
+    assert len(cache) <= 40
+    assert cache.lookup(["t0", "u4"])[1] == []
+    # cold entries were recycled
+    assert len(cache.lookup([f"t{i}" for i in range(1, 40)])[1]) == 5
+
+
+def test_embedder_only_encodes_unseen_texts(embedder, tmp_path):
+    embedder.cache = EmbeddingCache(str(tmp_path), "m", embedder.dim())
+    seen = []
+    real = embedder._encode
+    embedder._encode = lambda texts: seen.extend(texts) or real(texts)
+
+    first = embedder.encode(["a", "b", "a"])
+    second = embedder.encode(["b", "c"])
+    assert seen == ["a", "b", "c"]
+    assert np.array_equal(first[1], second[0])
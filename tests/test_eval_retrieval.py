@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from app.faiss_index import FaissStore, IndexConfig
+from evaluation.eval_retrieval import (
+    build_variant,
+    evaluate,
+    precision_recall_at_k,
+    ranking_metrics,
+    relevance_matrix,
+)
+from scripts.ingest_cli import ingest_pdf
+
+
+def test_vectorized_metrics_match_per_query_loop():
+    rng = np.random.default_rng(0)
+    retrieved = rng.integers(0, 30, size=(50, 10))
+    retrieved[:5, 6:] = -1  # fewer results than k for some queries
+    relevant = [set(rng.integers(0, 30, size=rng.integers(1, 6)).tolist()) for _ in range(50)]
+
+    hits = relevance_matrix(retrieved, relevant)
+    m = ranking_metrics(hits, retrieved >= 0, np.array([len(r) for r in relevant]), [1, 5, 10])
+    for k in (1, 5, 10):
+        rows = [precision_recall_at_k([c for c in row if c >= 0], rel, k) for row, rel in zip(retrieved, relevant)]
+        assert m[k]["precision"] == pytest.approx(np.mean([p for p, _ in rows]))
+        assert m[k]["recall"] == pytest.approx(np.mean([r for _, r in rows]))
+        assert 0.0 <= m[k]["ndcg"] <= 1.0
+
+
+def test_mrr_and_ndcg_on_a_known_ranking():
+    retrieved = np.array([[7, 3, 9], [1, 2, 3]])
+    relevant = [{3}, {1, 3}]
+    m = ranking_metrics(relevance_matrix(retrieved, relevant), retrieved >= 0, np.array([1, 2]), [3])[3]
+    assert m["mrr"] == pytest.approx((1 / 2 + 1) / 2)
+    ndcg_q0 = (1 / np.log2(3)) / 1.0
+    ndcg_q1 = (1 + 1 / np.log2(4)) / (1 + 1 / np.log2(3))
+    assert m["ndcg"] == pytest.approx((ndcg_q0 + ndcg_q1) / 2)
+    assert m["recall"] == pytest.approx(1.0)
+
+
+def test_evaluate_configs_side_by_side(make_pdf, embedder, db_factory):
+    db = db_factory()
+    store = FaissStore(embedder.dim())
+    for i in range(3):
+        ingest_pdf(db, store, embedder, make_pdf(f"d{i}.pdf", [f"Belge {i}: kart aidati {i * 10} TL.\n" * 30]))
+    from app.models import Chunk
+
+    chunks = db.query(Chunk).all()
+    queries = [c.text for c in chunks[:4]]  # hash embedder: exact text -> exact vector
+    relevant = [{c.id} for c in chunks[:4]]
+    qvs = embedder.encode(queries)
+    ids, vecs = store.vectors()
+
+    cache = {}
+    for spec in ("current", "sq8:rerank_k=20", "hnsw:ef_search=16"):
+        res = evaluate(db, build_variant(store, ids, vecs, spec), qvs, relevant, [1, 3], cache)
+        assert res["metrics"][1]["mrr"] == pytest.approx(1.0)
+        assert set(res["search_ms"]) == {"p50", "p95", "p99"}
+    db.close()
+
+
+def test_current_variant_leaves_source_config_alone():
+    x = np.random.default_rng(0).standard_normal((50, 8)).astype("float32")
+    source = FaissStore.from_vectors(np.arange(50), x, IndexConfig(index_type="flat"))
+    variant = build_variant(source, None, None, "current:rerank_k=40")
+    assert variant.config.rerank_k == 40 and source.config.rerank_k == 0
+    assert build_variant(source, np.arange(50), x, "sq8").config.rerank_k == 0  # later specs unaffected
@@ -0,0 +1,133 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.faiss_index import FaissStore, IndexConfig, INDEX_TYPES, MmapFlatIndex, exact_sidecar
+
+
+def _unit(n, dim=16, seed=0):
+    x = np.random.default_rng(seed).standard_normal((n, dim)).astype("float32")
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_index_types_roundtrip(index_type, tmp_path):
+    cfg = IndexConfig(index_type=index_type, nlist=8, pq_m=8, pq_nbits=4, hnsw_m=8, nprobe=8, train_size=300)
+    store = FaissStore(16, cfg)
+    x = _unit(400)
+    assert store.add(x[:200]) == list(range(200))  # buffered until trained for IVF
+    store.add(x[200:])
+    assert store.ntotal == 400
+
+    assert store.remove([5, 6, 7]) == 3
+    assert store.ntotal == 397
+    _, ids = store.search(x[10], 5)
+    assert 5 not in ids
+    assert ids[0] == 10 if index_type != "ivf_pq" else 10 in ids  # PQ scores are approximate
+
+    path = str(tmp_path / "idx" / "faiss.index")
+    store.save(path)
+    loaded = FaissStore.load(path, cfg)
+    assert loaded.index_type == index_type
+    assert sorted(loaded.ids().tolist()) == sorted(set(range(400)) - {5, 6, 7})
+    assert loaded.add(x[:1]) == [400]
+
+
+def test_untrained_ivf_refuses_to_save_with_too_few_vectors(tmp_path):
+    store = FaissStore(16, IndexConfig(index_type="ivf_flat", nlist=64))
+    store.add(_unit(10))
+    with pytest.raises(ValueError, match="FAISS_NLIST"):
+        store.save(str(tmp_path / "faiss.index"))
+
+
+def test_rebuild_from_flat_preserves_ids():
+    flat = FaissStore(16, IndexConfig())
+    x = _unit(300)
+    flat.add(x)
+    flat.remove([0, 1])
+    hnsw = FaissStore.from_vectors(*flat.vectors(), IndexConfig(index_type="hnsw", hnsw_m=8))
+    assert hnsw.ntotal == 298
+    _, ids = hnsw.search(x[42], 1)
+    assert ids == [42]
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat"])
+def test_mmap_load_is_read_only_and_matches_heap_load(index_type, tmp_path):
+    cfg = IndexConfig(index_type=index_type, nlist=8, nprobe=8, train_size=300)
+    store = FaissStore(16, cfg)
+    x = _unit(500)
+    store.add(x)
+    store.remove([3, 4])
+    path = str(tmp_path / "faiss.index")
+    store.save(path, flat_sidecar_enabled=True)
+
+    heap = FaissStore.load(path, cfg)
+    mapped = FaissStore.load(path, cfg, mmap=True)
+    assert isinstance(mapped.index, MmapFlatIndex) == (index_type == "flat")
+    assert mapped.ntotal == 498
+    for q in (x[10], x[3], x[499]):
+        s_heap, i_heap = heap.search(q, 5)
+        s_map, i_map = mapped.search(q, 5)
+        assert i_map == i_heap
+        assert np.allclose(s_map, s_heap, atol=1e-5)
+    with pytest.raises(RuntimeError, match="read-only"):
+        mapped.add(x[:1])
+
+
+def test_mmap_flat_block_merge_and_padding():
+    x = _unit(50)
+    index = MmapFlatIndex(np.arange(100, 150), x, block=7)
+    scores, ids = index.search(x[[20, 41]], 60)
+    assert ids[0, 0] == 120 and ids[1, 0] == 141
+    assert (np.diff(scores[:, :50], axis=1) <= 0).all()
+    assert (ids[:, 50:] == -1).all()  # k > ntotal: padded like FAISS
+
+
+def test_save_without_sidecar_removes_stale_one(tmp_path):
+    store = FaissStore(16, IndexConfig())
+    store.add(_unit(20))
+    path = str(tmp_path / "faiss.index")
+    store.save(path, flat_sidecar_enabled=True)
+    store.add(_unit(5, seed=1))
+    store.save(path, flat_sidecar_enabled=False)
+    assert not any(os.path.exists(exact_sidecar(path, p)) for p in ("ids", "vectors"))
+    assert FaissStore.load(path, mmap=True).ntotal == 25
+
+
+def test_sq8_rerank_restores_exact_scores_across_save_and_load(tmp_path):
+    x = _unit(600)
+    flat = FaissStore(16, IndexConfig())
+    flat.add(x)
+    cfg = IndexConfig(index_type="sq8", rerank_k=30, train_size=200)
+    store = FaissStore(16, cfg)
+    store.add(x[:400])
+    path = str(tmp_path / "faiss.index")
+    store.save(path)
+
+    # appended after the sidecar was written, then removed: both must be handled
+    store = FaissStore.load(path, cfg)
+    assert store.add(x[400:]) == list(range(400, 600))
+    flat.remove([7, 450])
+    store.remove([7, 450])
+    queries = _unit(20, seed=3)
+    for q in queries:
+        s, ids = store.search(q, 5)
+        s_flat, ids_flat = flat.search(q, 5)
+        assert ids == ids_flat and np.allclose(s, s_flat, atol=1e-6)
+    store.save(path)
+
+    mapped = FaissStore.load(path, cfg, mmap=True)
+    assert len(mapped._exact[0]) == 598
+    for q in queries:
+        s, ids = mapped.search(q, 5)
+        s_flat, ids_flat = flat.search(q, 5)
+        assert ids == ids_flat and np.allclose(s, s_flat, atol=1e-6)
+
+
+def test_flush_trains_buffered_ivf_vectors_before_search():
+    store = FaissStore(16, IndexConfig(index_type="ivf_flat", nlist=8, train_size=10_000))
+    store.add(_unit(100))
+    assert not store.index.is_trained
+    store.flush()
+    assert store.index.is_trained and store.index.ntotal == 100
@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+from sqlalchemy import update
+
+import api.main as api
+from app.chunk_store import ChunkStore
+from app.config import settings
+from app.faiss_index import FaissStore, IndexConfig, INDEX_TYPES
+from app.filters import SearchFilter
+from app.models import Document
+from app.retriever import Retriever
+from app.semantic_cache import SemanticCache
+from scripts.ingest_cli import ingest_pdf
+
+
+def _unit(n, dim=16, seed=0):
+    x = np.random.default_rng(seed).standard_normal((n, dim)).astype("float32")
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("exact_max", [0, 10_000])  # FAISS selector / exact scan of the allowed vectors
+@pytest.mark.parametrize("index_type", INDEX_TYPES + ("mmap",))
+def test_filtered_search_returns_top_k_allowed(index_type, exact_max, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "faiss_filter_exact_max", exact_max)
+    x = _unit(600)
+    cfg = IndexConfig(
+        index_type="flat" if index_type == "mmap" else index_type,
+        nlist=8, pq_m=8, pq_nbits=4, hnsw_m=8, nprobe=8, ef_search=64, train_size=300,
+    )
+    store = FaissStore.from_vectors(np.arange(600), x, cfg)
+    if index_type == "mmap":
+        path = str(tmp_path / "faiss.index")
+        store.save(path, flat_sidecar_enabled=True)
+        store = FaissStore.load(path, cfg, mmap=True)
+
+    allowed = np.arange(3, 600, 50)  # 12 vectors, mostly far from the queries
+    q = x[[10, 20]]
+    scores, ids = store.search_many(q, 5, allowed=allowed)
+    assert all(len(row) == 5 and set(row) <= set(allowed.tolist()) for row in ids)
+    if index_type in ("flat", "mmap", "sq_fp16") or (exact_max and index_type in ("ivf_flat", "hnsw")):
+        expected = allowed[np.argsort(-(q @ x[allowed].T), axis=1)[:, :5]]
+        assert ids == expected.tolist()
+
+    assert store.search(q[0], 5, allowed=np.empty(0, dtype="int64"))[1] == [-1] * 5
+
+
+@pytest.fixture
+def corpus(make_pdf, embedder, db_factory):
+    db = db_factory()
+    store = FaissStore(embedder.dim())
+    paths = [
+        make_pdf("kart_tarife.pdf", ["Kredi karti aidati yillik 500 TL.\n" * 40]),
+        make_pdf("kart_sozlesme.pdf", ["Kart sozlesmesi: gecikme faizi aylik yuzde 4.\n" * 40]),
+        make_pdf("genelge_2023.pdf", ["EFT ucreti 5 TL.\n" * 40, "Havale ucreti 3 TL.\n" * 40]),
+    ]
+    for p, title in zip(paths, ["Kart Tarifesi", "Kart Sozlesmesi", "Genelge 2023"]):
+        ingest_pdf(db, store, embedder, p, title=title)
+    docs = {d.title: d for d in db.query(Document)}
+    db.execute(update(Document).where(Document.title == "Genelge 2023").values(ingested_at=1_680_000_000.0))
+    db.commit()
+    yield db, store, docs
+    db.close()
+
+
+def test_retriever_filters_by_document_metadata(corpus, embedder, tmp_path):
+    db, store, docs = corpus
+    ChunkStore.build(db, str(tmp_path / "cs"))
+    chunks = ChunkStore.load(str(tmp_path / "cs"))
+    prefix = docs["Genelge 2023"].source_path.rsplit("/", 1)[0] + "/kart_"
+
+    cases = {
+        SearchFilter(document_ids=(docs["Genelge 2023"].id,)): {"Genelge 2023"},
+        SearchFilter(source_prefix=prefix): {"Kart Tarifesi", "Kart Sozlesmesi"},
+        SearchFilter(title="kart"): {"Kart Tarifesi", "Kart Sozlesmesi"},
+        SearchFilter(title="kart", ingested_after=1_700_000_000.0): {"Kart Tarifesi", "Kart Sozlesmesi"},
+        SearchFilter(ingested_before=1_700_000_000.0): {"Genelge 2023"},
+        SearchFilter(title="KART", source_prefix=prefix.upper()): set(),
+    }
+    for sf, titles in cases.items():
+        for retriever in (Retriever(db, embedder, store), Retriever(db, embedder, store, chunks=chunks)):
+            res = retriever.retrieve("EFT ucreti 5 TL.\n" * 20, top_k=50, filters=sf)
+            assert {r.title for r in res} == titles, sf
+            many = retriever.retrieve_many(["aidat", "EFT"], top_k=50, filters=sf)
+            assert all({r.title for r in rows} == titles for rows in many)
+
+    query = "EFT ucreti 5 TL.\n" * 20
+    retriever = Retriever(db, embedder, store)
+    assert retriever.retrieve(query, top_k=2, filters=SearchFilter()) == retriever.retrieve(query, top_k=2)
+    assert SearchFilter(document_ids=(2, 1)).key() == SearchFilter(document_ids=(1, 2, 1)).key()
+
+
+def test_title_filter_is_unicode_case_insensitive(make_pdf, embedder, db_factory):
+    db = db_factory()
+    store = FaissStore(embedder.dim())
+    ingest_pdf(db, store, embedder, make_pdf("islem.pdf", ["EFT ucreti 5 TL.\n" * 40]), title="İşlem Ücretleri")
+    ingest_pdf(db, store, embedder, make_pdf("kart.pdf", ["Kart aidati 500 TL.\n" * 40]), title="Kart Tarifesi")
+    retriever = Retriever(db, embedder, store)
+    for title in ("işlem", "İŞLEM ÜCRET", "ücretleri", "ÜCRETLERİ"):
+        res = retriever.retrieve("EFT", top_k=50, filters=SearchFilter(title=title))
+        assert {r.title for r in res} == {"İşlem Ücretleri"}, title
+    assert retriever.retrieve("EFT", top_k=50, filters=SearchFilter(title="%")) == []  # LIKE wildcards escaped
+    db.close()
+
+
+def test_chunk_store_vector_ids_of(corpus, tmp_path):
+    db, store, docs = corpus
+    ChunkStore.build(db, str(tmp_path / "cs"))
+    chunks = ChunkStore.load(str(tmp_path / "cs"))
+    doc = docs["Genelge 2023"]
+    assert chunks.vector_ids_of([doc.id]).tolist() == sorted(c.vector_id for c in doc.chunks)
+    assert chunks.vector_ids_of([-1, 10_000]).tolist() == []
+
+
+def test_semantic_cache_entries_are_scoped():
+    cache = SemanticCache(dim=4, threshold=0.9)
+    v = np.array([1, 0, 0, 0], dtype="float32")
+    cache.put(v, "soru", "kart cevabi", "1", scope='{"title": "kart"}')
+    assert cache.get(v, "1") is None
+    assert cache.get(v, "1", scope='{"title": "kart"}') == "kart cevabi"
+
+
+def test_ask_with_filters(corpus, embedder, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.db import get_session
+    from app.rag import RAG
+    from tests.test_api import EchoLLM
+
+    db, store, docs = corpus
+    monkeypatch.setattr(settings, "idk_threshold", -1.0)
+    monkeypatch.setattr(api, "build_rag", lambda s: RAG(Retriever(db=s, embedder=embedder, store=store), EchoLLM()))
+    api.app.dependency_overrides[get_session] = lambda: db
+    try:
+        client = TestClient(api.app)
+        body = {"question": "Ucretler nedir?", "filters": {"ingested_before": "2024-01-01T00:00:00"}}
+        cites = client.post("/ask", json=body).json()["citations"]
+        assert cites and {c["title"] for c in cites} == {"Genelge 2023"}
+
+        body["filters"] = {"document_ids": [10_000]}
+        assert client.post("/ask", json=body).json()["idk"]
+        assert client.post("/ask", json={"question": "x", "filters": {}}).status_code == 200
+    finally:
+        api.app.dependency_overrides.clear()
+
+    rag = api.build_rag(db)
+    assert api.flight_key(rag, "q") != api.flight_key(rag, "q", SearchFilter(title="kart"))
@@ -0,0 +1,73 @@
+import numpy as np
+
+import scripts.ingest_cli as ingest
+from app.faiss_index import FaissStore
+from app.models import Chunk, Document
+
+
+def _page(tag: str) -> str:
+    return f"Sayfa {tag}: kredi karti aidat ve komisyon kosullari.\n" * 20
+
+
+def test_reingest_only_embeds_changed_chunks(make_pdf, embedder, db_factory, monkeypatch):
+    db = db_factory()
+    store = FaissStore(embedder.dim())
+    path = make_pdf("tarife.pdf", [_page("A"), _page("B"), _page("C")])
+    ingest.ingest_pdf(db, store, embedder, path)
+
+    before = {c.text_hash: (c.id, c.vector_id) for c in db.query(Chunk)}
+    assert store.ntotal == len(before)
+
+    # unchanged bytes: skipped on the hash check, never parsed
+    monkeypatch.setattr(ingest, "parse_pdf", lambda *_: (_ for _ in ()).throw(AssertionError("parsed")))
+    ingest.ingest_pdf(db, store, embedder, path)
+    monkeypatch.undo()
+
+    encoded = []
+    real_encode = embedder.encode
+    monkeypatch.setattr(embedder, "encode", lambda texts: encoded.extend(texts) or real_encode(texts))
+    make_pdf("tarife.pdf", [_page("A"), _page("B"), _page("Z")])
+    ingest.ingest_pdf(db, store, embedder, path)
+
+    after = {c.text_hash: (c.id, c.vector_id) for c in db.query(Chunk)}
+    kept = before.keys() & after.keys()
+    assert kept and len(encoded) == len(after) - len(kept)
+    assert all(before[h] == after[h] for h in kept)
+
+    # FAISS holds exactly the live vectors, stale ones are gone
+    ids, _ = store.vectors()
+    assert sorted(ids.tolist()) == sorted(v for _, v in after.values())
+    assert db.query(Document).one().content_hash != ""
+
+
+def test_force_rechunks_from_page_cache(make_pdf, embedder, db_factory, monkeypatch):
+    db = db_factory()
+    store = FaissStore(embedder.dim())
+    path = make_pdf("tarife.pdf", [_page("A"), _page("B")])
+    ingest.ingest_pdf(db, store, embedder, path)
+    n_before = db.query(Chunk).count()
+
+    monkeypatch.setattr("app.pdf_reader.iter_pdf_pages", lambda *a, **kw: (_ for _ in ()).throw(AssertionError("parsed")))
+    monkeypatch.setattr(ingest.settings, "chunk_size", 300)
+    monkeypatch.setattr(ingest.settings, "chunk_overlap", 50)
+    ingest.ingest_pdf(db, store, embedder, path, force=True)
+
+    rows = db.query(Chunk).all()
+    assert len(rows) > n_before
+    assert max(len(c.text) for c in rows) <= 300
+    assert store.ntotal == len(rows)
+
+
+def test_legacy_flat_index_is_wrapped_with_positional_ids(tmp_path):
+    import faiss
+
+    flat = faiss.IndexFlatIP(4)
+    flat.add(np.eye(4, dtype="float32"))
+    faiss.write_index(flat, str(tmp_path / "old.index"))
+
+    store = FaissStore.load(str(tmp_path / "old.index"))
+    assert store.ids().tolist() == [0, 1, 2, 3]
+    assert store.add(np.ones((1, 4), dtype="float32")) == [4]
+    assert store.remove([1]) == 1
+    _, ids = store.search(np.eye(4, dtype="float32")[1], 5)
+    assert 1 not in ids
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from app.faiss_index import FaissStore
+from app.index_manager import IndexManager, publish_index_version, read_index_version
+
+
+def _vecs(n, dim=8, seed=0):
+    v = np.random.default_rng(seed).standard_normal((n, dim)).astype("float32")
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def test_reload_swaps_snapshot_and_keeps_old_one_for_holders(tmp_path):
+    path = str(tmp_path / "faiss.index")
+    store = FaissStore(8)
+    store.add(_vecs(10))
+    store.save(path)
+    assert publish_index_version(path, store.ntotal) == "1"
+
+    loads = []
+
+    def load():
+        loads.append(1)
+        return FaissStore.load(path), None
+
+    manager = IndexManager(path, load, poll_interval_s=0)
+    held = manager.current()
+    assert held.version == "1" and held.store.ntotal == 10
+    assert manager.check() is False  # nothing new published
+
+    store.add(_vecs(5, seed=1))
+    store.save(path)
+    publish_index_version(path, store.ntotal)
+    assert manager.check() is True
+
+    assert manager.current().version == "2" and manager.current().store.ntotal == 15
+    assert held.store.ntotal == 10  # in-flight request still on its snapshot
+    assert len(loads) == 2
+
+
+def test_failed_reload_keeps_serving_previous_snapshot(tmp_path):
+    path = str(tmp_path / "faiss.index")
+    FaissStore(8).save(path)
+    calls = []
+
+    def load():
+        calls.append(1)
+        if len(calls) > 1:
+            raise OSError("truncated index")
+        return FaissStore.load(path), None
+
+    manager = IndexManager(path, load, poll_interval_s=0)
+    first = manager.current()
+    assert first.version.startswith("mtime-")  # index written without a version file
+
+    publish_index_version(path, 0)
+    try:
+        manager.check()
+    except OSError:
+        pass
+    assert manager.current() is first
+    assert read_index_version(path) == "1"
+
+
+def test_snapshot_is_not_swapped_while_publishes_keep_landing(tmp_path):
+    path = str(tmp_path / "faiss.index")
+    FaissStore(8).save(path)
+    publish_index_version(path, 0)
+    racing = []
+
+    def load():
+        if racing:
+            publish_index_version(path, 0)  # another ingest publishes during every load
+        return FaissStore.load(path), None
+
+    manager = IndexManager(path, load, poll_interval_s=0)
+    first = manager.current()
+    racing.append(1)
+    publish_index_version(path, 0)
+    with pytest.raises(RuntimeError, match="changed during"):
+        manager.check()
+    assert manager.current() is first and manager.reloads == 0
+
+    racing.clear()
+    assert manager.check() is True and manager.current().version == read_index_version(path)
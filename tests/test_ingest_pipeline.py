@@ -0,0 +1,48 @@
+import numpy as np
+
+from app.faiss_index import FaissStore
+from app.models import Chunk, Document
+from scripts.ingest_cli import ingest_pdf, ingest_pipelined, new_stats
+
+
+def _corpus(make_pdf):
+    paths = []
+    for d in range(4):
+        pages = [f"Belge {d} sayfa {p}: EFT ucreti ve havale masraflari.\n" * 12 for p in range(3)]
+        paths.append(make_pdf(f"doc{d}.pdf", pages))
+    return paths
+
+
+def _snapshot(db, store):
+    rows = (
+        db.query(Document.source_path, Chunk.chunk_index, Chunk.page_start, Chunk.page_end, Chunk.text, Chunk.vector_id)
+        .join(Chunk, Chunk.document_id == Document.id)
+        .order_by(Chunk.vector_id)
+        .all()
+    )
+    _, vecs = store.vectors()
+    return [tuple(r) for r in rows], vecs
+
+
+def test_pipelined_ingest_matches_serial(make_pdf, embedder, db_factory, tmp_path):
+    paths = _corpus(make_pdf)
+
+    serial_db = db_factory()
+    serial_store = FaissStore(embedder.dim())
+    for p in paths:
+        ingest_pdf(serial_db, serial_store, embedder, p)
+    rows_a, vecs_a = _snapshot(serial_db, serial_store)
+
+    # fresh tables for the pipelined run
+    for tbl in (Chunk, Document):
+        serial_db.query(tbl).delete()
+    serial_db.commit()
+    piped_store = FaissStore(embedder.dim())
+    stats = ingest_pipelined(serial_db, piped_store, embedder, paths, workers=2, queue_size=1, stats=new_stats())
+    rows_b, vecs_b = _snapshot(serial_db, piped_store)
+
+    assert rows_a and rows_a == rows_b
+    assert np.array_equal(vecs_a, vecs_b)
+    assert stats["parse"].docs == len(paths)
+    assert stats["write"].chunks == len(rows_b)
+    serial_db.close()
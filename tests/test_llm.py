@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+import httpx
+
+from app.config import settings
+from app.llm import OllamaLLM, OpenAILLM
+
+
+def test_ollama_async_reuses_client_and_caps_concurrency(monkeypatch):
+    monkeypatch.setattr(settings, "ollama_max_concurrency", 2)
+    state = {"active": 0, "peak": 0, "calls": 0}
+
+    async def handler(request: httpx.Request):
+        state["calls"] += 1
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return httpx.Response(200, json={"response": " cevap "})
+
+    async def run():
+        llm = OllamaLLM()
+        llm._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        client = llm._aclient()
+        answers = await asyncio.gather(*(llm.agenerate(f"soru {i}") for i in range(6)))
+        assert llm._aclient() is client
+        await llm.aclose()
+        return answers
+
+    answers = asyncio.run(run())
+    assert answers == ["cevap"] * 6
+    assert state["calls"] == 6 and state["peak"] == 2
+
+
+def test_ollama_astream_yields_ndjson_pieces():
+    lines = [{"response": "EFT ", "done": False}, {"response": "5 TL", "done": False}, {"response": "", "done": True}]
+
+    async def handler(request: httpx.Request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, text="\n".join(json.dumps(x) for x in lines) + "\n")
+
+    async def run():
+        llm = OllamaLLM()
+        llm._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return [p async for p in llm.astream("soru")]
+
+    assert asyncio.run(run()) == ["EFT ", "5 TL"]
+
+
+def test_openai_sse_piece_parsing():
+    assert OpenAILLM._piece('data: {"choices":[{"delta":{"content":"Mer"}}]}') == "Mer"
+    assert OpenAILLM._piece(": keep-alive") == ""
+    assert OpenAILLM._piece("data: [DONE]") is None
@@ -0,0 +1,36 @@
+from app import metrics
+
+
+def test_histogram_and_counter_render_prometheus_text():
+    h = metrics.Histogram("t_seconds", "test", ("stage",), buckets=(0.01, 0.1))
+    for v in (0.005, 0.05, 0.5):
+        h.observe(v, "embed")
+    c = metrics.Counter("t_total", "test", ("cache", "result"))
+    c.inc(2, "llm", "hit")
+
+    text = "\n".join(h.render() + c.render())
+    assert 't_seconds_bucket{stage="embed",le="0.01"} 1' in text
+    assert 't_seconds_bucket{stage="embed",le="0.1"} 2' in text
+    assert 't_seconds_bucket{stage="embed",le="+Inf"} 3' in text
+    assert 't_seconds_count{stage="embed"} 3' in text
+    assert 't_total{cache="llm",result="hit"} 2' in text
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", False)
+    before = metrics.IDK.value("test")
+    with metrics.timer("embed") as t:
+        pass
+    metrics.inc(metrics.IDK, "test")
+    assert metrics.start_request() is None
+    assert metrics.IDK.value("test") == before
+    assert t is metrics.timer("search")  # shared no-op, no allocation per call
+
+
+def test_request_timings_collected_per_context():
+    timings = metrics.start_request()
+    with metrics.timer("search"):
+        pass
+    metrics.record_stage("search", 0.002)
+    assert set(timings) == {"search"} and timings["search"] >= 0.002
+    assert metrics.server_timing({"embed": 0.0015}) == "embed;dur=1.50"
@@ -0,0 +1,72 @@
+import pdfplumber.page
+
+from app.pdf_reader import PageTextCache, cached_pdf_pages, iter_pdf_pages, read_pdf_pages
+
+
+def _pages(n):
+    return [f"Sayfa {i} metni: kredi karti aidati." for i in range(1, n + 1)]
+
+
+def test_parallel_extraction_matches_serial_order(make_pdf):
+    path = make_pdf("report.pdf", _pages(23))
+    serial = read_pdf_pages(path)
+    parallel = list(iter_pdf_pages(path, workers=2, pages_per_task=4))
+
+    assert [p.page_number for p in parallel] == list(range(1, 24))
+    assert [p.text for p in parallel] == [p.text for p in serial]
+    assert "Sayfa 17" in parallel[16].text
+    assert all(p.seconds >= 0 for p in parallel)
+
+
+def test_pypdf_fallback_only_for_failing_pages(make_pdf, monkeypatch):
+    path = make_pdf("bad.pdf", _pages(4))
+    original = pdfplumber.page.Page.extract_text
+
+    def flaky(self, *a, **kw):
+        if self.page_number == 3:
+            raise ValueError("broken content stream")
+        return original(self, *a, **kw)
+
+    monkeypatch.setattr(pdfplumber.page.Page, "extract_text", flaky)
+    pages = read_pdf_pages(path)
+
+    assert [p.extractor for p in pages] == ["pdfplumber", "pdfplumber", "pypdf", "pdfplumber"]
+    assert "Sayfa 3" in pages[2].text
+
+
+def test_page_cache_skips_parsing_on_hit(make_pdf, tmp_path, monkeypatch):
+    path = make_pdf("cached.pdf", _pages(5))
+    cache = PageTextCache(str(tmp_path / "pc"))
+    first = list(cached_pdf_pages(path, "abc", cache))
+
+    def boom(*a, **kw):
+        raise AssertionError("PDF parsed despite cache hit")
+
+    monkeypatch.setattr("app.pdf_reader.iter_pdf_pages", boom)
+    again = list(cached_pdf_pages(path, "abc", cache))
+    assert [(p.page_number, p.text, p.extractor) for p in again] == [
+        (p.page_number, p.text, p.extractor) for p in first
+    ]
+    assert cache.info()["entries"] == 1
+
+    # another extractor version is stale: pruned, current entry kept
+    PageTextCache(str(tmp_path / "pc"), version="0-old").put("abc", first)
+    assert cache.prune() == (1, cache.info()["bytes"])
+    assert cache.get("abc") is not None
+    assert cache.prune(all_entries=True)[0] == 1
+    assert cache.get("abc") is None
+
+
+def test_parallel_extraction_without_pypdf(make_pdf, monkeypatch):
+    path = make_pdf("plumber_only.pdf", _pages(10))
+
+    def reject(*a, **kw):
+        raise ValueError("pypdf cannot parse this file")
+
+    monkeypatch.setattr("app.pdf_reader.PdfReader", reject)
+    pages = list(iter_pdf_pages(path, workers=2, pages_per_task=4))
+    assert [p.page_number for p in pages] == list(range(1, 11))
+    assert {p.extractor for p in pages} == {"pdfplumber"}
+
+    monkeypatch.setattr("app.pdf_reader.page_count", reject)
+    assert [p.page_number for p in iter_pdf_pages(path, workers=2)] == list(range(1, 11))
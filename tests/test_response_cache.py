@@ -0,0 +1,83 @@
+import asyncio
+
+from app.config import settings
+from app.faiss_index import FaissStore
+from app.llm import LLM
+from app.rag import RAG
+from app.response_cache import ResponseCache, response_key
+from app.retriever import Retriever
+from scripts.ingest_cli import ingest_pdf
+
+
+def test_cache_roundtrip_ttl_and_index_version(tmp_path, monkeypatch):
+    path = str(tmp_path / "llm.sqlite")
+    key = response_key("ollama", "llama", None, "prompt")
+    assert key != response_key("ollama", "llama", 0.2, "prompt")
+    assert key != response_key("openai", "llama", None, "prompt")
+
+    cache = ResponseCache(path)
+    assert cache.get(key, "1") is None
+    cache.put(key, "cevap", "1")
+    assert cache.get(key, "1") == "cevap"
+    assert ResponseCache(path).get(key, "1") == "cevap"  # persistent, shared by workers
+
+    assert cache.get(key, "2") is None  # written under another index version
+    cache.put(key, "cevap", "2")
+    # mid-reload: a worker still on version 1 must not drop the new version's answers
+    ResponseCache(path).put(response_key("ollama", "llama", None, "old"), "y", "1")
+    cache.put(response_key("ollama", "llama", None, "other"), "x", "3")
+    assert cache.get(key, "2") == "cevap"
+    assert cache._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 4
+    # ... nor by reading (a miss) or re-answering the same prompt on its snapshot
+    old = ResponseCache(path)
+    assert old.get(key, "1") == "cevap"  # its own version-1 row is still there
+    old.put(key, "eski cevap", "1")
+    assert old.get(response_key("ollama", "llama", None, "other"), "1") is None
+    assert cache.get(key, "2") == "cevap" and cache.get(response_key("ollama", "llama", None, "other"), "3") == "x"
+
+    cache.ttl = 0.0
+    monkeypatch.setattr("app.response_cache.time.time", lambda: 1e12)
+    assert cache.get(response_key("ollama", "llama", None, "other"), "3") is None
+
+
+def test_cache_is_size_bounded_lru(tmp_path):
+    cache = ResponseCache(str(tmp_path / "llm.sqlite"), max_entries=20)
+    for i in range(20):
+        cache.put(f"k{i}", f"a{i}", "1")
+    cache.get("k0", "1")  # keep k0 hot
+    cache.put("new", "a", "1")
+    assert len(cache) <= 20
+    assert cache.get("k0", "1") == "a0" and cache.get("new", "1") == "a"
+    assert cache.get("k1", "1") is None
+
+
+class CountingLLM(LLM):
+    provider = "ollama"
+    model = "test"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt: str) -> str:
+        self.calls += 1
+        return f"cevap {self.calls}"
+
+
+def test_rag_serves_repeated_questions_from_cache(make_pdf, embedder, db_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "idk_threshold", -1.0)
+    db = db_factory()
+    store = FaissStore(embedder.dim())
+    ingest_pdf(db, store, embedder, make_pdf("d.pdf", ["EFT ucreti 5 TL.\n" * 30]))
+    cache = ResponseCache(str(tmp_path / "llm.sqlite"))
+    llm = CountingLLM()
+    rag = RAG(Retriever(db=db, embedder=embedder, store=store), llm, cache=cache, index_version="1")
+
+    first = rag.answer("EFT ucreti nedir?")
+    again = asyncio.run(rag.aanswer("EFT ucreti nedir?"))
+    assert llm.calls == 1 and again.answer == first.answer == "cevap 1"
+    assert [c.chunk_id for c in again.citations] == [c.chunk_id for c in first.citations]
+
+    rag.index_version = "2"  # new index published: regenerate
+    assert rag.answer("EFT ucreti nedir?").answer == "cevap 2"
+    assert cache.stats()["hits"] == 1
+    db.close()
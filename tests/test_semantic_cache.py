@@ -0,0 +1,85 @@
+import asyncio
+
+import numpy as np
+
+from app.batcher import QueryBatcher
+from app.config import settings
+from app.faiss_index import FaissStore
+from app.llm import LLM
+from app.rag import RAG, RAGResponse
+from app.retriever import Retriever
+from app.semantic_cache import SemanticCache
+from scripts.ingest_cli import ingest_pdf
+
+
+def _unit(v):
+    v = np.asarray(v, dtype="float32")
+    return v / np.linalg.norm(v)
+
+
+def _resp(answer):
+    return RAGResponse(answer=answer, citations=[], used_context=True, idk=False, top_score=0.9)
+
+
+def test_threshold_version_and_lru():
+    cache = SemanticCache(3, threshold=0.95, max_entries=2)
+    cache.put(_unit([1, 0, 0]), "EFT ucreti ne kadar?", _resp("5 TL"), "1")
+    assert cache.get(_unit([1, 0.1, 0]), "1").answer == "5 TL"  # cos ~0.995
+    assert cache.get(_unit([1, 1, 0]), "1") is None  # cos ~0.71
+    assert cache.get(_unit([1, 0, 0]), "2") is None  # new index version empties the cache
+    assert len(cache) == 0
+
+    cache.put(_unit([1, 0, 0]), "a", _resp("a"), "2")
+    cache.put(_unit([0, 1, 0]), "b", _resp("b"), "2")
+    cache.get(_unit([1, 0, 0]), "2")  # keep "a" hot
+    cache.put(_unit([0, 0, 1]), "c", _resp("c"), "2")
+    assert len(cache) == 2
+    assert cache.get(_unit([0, 1, 0]), "2") is None and cache.get(_unit([1, 0, 0]), "2").answer == "a"
+    assert cache.stats()["hits"] == 3
+
+
+def test_old_snapshot_requests_do_not_wipe_newer_entries():
+    cache = SemanticCache(3, threshold=0.95)
+    cache.get(_unit([1, 0, 0]), "2")
+    cache.put(_unit([1, 0, 0]), "q", _resp("yeni"), "2")
+    # a request that started before the reload finishes after it
+    cache.put(_unit([0, 1, 0]), "q2", _resp("eski"), "1")
+    assert cache.get(_unit([0, 1, 0]), "1") is None
+    assert cache.version == "2" and len(cache) == 1
+    assert cache.get(_unit([1, 0, 0]), "2").answer == "yeni"
+    assert cache.get(_unit([1, 0, 0]), "3") is None and len(cache) == 0  # newer version empties it
+
+
+class CountingLLM(LLM):
+    provider = "ollama"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt: str) -> str:
+        self.calls += 1
+        return f"cevap {self.calls}"
+
+
+def test_rag_skips_retrieval_and_llm_on_semantic_hit(make_pdf, embedder, db_factory, monkeypatch):
+    monkeypatch.setattr(settings, "idk_threshold", -1.0)
+    db = db_factory()
+    store = FaissStore(embedder.dim())
+    ingest_pdf(db, store, embedder, make_pdf("d.pdf", ["EFT ucreti 5 TL.\n" * 30]))
+    batcher = QueryBatcher(embedder, max_wait_ms=1)
+    retriever = Retriever(db=db, embedder=embedder, store=store, batcher=batcher)
+    llm = CountingLLM()
+    # hash embedder: only the identical question is similar enough
+    cache = SemanticCache(embedder.dim(), threshold=0.99)
+    rag = RAG(retriever, llm, index_version="1", semantic=cache)
+
+    first = asyncio.run(rag.aanswer("EFT ucreti nedir?"))
+    calls = []
+    monkeypatch.setattr(retriever, "retrieve", lambda *a, **k: calls.append(a))
+    again = rag.answer("EFT ucreti nedir?")
+    assert again is first and llm.calls == 1 and calls == []
+
+    results = asyncio.run(rag.aanswer_many(["EFT ucreti nedir?"]))
+    assert results[0] is first and cache.stats()["hits"] == 2
+    batcher.close()
+    db.close()
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight, question_key
+
+
+def test_question_key_normalizes():
+    assert question_key("  EFT ücreti\n ne  kadar? ") == question_key("eft Ücreti ne kadar?")
+    assert question_key("EFT ücreti") != question_key("havale ücreti")
+
+
+def test_concurrent_calls_share_one_computation():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer": "5 TL"}
+
+    async def run():
+        results = await asyncio.gather(*(flights.do("k", work) for _ in range(5)))
+        later = await flights.do("k", work)  # finished flights are not reused
+        return results, later
+
+    results, later = asyncio.run(run())
+    assert len(calls) == 2 and all(r is results[0] for r in results) and later is not results[0]
+    assert flights.stats() == {"in_flight": 0, "started": 2, "coalesced": 4}
+
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("ollama down")
+
+    async def run():
+        return await asyncio.gather(*(flights.do("k", boom) for _ in range(3)), return_exceptions=True)
+
+    assert [str(e) for e in asyncio.run(run())] == ["ollama down"] * 3
+
+
+def test_stream_subscribers_get_every_event_even_when_joining_late():
+    flights = SingleFlight()
+    produced = []
+
+    async def source():
+        for piece in ["EFT ", "ucreti ", "5 TL"]:
+            produced.append(piece)
+            yield "token", piece
+            await asyncio.sleep(0.02)
+
+    async def consume(delay):
+        await asyncio.sleep(delay)
+        return [e async for e in flights.stream("k", source)]
+
+    async def run():
+        return await asyncio.gather(consume(0), consume(0.03))
+
+    first, late = asyncio.run(run())
+    assert first == late == [("token", "EFT "), ("token", "ucreti "), ("token", "5 TL")]
+    assert len(produced) == 3 and flights.coalesced == 1
+
+
+def test_caller_cancellation_does_not_cancel_shared_work():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        leader = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == "done"